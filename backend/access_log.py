@@ -0,0 +1,252 @@
+# backend/access_log.py
+#
+# Structured (JSON lines) access log for every /api route. Each request
+# collects its fields in a per-request trace (route, store_id, model
+# version, per-stage timings, cache outcomes, payload bytes, status);
+# after_request decides whether to keep it and hands the raw record to a
+# QueueHandler. Formatting and file I/O happen on a QueueListener thread,
+# so the request thread only does a non-blocking queue put.
+#
+# duration_ms ends when the view returns; for streamed responses (the
+# /export downloads, logged with "streamed": true and no byte count) that
+# is the time to first byte, not to the last.
+#
+# Successful requests are sampled at ACCESS_LOG_SAMPLE_RATE; errors
+# (status >= 400) and requests slower than ACCESS_LOG_SLOW_MS are always
+# kept. When the queue is full, records are dropped and counted rather
+# than blocking the request.
+from __future__ import annotations
+
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from flask import Flask, g, request
+
+from config import (
+    ACCESS_LOG_PATH,
+    ACCESS_LOG_QUEUE_SIZE,
+    ACCESS_LOG_SAMPLE_RATE,
+    ACCESS_LOG_SLOW_MS,
+)
+from metrics import register_metrics
+
+# The current request's trace; carried into the compute pool by
+# run_compute (contextvars), so stages timed there count too.
+_trace: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar(
+    "access_trace", default=None
+)
+
+_stats = {"written": 0, "sampled_out": 0, "dropped": 0}
+_stats_lock = threading.Lock()
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def _count(field: str) -> None:
+    with _stats_lock:
+        _stats[field] += 1
+
+
+# --- per-request trace -------------------------------------
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Add the time spent in the block to the current request's `stages[name]` (ms)."""
+    trace = _trace.get()
+    if trace is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        stages = trace["stages"]
+        stages[name] = round(stages.get(name, 0.0) + (time.perf_counter() - t0) * 1000, 2)
+
+
+def note_cache(name: str, outcome: str) -> None:
+    """Record a cache outcome for the current request, e.g. ("result_store", "hit")."""
+    trace = _trace.get()
+    if trace is not None:
+        trace["cache"][name] = outcome
+
+
+def annotate(**fields: Any) -> None:
+    """Attach extra fields to the current request's log line."""
+    trace = _trace.get()
+    if trace is not None:
+        trace.update(fields)
+
+
+# --- writer ------------------------------------------------
+
+class _JsonLinesFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(record.msg, default=str, separators=(",", ":"))
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks and hands the dict over unformatted."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record  # formatted on the listener thread
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _count("dropped")
+
+
+class _CountingListener(logging.handlers.QueueListener):
+    """QueueListener that counts the lines it hands to the file / stream."""
+
+    def handle(self, record: logging.LogRecord) -> None:
+        super().handle(record)
+        _count("written")
+
+
+def _target_handler(path: str) -> logging.Handler:
+    if path == "-":
+        handler: logging.Handler = logging.StreamHandler(sys.stdout)
+    else:
+        # Reopens the file if logrotate moves it.
+        handler = logging.handlers.WatchedFileHandler(path, encoding="utf-8")
+    handler.setFormatter(_JsonLinesFormatter())
+    return handler
+
+
+def _start_writer(path: str) -> logging.Logger:
+    global _listener
+    logger = logging.getLogger("forecaster.access")
+    if _listener is None:
+        q: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=ACCESS_LOG_QUEUE_SIZE)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        logger.addHandler(_DroppingQueueHandler(q))
+        _listener = _CountingListener(q, _target_handler(path))
+        _listener.start()
+        atexit.register(stop_access_log)
+    return logger
+
+
+def stop_access_log() -> None:
+    """Flush queued lines and stop the writer thread (registered with atexit)."""
+    global _listener
+    listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+
+
+def _timestamp() -> str:
+    now = time.time()
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(now)) + f".{int(now * 1000) % 1000:03d}Z"
+
+
+def _keep(status: int, duration_ms: float) -> bool:
+    if status >= 400 or duration_ms >= ACCESS_LOG_SLOW_MS:
+        return True
+    return ACCESS_LOG_SAMPLE_RATE >= 1.0 or random.random() < ACCESS_LOG_SAMPLE_RATE
+
+
+def _store_id() -> Optional[int]:
+    raw = (request.view_args or {}).get("store_id")
+    if raw is None:
+        raw = request.args.get("store_id")
+    if raw is None and request.is_json:
+        body = request.get_json(silent=True)
+        raw = body.get("store_id") if isinstance(body, dict) else None
+    try:
+        return int(raw) if raw is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def install_access_log(app: Flask) -> None:
+    """
+    Log one JSON line per sampled /api request to ACCESS_LOG_PATH ("-" for
+    stdout). Does nothing when ACCESS_LOG_PATH is unset.
+    """
+    if not ACCESS_LOG_PATH:
+        return
+    logger = _start_writer(ACCESS_LOG_PATH)
+
+    @app.before_request
+    def _start_trace():
+        if not request.path.startswith("/api/"):
+            return None
+        g.access_t0 = time.perf_counter()
+        g.access_token = _trace.set({"stages": {}, "cache": {}})
+        return None
+
+    @app.after_request
+    def _log_request(response):
+        t0 = g.get("access_t0")
+        if t0 is None:
+            return response
+        duration_ms = (time.perf_counter() - t0) * 1000
+        status = response.status_code
+        if not _keep(status, duration_ms):
+            _count("sampled_out")
+            return response
+
+        from model_utils import get_artifact_version
+
+        # Only requests that entered a dataset scope were served by a model;
+        # unknown datasets and shed requests have no version to report.
+        model_version = get_artifact_version() if g.get("dataset_scope") else None
+        # Asking a streamed response for its length would buffer the body.
+        streamed = response.is_streamed
+        trace = _trace.get() or {}
+        line: Dict[str, Any] = {
+            "ts": _timestamp(),
+            "method": request.method,
+            "route": request.url_rule.rule if request.url_rule else None,
+            "endpoint": request.endpoint,
+            "path": request.path,
+            "store_id": _store_id(),
+            "status": status,
+            "duration_ms": round(duration_ms, 2),
+            "bytes": None if streamed else response.calculate_content_length(),
+            "streamed": streamed,
+            "model_version": model_version,
+            "sample_rate": 1.0 if status >= 400 or duration_ms >= ACCESS_LOG_SLOW_MS
+            else ACCESS_LOG_SAMPLE_RATE,
+            **trace,
+        }
+        if status >= 400 and response.is_json:
+            body = response.get_json(silent=True)
+            if isinstance(body, dict):
+                line["error"] = body.get("error")
+        logger.info(line)  # counted as written (or dropped) by the writer side
+        return response
+
+    @app.teardown_request
+    def _end_trace(exc=None):
+        token = g.pop("access_token", None)
+        if token is not None:
+            _trace.reset(token)
+
+
+def access_log_stats() -> Dict[str, Any]:
+    with _stats_lock:
+        stats: Dict[str, Any] = dict(_stats)
+    stats.update(
+        enabled=bool(ACCESS_LOG_PATH),
+        sample_rate=ACCESS_LOG_SAMPLE_RATE,
+        slow_ms=ACCESS_LOG_SLOW_MS,
+        queued=_listener.queue.qsize() if _listener is not None else 0,
+    )
+    return stats
+
+
+register_metrics("access_log", access_log_stats)
@@ -0,0 +1,121 @@
+# backend/alloc_tracking.py
+#
+# tracemalloc helpers shared by the soak harness and /api/debug/alloc.
+# Tracing costs CPU and memory on every allocation, so it is off until
+# start_tracing() is called (by the soak run, TRACEMALLOC_FRAMES at
+# startup, or the first admin request). The snapshot taken when tracing
+# starts is the baseline that later snapshots are compared against.
+from __future__ import annotations
+
+import gc
+import threading
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+# Frames from the profiler itself and the import machinery are noise.
+_IGNORED = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+KEY_TYPES = ("lineno", "filename", "traceback")
+
+_baseline: Optional[tracemalloc.Snapshot] = None
+_lock = threading.Lock()
+
+
+def take_snapshot(collect: bool = True) -> tracemalloc.Snapshot:
+    """Snapshot of live traced blocks (after a full GC by default)."""
+    if collect:
+        gc.collect()
+    return tracemalloc.take_snapshot().filter_traces(_IGNORED)
+
+
+def start_tracing(frames: int = 1) -> bool:
+    """
+    Start tracemalloc (if it is not already running) and record the
+    baseline snapshot. Returns True when this call started tracing.
+    """
+    global _baseline
+    with _lock:
+        if tracemalloc.is_tracing():
+            return False
+        tracemalloc.start(max(1, int(frames)))
+        _baseline = take_snapshot()
+        return True
+
+
+def stop_tracing() -> None:
+    global _baseline
+    with _lock:
+        tracemalloc.stop()
+        _baseline = None
+
+
+def reset_baseline() -> None:
+    """Make the current heap the baseline (e.g. after a warm-up phase)."""
+    global _baseline
+    with _lock:
+        _baseline = take_snapshot()
+
+
+def get_baseline() -> Optional[tracemalloc.Snapshot]:
+    return _baseline
+
+
+def _site(stat: Any) -> List[str]:
+    return [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback]
+
+
+def top_stats(snapshot: tracemalloc.Snapshot, limit: int = 25,
+              key_type: str = "lineno") -> List[Dict[str, Any]]:
+    """Largest allocation sites of one snapshot."""
+    return [
+        {"site": _site(s), "size_kb": round(s.size / 1024, 1), "count": s.count}
+        for s in snapshot.statistics(key_type)[:limit]
+    ]
+
+
+def diff_stats(old: tracemalloc.Snapshot, new: tracemalloc.Snapshot, limit: int = 25,
+               key_type: str = "lineno") -> List[Dict[str, Any]]:
+    """Allocation sites that grew the most from `old` to `new`."""
+    stats = [s for s in new.compare_to(old, key_type) if s.size_diff > 0]
+    return [
+        {
+            "site": _site(s),
+            "size_kb": round(s.size / 1024, 1),
+            "size_diff_kb": round(s.size_diff / 1024, 1),
+            "count_diff": s.count_diff,
+        }
+        for s in stats[:limit]
+    ]
+
+
+def traced_memory() -> Dict[str, float]:
+    current, peak = tracemalloc.get_traced_memory()
+    return {"current_mb": round(current / 2**20, 3), "peak_mb": round(peak / 2**20, 3)}
+
+
+def alloc_report(limit: int = 25, key_type: str = "lineno") -> Dict[str, Any]:
+    """
+    Current top allocators and the growth since the baseline; starts
+    tracing (and returns an empty report) when it is not running yet.
+    """
+    if key_type not in KEY_TYPES:
+        raise ValueError(f"Invalid key_type {key_type!r}; expected one of {list(KEY_TYPES)}.")
+
+    if start_tracing():
+        return {"tracing": True, "started": True, **traced_memory(), "top": [], "growth": []}
+
+    snapshot = take_snapshot()
+    baseline = get_baseline()
+    return {
+        "tracing": True,
+        "started": False,
+        **traced_memory(),
+        "top": top_stats(snapshot, limit, key_type),
+        "growth": diff_stats(baseline, snapshot, limit, key_type) if baseline else [],
+    }
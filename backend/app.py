@@ -1,16 +1,34 @@
 # app.py
 import os
+import threading
 from flask import Flask, request
 
-from config import CORS_ALLOWED_ORIGINS
+from access_log import install_access_log
+from alloc_tracking import start_tracing
+from config import ASOF_PRECOMPUTE_FIT, CORS_ALLOWED_ORIGINS, TRACEMALLOC_FRAMES
+from derived_snapshot import load_or_rebuild_snapshot
 from routes.health_routes import health_bp
 from routes.stores_routes import stores_bp
 from routes.forecast_routes import forecast_bp
 from routes.ai_routes import ai_bp 
+from routes.rankings_routes import rankings_bp
+from routes.scenario_routes import scenario_bp
+from routes.rollup_routes import rollup_bp
+from routes.export_routes import export_bp
+from routes.drift_routes import drift_bp
+from routes.anomaly_routes import anomaly_bp
+from routes.debug_routes import debug_bp
+from routes.bootstrap_routes import bootstrap_bp
+from serving import install_admission_control, install_dataset_scope
+from services.asof_service import warm_fit_matrix
 
 
 def create_app() -> Flask:
     app = Flask(__name__)
+    # Installed first so requests shed by admission control are logged too.
+    install_access_log(app)
+    install_admission_control(app)
+    install_dataset_scope(app)
 
     @app.after_request
     def add_cors_headers(response):
@@ -20,12 +38,34 @@ def create_app() -> Flask:
             response.headers["Vary"] = "Origin"
 
         response.headers["Access-Control-Allow-Methods"] = "GET, POST, OPTIONS"
-        response.headers["Access-Control-Allow-Headers"] = "Content-Type, Authorization"
+        response.headers["Access-Control-Allow-Headers"] = "Content-Type, Authorization, X-Request-Timeout-Ms, If-None-Match"
         return response
 
     app.register_blueprint(health_bp, url_prefix="/api")
     app.register_blueprint(stores_bp, url_prefix="/api")
     app.register_blueprint(forecast_bp, url_prefix="/api")
     app.register_blueprint(ai_bp, url_prefix="/api")  
+    app.register_blueprint(rankings_bp, url_prefix="/api")
+    app.register_blueprint(scenario_bp, url_prefix="/api")
+    app.register_blueprint(rollup_bp, url_prefix="/api")
+    app.register_blueprint(export_bp, url_prefix="/api")
+    app.register_blueprint(drift_bp, url_prefix="/api")
+    app.register_blueprint(anomaly_bp, url_prefix="/api")
+    app.register_blueprint(debug_bp, url_prefix="/api")
+    app.register_blueprint(bootstrap_bp, url_prefix="/api")
+
+    # The same routes per dataset: /api/<dataset>/forecast/<id>, ...
+    for bp in (health_bp, stores_bp, forecast_bp, ai_bp, rankings_bp, scenario_bp,
+               rollup_bp, export_bp, drift_bp, anomaly_bp, bootstrap_bp):
+        app.register_blueprint(bp, url_prefix="/api/<dataset>", name=f"{bp.name}_dataset")
+
+    if TRACEMALLOC_FRAMES > 0:
+        start_tracing(TRACEMALLOC_FRAMES)
+
+    # Load derived tables from the snapshot, or rebuild + rewrite it in the background.
+    load_or_rebuild_snapshot()
+
+    if ASOF_PRECOMPUTE_FIT:
+        threading.Thread(target=warm_fit_matrix, name="warm-fit", daemon=True).start()
 
     return app
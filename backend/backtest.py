@@ -0,0 +1,296 @@
+# backend/backtest.py
+#
+# Rolling-origin backtest of the v3 model over features_all_stable_v3:
+# for every cutoff month T, train on rows whose target month is < T and
+# predict month T. Each feature row forecasts the month after its own
+# (the row's month + 1, as in score / asof), and every month in the
+# inputs and outputs here is that forecast month.
+# Cutoffs run in parallel on a process pool; the feature matrix is put in
+# shared memory once and every worker reads the same pages.
+#
+#   cd backend
+#   python -m backtest --cutoffs 12 --workers 8 --out backtest_out
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from columnar import resolve_format, write_frame
+from model_utils import get_all_features_df, get_feature_cols, get_model, get_model_config
+from services.analytics_service import volatility_labels
+from shared_arrays import SharedArrays, attach
+
+
+# Used when the production model cannot be loaded to copy its params.
+DEFAULT_XGB_PARAMS: Dict[str, Any] = {
+    "n_estimators": 300,
+    "max_depth": 6,
+    "learning_rate": 0.05,
+    "subsample": 0.8,
+    "colsample_bytree": 0.8,
+    "objective": "reg:squarederror",
+}
+
+
+# --- artifact -> arrays ------------------------------------
+
+def load_backtest_arrays(df: Optional[pd.DataFrame] = None) -> Dict[str, np.ndarray]:
+    """
+    Flatten the all-months feature table into the arrays a backtest needs:
+    X (float32), y, forecast month index (months since 1970-01; the feature
+    row's month + 1), store id, coef_var.
+    """
+    df = df if df is not None else get_all_features_df()
+    if not isinstance(df, pd.DataFrame):
+        raise TypeError(
+            "features_all_stable_v3.pkl must contain a DataFrame with one row per "
+            f"store and month, got {type(df).__name__}"
+        )
+
+    cfg = get_model_config()
+    target_col = cfg["target_col"]
+    store_col = cfg["store_col"]
+    date_col = "MonthStart" if "MonthStart" in df.columns else cfg["date_col"]
+
+    missing = [c for c in (target_col, store_col, date_col) if c not in df.columns]
+    if missing:
+        raise KeyError(f"All-months feature table is missing columns: {missing}")
+
+    df = df.dropna(subset=[target_col])
+    feature_cols = get_feature_cols(df)
+
+    return {
+        "X": df[feature_cols].to_numpy(dtype=np.float32),
+        "y": df[target_col].to_numpy(dtype=np.float64),
+        "month": pd.to_datetime(df[date_col]).to_numpy(dtype="datetime64[M]").astype(np.int64) + 1,
+        "store": df[store_col].to_numpy(dtype=np.int64),
+        "coef_var": (
+            df["coef_var"].to_numpy(dtype=np.float64)
+            if "coef_var" in df.columns
+            else np.full(len(df), np.nan)
+        ),
+    }
+
+
+def model_params(n_threads: int, n_estimators: Optional[int] = None) -> Dict[str, Any]:
+    """Training params copied from the production model, with thread control."""
+    try:
+        params = dict(get_model().get_params())
+    except Exception:
+        params = dict(DEFAULT_XGB_PARAMS)
+
+    params.update({"tree_method": "hist", "n_jobs": n_threads})
+    if n_estimators is not None:
+        params["n_estimators"] = n_estimators
+    # Early stopping needs an eval set, which a backtest fold does not pass.
+    params.pop("early_stopping_rounds", None)
+    return params
+
+
+# --- worker side -------------------------------------------
+
+_worker: Dict[str, Any] = {}
+
+
+def _init_worker(spec, params: Dict[str, Any], train_window: int) -> None:
+    _worker["arrays"] = attach(spec)
+    _worker["params"] = params
+    _worker["train_window"] = train_window
+
+
+def _run_cutoff(cutoff: int) -> Dict[str, np.ndarray]:
+    """Train on target months < cutoff (within the window) and predict the cutoff month."""
+    from xgboost import XGBRegressor
+
+    a = _worker["arrays"]
+    month = a["month"]
+
+    train = month < cutoff
+    if _worker["train_window"] > 0:
+        train &= month >= cutoff - _worker["train_window"]
+    test = month == cutoff
+
+    if not train.any() or not test.any():
+        return {"store": np.zeros(0, np.int64), "month": np.zeros(0, np.int64),
+                "y": np.zeros(0), "pred": np.zeros(0), "coef_var": np.zeros(0)}
+
+    model = XGBRegressor(**_worker["params"])
+    model.fit(a["X"][train], a["y"][train])
+    pred = model.predict(a["X"][test]).astype(np.float64)
+
+    return {
+        "store": a["store"][test].copy(),
+        "month": month[test].copy(),
+        "y": a["y"][test].copy(),
+        "pred": pred,
+        "coef_var": a["coef_var"][test].copy(),
+    }
+
+
+# --- metrics -----------------------------------------------
+
+def _metrics_by(preds: pd.DataFrame, key: str) -> pd.DataFrame:
+    g = preds.groupby(key, sort=True)
+    out = g.agg(
+        n=("abs_err", "size"),
+        mae=("abs_err", "mean"),
+        mape=("ape", "mean"),
+        sum_abs_err=("abs_err", "sum"),
+        sum_abs_y=("abs_y", "sum"),
+    )
+    out["wape"] = np.where(out["sum_abs_y"] > 0, out["sum_abs_err"] / out["sum_abs_y"], np.nan)
+    return out.drop(columns=["sum_abs_err", "sum_abs_y"]).reset_index()
+
+
+def summarize(preds: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    """MAE / MAPE / WAPE per store, month and volatility segment."""
+    preds = preds.copy()
+    preds["abs_err"] = (preds["pred"] - preds["y"]).abs()
+    preds["abs_y"] = preds["y"].abs()
+    preds["ape"] = np.where(preds["abs_y"] > 0, preds["abs_err"] / preds["abs_y"], np.nan)
+    preds["all"] = "all"
+
+    return {
+        "metrics_by_store": _metrics_by(preds, "store_id"),
+        "metrics_by_month": _metrics_by(preds, "month"),
+        "metrics_by_segment": _metrics_by(preds, "segment"),
+        "metrics_overall": _metrics_by(preds, "all"),
+    }
+
+
+# --- driver ------------------------------------------------
+
+def pick_cutoffs(months: np.ndarray, n_cutoffs: int,
+                 start: Optional[str], end: Optional[str]) -> List[int]:
+    """The last `n_cutoffs` forecast months in the table, optionally clipped to [start, end]."""
+    available = np.unique(months)[1:]  # the first month has nothing to train on
+    if start:
+        available = available[available >= np.datetime64(start[:7], "M").astype(np.int64)]
+    if end:
+        available = available[available <= np.datetime64(end[:7], "M").astype(np.int64)]
+    if n_cutoffs > 0:
+        available = available[-n_cutoffs:]
+    return [int(m) for m in available]
+
+
+def run_backtest(
+    *,
+    n_cutoffs: int = 12,
+    workers: Optional[int] = None,
+    train_window: int = 0,
+    n_estimators: Optional[int] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    Run the rolling-origin backtest and return (predictions, run info).
+    """
+    t0 = time.perf_counter()
+    arrays = load_backtest_arrays()
+    cutoffs = pick_cutoffs(arrays["month"], n_cutoffs, start, end)
+    if not cutoffs:
+        raise ValueError("No cutoff months to evaluate in the requested range.")
+
+    cpus = os.cpu_count() or 1
+    workers = max(1, min(workers or cpus, len(cutoffs)))
+    n_threads = max(1, cpus // workers)  # workers * threads <= cores
+    params = model_params(n_threads, n_estimators)
+
+    results: List[Dict[str, np.ndarray]] = []
+    with SharedArrays(arrays) as shared:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(shared.spec, params, train_window),
+        ) as pool:
+            # Latest cutoffs have the most training rows; start them first.
+            futures = {pool.submit(_run_cutoff, c): c for c in sorted(cutoffs, reverse=True)}
+            for fut in as_completed(futures):
+                results.append(fut.result())
+
+    parts = {k: np.concatenate([r[k] for r in results]) for k in results[0]}
+    preds = pd.DataFrame(
+        {
+            "store_id": parts["store"],
+            "month": np.datetime_as_string(parts["month"].astype("datetime64[M]")),
+            "y": parts["y"],
+            "pred": parts["pred"],
+            "segment": volatility_labels(parts["coef_var"]),
+        }
+    ).sort_values(["month", "store_id"], ignore_index=True)
+    preds["segment"] = preds["segment"].replace("", "unknown")
+
+    info = {
+        "cutoffs": [str(np.datetime64(c, "M")) for c in sorted(cutoffs)],
+        "workers": workers,
+        "threads_per_worker": n_threads,
+        "train_window_months": train_window,
+        "rows_predicted": int(len(preds)),
+        "elapsed_seconds": round(time.perf_counter() - t0, 3),
+    }
+    return preds, info
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Rolling-origin backtest of the forecast model.")
+    parser.add_argument("--cutoffs", type=int, default=12,
+                        help="number of most recent forecast months to evaluate (0 = all)")
+    parser.add_argument("--start", help="first forecast month to evaluate, YYYY-MM")
+    parser.add_argument("--end", help="last forecast month to evaluate, YYYY-MM")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes (default: all cores)")
+    parser.add_argument("--train-window", type=int, default=0,
+                        help="train on at most this many months before each cutoff (0 = all)")
+    parser.add_argument("--n-estimators", type=int, default=None,
+                        help="override the number of boosting rounds")
+    parser.add_argument("--format", default="parquet", choices=["parquet", "csv"])
+    parser.add_argument("--out", default="backtest_out", help="output directory")
+    args = parser.parse_args(argv)
+
+    fmt = resolve_format(args.format)
+    if fmt != args.format:
+        print("pyarrow is not installed; writing CSV instead of Parquet.")
+    preds, info = run_backtest(
+        n_cutoffs=args.cutoffs,
+        workers=args.workers,
+        train_window=args.train_window,
+        n_estimators=args.n_estimators,
+        start=args.start,
+        end=args.end,
+    )
+
+    os.makedirs(args.out, exist_ok=True)
+    files = {"predictions": write_frame(preds, os.path.join(args.out, "predictions"), fmt)}
+    tables = summarize(preds)
+    for name, table in tables.items():
+        files[name] = write_frame(table, os.path.join(args.out, name), fmt)
+
+    overall = tables["metrics_overall"].iloc[0]
+    info["overall"] = {
+        "n": int(overall["n"]),
+        "mae": float(overall["mae"]),
+        "mape": float(overall["mape"]),
+        "wape": float(overall["wape"]),
+    }
+    info["files"] = files
+    with open(os.path.join(args.out, "summary.json"), "w") as f:
+        json.dump(info, f, indent=2)
+
+    print(
+        f"Backtested {len(info['cutoffs'])} cutoffs ({info['rows_predicted']} rows) "
+        f"in {info['elapsed_seconds']}s on {info['workers']} workers: "
+        f"MAE={info['overall']['mae']:,.2f} WAPE={info['overall']['wape']:.3f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
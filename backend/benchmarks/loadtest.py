@@ -0,0 +1,427 @@
+# backend/benchmarks/loadtest.py
+#
+# Closed-loop HTTP load driver. Starts the real create_app() under
+# gunicorn against synthetic artifacts, replays a weighted mix of
+# /api/stores, /api/forecast/<id> and /api/explain_forecast, and reports
+# throughput, latency percentiles (HDR-style log-linear histogram), error
+# rates and per-worker RSS over time.
+#
+#   cd backend
+#   python -m benchmarks.loadtest --stores 3000 --workers 2 --threads 4 \
+#       --concurrency 16 --duration 30
+#   python -m benchmarks.loadtest --sweep 1,2,4,8,16,32,64 --duration 15
+from __future__ import annotations
+
+import argparse
+import http.client
+import json
+import math
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from benchmarks.synthetic import ensure_artifacts
+
+
+# --- latency histogram -------------------------------------
+
+class LatencyHistogram:
+    """
+    Log-linear histogram in the spirit of HdrHistogram: values are bucketed
+    with a fixed number of significant digits, so relative error stays
+    bounded (<= 1% at 3 digits) from microseconds to minutes, and
+    recording is O(1) with no per-sample storage.
+    """
+
+    def __init__(self, significant_digits: int = 3) -> None:
+        self.digits = significant_digits
+        self.sub_buckets = 10 ** significant_digits
+        self.counts: Dict[int, int] = {}
+        self.total = 0
+        self.max_us = 0
+
+    def _index(self, us: int) -> int:
+        if us < self.sub_buckets:
+            return us
+        exp = len(str(us)) - self.digits
+        return exp * self.sub_buckets + us // (10 ** exp)
+
+    def _value(self, index: int) -> int:
+        exp, sub = divmod(index, self.sub_buckets)
+        if exp == 0:
+            return sub
+        return sub * (10 ** exp)
+
+    def record(self, seconds: float) -> None:
+        us = max(0, int(seconds * 1_000_000))
+        i = self._index(us)
+        self.counts[i] = self.counts.get(i, 0) + 1
+        self.total += 1
+        self.max_us = max(self.max_us, us)
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        for i, n in other.counts.items():
+            self.counts[i] = self.counts.get(i, 0) + n
+        self.total += other.total
+        self.max_us = max(self.max_us, other.max_us)
+
+    def percentile_ms(self, pct: float) -> Optional[float]:
+        if self.total == 0:
+            return None
+        target = max(1, math.ceil(self.total * pct / 100.0))
+        seen = 0
+        for i in sorted(self.counts):
+            seen += self.counts[i]
+            if seen >= target:
+                return self._value(i) / 1000.0
+        return self.max_us / 1000.0
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        return {
+            "count": self.total,
+            "p50_ms": self.percentile_ms(50),
+            "p95_ms": self.percentile_ms(95),
+            "p99_ms": self.percentile_ms(99),
+            "max_ms": self.max_us / 1000.0 if self.total else None,
+        }
+
+    def buckets(self) -> List[Tuple[float, int]]:
+        """[(bucket lower bound in ms, count), ...] for plotting."""
+        return [(self._value(i) / 1000.0, self.counts[i]) for i in sorted(self.counts)]
+
+
+# --- server ------------------------------------------------
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class GunicornServer:
+    """gunicorn run:app on a local port, pointed at an artifact directory."""
+
+    def __init__(self, artifacts_dir: str, workers: int, threads: int,
+                 extra_env: Optional[Dict[str, str]] = None) -> None:
+        self.port = _free_port()
+        self.backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ, FORECASTER_MODELS_DIR=artifacts_dir, **(extra_env or {}))
+        self.proc = subprocess.Popen(
+            [
+                sys.executable, "-m", "gunicorn", "run:app",
+                "--bind", f"127.0.0.1:{self.port}",
+                "--workers", str(workers),
+                "--threads", str(threads),
+                "--worker-class", "gthread" if threads > 1 else "sync",
+                "--timeout", "120",
+                "--log-level", "warning",
+            ],
+            cwd=self.backend_dir,
+            env=env,
+        )
+
+    def wait_ready(self, timeout: float = 60.0) -> None:
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.proc.poll() is not None:
+                raise RuntimeError("gunicorn exited during startup")
+            try:
+                conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=2)
+                conn.request("GET", "/api/health")
+                if conn.getresponse().status == 200:
+                    return
+            except OSError:
+                time.sleep(0.2)
+        raise RuntimeError("gunicorn did not become ready in time")
+
+    def worker_pids(self) -> List[int]:
+        try:
+            with open(f"/proc/{self.proc.pid}/task/{self.proc.pid}/children") as f:
+                return [int(p) for p in f.read().split()]
+        except OSError:
+            return []
+
+    def stop(self) -> None:
+        if self.proc.poll() is None:
+            self.proc.send_signal(signal.SIGTERM)
+            try:
+                self.proc.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+
+
+def _rss_mb(pid: int) -> Optional[float]:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        return None
+    return None
+
+
+# --- load generation ---------------------------------------
+
+DEFAULT_MIX = {"stores": 1, "forecast": 6, "explain": 3}
+
+
+def _request_for(kind: str, store_id: int) -> Tuple[str, str, Optional[bytes]]:
+    if kind == "stores":
+        return "GET", "/api/stores", None
+    if kind == "forecast":
+        return "GET", f"/api/forecast/{store_id}", None
+    body = json.dumps({"store_id": store_id}).encode()
+    return "POST", "/api/explain_forecast", body
+
+
+def run_load(
+    port: int,
+    store_ids: List[int],
+    *,
+    concurrency: int,
+    duration: float,
+    rate: Optional[float] = None,
+    mix: Optional[Dict[str, int]] = None,
+    hot_fraction: float = 0.2,
+    seed: int = 0,
+    rss_pids: Optional[List[int]] = None,
+) -> Dict[str, Any]:
+    """
+    Run `concurrency` closed-loop clients for `duration` seconds.
+
+    Each client sends a request, waits for the response, then sends the
+    next; with `rate` set, the total request rate is capped by spacing
+    each client's sends at concurrency / rate seconds. Store ids are
+    skewed: half the requests hit the first `hot_fraction` of stores.
+    """
+    mix = mix or DEFAULT_MIX
+    kinds = list(mix)
+    weights = [mix[k] for k in kinds]
+    hot = store_ids[: max(1, int(len(store_ids) * hot_fraction))]
+
+    per_kind = {k: LatencyHistogram() for k in kinds}
+    errors = {k: 0 for k in kinds}
+    status_counts: Dict[int, int] = {}
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+    interval = concurrency / rate if rate else 0.0
+
+    rss_samples: List[Dict[str, Any]] = []
+    t_start = time.perf_counter()
+
+    def sample_rss() -> None:
+        while time.perf_counter() < stop_at:
+            if rss_pids:
+                rss_samples.append(
+                    {
+                        "t": round(time.perf_counter() - t_start, 2),
+                        "rss_mb": {str(pid): _rss_mb(pid) for pid in rss_pids},
+                    }
+                )
+            time.sleep(1.0)
+
+    def client(idx: int) -> None:
+        rng = random.Random(seed * 1000 + idx)
+        local = {k: LatencyHistogram() for k in kinds}
+        local_errors = {k: 0 for k in kinds}
+        local_status: Dict[int, int] = {}
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        next_send = time.perf_counter()
+
+        while time.perf_counter() < stop_at:
+            if interval:
+                delay = next_send - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                next_send += interval
+
+            kind = rng.choices(kinds, weights)[0]
+            sid = rng.choice(hot) if rng.random() < 0.5 else rng.choice(store_ids)
+            method, path, body = _request_for(kind, sid)
+            headers = {"Content-Type": "application/json"} if body else {}
+
+            t0 = time.perf_counter()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                resp = conn.getresponse()
+                resp.read()
+                status = resp.status
+            except (OSError, http.client.HTTPException):
+                status = 599
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+            local[kind].record(time.perf_counter() - t0)
+            local_status[status] = local_status.get(status, 0) + 1
+            if status >= 500:
+                local_errors[kind] += 1
+
+        conn.close()
+        with lock:
+            for k in kinds:
+                per_kind[k].merge(local[k])
+                errors[k] += local_errors[k]
+            for s, n in local_status.items():
+                status_counts[s] = status_counts.get(s, 0) + n
+
+    sampler = threading.Thread(target=sample_rss, daemon=True)
+    sampler.start()
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t_start
+    sampler.join(timeout=2)
+
+    overall = LatencyHistogram()
+    for h in per_kind.values():
+        overall.merge(h)
+    total_errors = sum(errors.values())
+
+    return {
+        "concurrency": concurrency,
+        "target_rate": rate,
+        "duration_s": round(elapsed, 2),
+        "requests": overall.total,
+        "throughput_rps": overall.total / elapsed if elapsed else 0.0,
+        "error_rate": total_errors / overall.total if overall.total else 0.0,
+        "status_counts": {str(k): v for k, v in sorted(status_counts.items())},
+        "latency": overall.summary(),
+        "latency_by_endpoint": {
+            k: dict(per_kind[k].summary(), errors=errors[k]) for k in kinds
+        },
+        "histogram_ms": overall.buckets(),
+        "rss_samples": rss_samples,
+    }
+
+
+def find_knee(points: List[Dict[str, Any]], latency_factor: float = 2.0,
+              throughput_gain: float = 1.1) -> Optional[Dict[str, Any]]:
+    """
+    The knee of the latency curve: the last concurrency level before p99
+    grows by more than `latency_factor` while throughput grows by less
+    than `throughput_gain` (i.e. extra load only adds queueing).
+    """
+    for prev, cur in zip(points, points[1:]):
+        p_prev, p_cur = prev["latency"]["p99_ms"], cur["latency"]["p99_ms"]
+        if not p_prev or not p_cur:
+            continue
+        lat_ratio = p_cur / p_prev
+        tput_ratio = cur["throughput_rps"] / prev["throughput_rps"] if prev["throughput_rps"] else 0
+        if lat_ratio > latency_factor and tput_ratio < throughput_gain:
+            return {
+                "concurrency": prev["concurrency"],
+                "throughput_rps": prev["throughput_rps"],
+                "p99_ms": p_prev,
+                "next_concurrency": cur["concurrency"],
+                "next_p99_ms": p_cur,
+            }
+    return None
+
+
+def _print_point(p: Dict[str, Any]) -> None:
+    lat = p["latency"]
+    print(
+        f"  c={p['concurrency']:<4} {p['throughput_rps']:8.1f} req/s  "
+        f"p50 {lat['p50_ms'] or 0:8.2f}  p95 {lat['p95_ms'] or 0:8.2f}  "
+        f"p99 {lat['p99_ms'] or 0:8.2f}  max {lat['max_ms'] or 0:8.2f} ms  "
+        f"errors {p['error_rate']:.2%}"
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Closed-loop HTTP load test of the forecaster API.")
+    parser.add_argument("--stores", type=int, default=3000, help="synthetic fleet size")
+    parser.add_argument("--months", type=int, default=60)
+    parser.add_argument("--artifacts-root", default=os.path.join(tempfile.gettempdir(), "forecaster_bench"))
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn workers")
+    parser.add_argument("--threads", type=int, default=4, help="threads per gunicorn worker")
+    parser.add_argument("--concurrency", type=int, default=8, help="closed-loop clients")
+    parser.add_argument("--rate", type=float, default=None, help="cap on total requests/s")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per run")
+    parser.add_argument("--warmup", type=float, default=10.0,
+                        help="unmeasured seconds of load before the first run")
+    parser.add_argument("--mix", default="stores=1,forecast=6,explain=3",
+                        help="request mix weights, e.g. stores=1,forecast=6,explain=3")
+    parser.add_argument("--sweep", help="comma-separated concurrency levels; reports the knee")
+    parser.add_argument("--out", default="loadtest_results.json")
+    args = parser.parse_args(argv)
+
+    mix = {k: int(v) for k, v in (part.split("=") for part in args.mix.split(","))}
+    unknown = set(mix) - set(DEFAULT_MIX)
+    if unknown:
+        parser.error(f"unknown mix entries: {sorted(unknown)}")
+
+    artifacts = ensure_artifacts(args.artifacts_root, args.stores, args.months)
+
+    import pandas as pd
+
+    store_ids = [
+        int(s) for s in pd.read_pickle(
+            os.path.join(artifacts, "features_latest_per_store_v3.pkl")
+        )["Store Number"].unique()
+    ]
+
+    server = GunicornServer(artifacts, args.workers, args.threads)
+    try:
+        server.wait_ready()
+        levels = [int(c) for c in args.sweep.split(",")] if args.sweep else [args.concurrency]
+        points: List[Dict[str, Any]] = []
+
+        print(f"gunicorn: {args.workers} worker(s) x {args.threads} thread(s), {args.stores} stores")
+        if args.warmup > 0:
+            # Enough parallel connections to reach every worker, so each one
+            # pays its artifact-loading cost before anything is measured.
+            run_load(
+                server.port, store_ids,
+                concurrency=max(4, 2 * args.workers * args.threads),
+                duration=args.warmup, mix=mix,
+            )
+        for level in levels:
+            point = run_load(
+                server.port, store_ids,
+                concurrency=level, duration=args.duration, rate=args.rate, mix=mix,
+                rss_pids=server.worker_pids(),
+            )
+            points.append(point)
+            _print_point(point)
+
+        report: Dict[str, Any] = {
+            "config": {
+                "stores": args.stores,
+                "workers": args.workers,
+                "threads": args.threads,
+                "mix": mix,
+                "rate": args.rate,
+                "duration": args.duration,
+            },
+            "runs": points,
+        }
+        if args.sweep:
+            knee = find_knee(points)
+            report["knee"] = knee
+            if knee:
+                print(
+                    f"Knee at concurrency {knee['concurrency']}: "
+                    f"{knee['throughput_rps']:.1f} req/s, p99 {knee['p99_ms']:.2f} ms"
+                )
+            else:
+                print("No knee found in the swept range; try higher concurrency.")
+
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved {args.out}")
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
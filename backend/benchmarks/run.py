@@ -0,0 +1,259 @@
+# backend/benchmarks/run.py
+#
+# Benchmark suite over synthetic artifacts. For each fleet size it
+# generates (or reuses) an artifact directory, then runs the service code
+# paths and every Flask route in a fresh subprocess pointed at those
+# artifacts, so module-level caches never leak between sizes.
+#
+#   cd backend
+#   python -m benchmarks.run --stores 3000,10000,100000 --out bench.json
+#   python -m benchmarks.run --stores 3000 --compare bench.json --fail-on-regression
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.synthetic import ensure_artifacts
+
+
+def timed(fn: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    """Call `fn` `repeat` times; return latency stats in milliseconds."""
+    samples = np.empty(repeat)
+    for i in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples[i] = (time.perf_counter() - t0) * 1000.0
+    return {
+        "n": repeat,
+        "mean_ms": float(samples.mean()),
+        "p50_ms": float(np.percentile(samples, 50)),
+        "p95_ms": float(np.percentile(samples, 95)),
+        "max_ms": float(samples.max()),
+    }
+
+
+def _cold(fn: Callable[[], Any]) -> float:
+    t0 = time.perf_counter()
+    fn()
+    return (time.perf_counter() - t0) * 1000.0
+
+
+def run_single(repeat: int, seed: int = 0) -> Dict[str, Any]:
+    """
+    Benchmark the service against the artifacts in FORECASTER_MODELS_DIR.
+    Runs inside the per-size subprocess.
+    """
+    from app import create_app
+    from model_utils import (
+        build_feature_vector_for_store,
+        get_history_df,
+        get_latest_features_df,
+        get_model,
+    )
+    from services.analytics_service import build_forecast_context
+    from services.forecast_service import forecast_for_store
+    from services.llm_service import explain_forecast
+    from services.store_service import get_store_list
+
+    rng = random.Random(seed)
+    result: Dict[str, Any] = {"cold_ms": {}, "functions": {}, "routes": {}}
+
+    # Artifact loading (first call pays the unpickling cost)
+    result["cold_ms"]["load_model"] = _cold(get_model)
+    result["cold_ms"]["load_latest_features"] = _cold(get_latest_features_df)
+    result["cold_ms"]["load_history"] = _cold(get_history_df)
+
+    store_ids = [int(s) for s in get_latest_features_df()["Store Number"].unique()]
+    sample = [rng.choice(store_ids) for _ in range(repeat)]
+    it = iter(sample * 4)
+
+    def next_store() -> int:
+        nonlocal it
+        try:
+            return next(it)
+        except StopIteration:
+            it = iter(sample * 4)
+            return next(it)
+
+    sid = sample[0]
+    prediction = float(forecast_for_store(sid))
+    context = build_forecast_context(sid, prediction)
+
+    f = result["functions"]
+    f["build_feature_vector_for_store"] = timed(lambda: build_feature_vector_for_store(next_store()), repeat)
+    f["forecast_for_store"] = timed(lambda: forecast_for_store(next_store()), repeat)
+    f["build_forecast_context"] = timed(lambda: build_forecast_context(next_store(), prediction), repeat)
+    f["get_store_list"] = timed(get_store_list, max(3, repeat // 20))
+    f["explain_forecast"] = timed(lambda: explain_forecast(context), repeat)
+
+    client = create_app().test_client()
+
+    def get(path: str) -> Callable[[], Any]:
+        def call() -> None:
+            r = client.get(path() if callable(path) else path)
+            if r.status_code >= 500:
+                raise RuntimeError(f"{r.status_code} from {r.request.path}: {r.get_data(as_text=True)[:200]}")
+        return call
+
+    def post(path: str, body: Callable[[], Dict[str, Any]]) -> Callable[[], Any]:
+        def call() -> None:
+            r = client.post(path, json=body())
+            if r.status_code >= 500:
+                raise RuntimeError(f"{r.status_code} from {path}: {r.get_data(as_text=True)[:200]}")
+        return call
+
+    r = result["routes"]
+    result["cold_ms"]["route_rankings"] = _cold(get("/api/rankings"))
+    result["cold_ms"]["route_history"] = _cold(get(f"/api/stores/{sid}/history"))
+
+    r["GET /api/health"] = timed(get("/api/health"), repeat)
+    r["GET /api/stores"] = timed(get("/api/stores"), max(3, repeat // 20))
+    r["GET /api/forecast/<id>"] = timed(get(lambda: f"/api/forecast/{next_store()}"), repeat)
+    r["POST /api/explain_forecast"] = timed(
+        post("/api/explain_forecast", lambda: {"store_id": next_store()}), repeat
+    )
+    r["GET /api/stores/<id>/history?grain=year"] = timed(
+        get(lambda: f"/api/stores/{next_store()}/history?grain=year"), repeat
+    )
+    r["GET /api/rankings"] = timed(get("/api/rankings?metric=forecast_vs_6&n=25"), repeat)
+    r["POST /api/scenarios (100 stores x 10)"] = timed(
+        post(
+            "/api/scenarios",
+            lambda: {
+                "store_ids": sample[:100],
+                "scenarios": [
+                    {"name": f"lag1_{i}", "multipliers": {"Sale (Dollars)_Lag_1": 0.9 + i / 50}}
+                    for i in range(10)
+                ],
+            },
+        ),
+        max(3, repeat // 10),
+    )
+    r["GET /api/metrics"] = timed(get("/api/metrics"), repeat)
+
+    return result
+
+
+def _run_size(artifacts_dir: str, repeat: int, seed: int) -> Dict[str, Any]:
+    env = dict(os.environ, FORECASTER_MODELS_DIR=artifacts_dir)
+    env.pop("RESULT_STORE_PATH", None)  # measure compute, not the shared store
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    proc = subprocess.run(
+        [sys.executable, "-m", "benchmarks.run", "--single", "--repeat", str(repeat), "--seed", str(seed)],
+        cwd=backend_dir,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Benchmark subprocess failed:\n{proc.stderr}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Return 'size/section/name: old -> new' lines for p50 slowdowns above threshold."""
+    regressions: List[str] = []
+    for size, res in current["results"].items():
+        base = baseline.get("results", {}).get(size)
+        if not base:
+            continue
+        for section in ("functions", "routes"):
+            for name, stats in res.get(section, {}).items():
+                old = base.get(section, {}).get(name)
+                if not old or old["p50_ms"] <= 0:
+                    continue
+                ratio = stats["p50_ms"] / old["p50_ms"]
+                if ratio > threshold:
+                    regressions.append(
+                        f"{size}/{section}/{name}: p50 {old['p50_ms']:.3f}ms -> "
+                        f"{stats['p50_ms']:.3f}ms ({ratio:.2f}x)"
+                    )
+    return regressions
+
+
+def _print_table(results: Dict[str, Any]) -> None:
+    for size, res in results.items():
+        print(f"\n== {size} stores ==")
+        for section in ("cold_ms", "functions", "routes"):
+            for name, stats in res[section].items():
+                if section == "cold_ms":
+                    print(f"  [cold] {name:<44} {stats:10.2f} ms")
+                else:
+                    print(f"  {name:<51} p50 {stats['p50_ms']:9.3f}  p95 {stats['p95_ms']:9.3f} ms")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Forecaster benchmark suite.")
+    parser.add_argument("--stores", default="3000",
+                        help="comma-separated fleet sizes, e.g. 3000,10000,100000")
+    parser.add_argument("--months", type=int, default=60)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--artifacts-root", default=os.path.join(tempfile.gettempdir(), "forecaster_bench"),
+                        help="where synthetic artifacts are generated / reused")
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--compare", help="baseline results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="p50 slowdown ratio reported as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--single", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.single:
+        print(json.dumps(run_single(args.repeat, args.seed)))
+        return
+
+    import pandas as pd
+    import xgboost
+
+    results: Dict[str, Any] = {}
+    for n_stores in [int(s) for s in args.stores.split(",") if s.strip()]:
+        artifacts = ensure_artifacts(args.artifacts_root, n_stores, args.months, args.seed)
+        print(f"Benchmarking {n_stores} stores ({artifacts}) ...", flush=True)
+        results[str(n_stores)] = _run_size(artifacts, args.repeat, args.seed)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "xgboost": xgboost.__version__,
+            "cpu_count": os.cpu_count(),
+            "months": args.months,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+
+    _print_table(results)
+    print(f"\nSaved {args.out}")
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) vs {args.compare}:")
+            for line in regressions:
+                print(f"  {line}")
+            if args.fail_on_regression:
+                sys.exit(1)
+        else:
+            print(f"\nNo regressions vs {args.compare} (threshold {args.threshold}x).")
+
+
+if __name__ == "__main__":
+    main()
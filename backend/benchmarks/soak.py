@@ -0,0 +1,220 @@
+# backend/benchmarks/soak.py
+#
+# Long-running soak test for memory growth. Drives create_app() through
+# the Flask test client with a weighted mix of routes against synthetic
+# artifacts, takes a tracemalloc snapshot every --interval seconds and
+# compares it with the post-warm-up baseline and the previous snapshot.
+# Exits non-zero when retained (traced) memory grows past --max-growth-mb.
+#
+#   cd backend
+#   python -m benchmarks.soak --stores 3000 --duration 3600 --interval 300
+#   python -m benchmarks.soak --duration 14400 --max-growth-mb 16 --out soak.json
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks.synthetic import ensure_artifacts
+
+
+DEFAULT_MIX = {
+    "health": 1,
+    "stores": 1,
+    "forecast": 6,
+    "explain": 3,
+    "history": 2,
+    "rankings": 1,
+    "anomalies": 1,
+    "similar": 1,
+}
+
+
+def _rss_mb() -> Optional[float]:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        return None
+    return None
+
+
+def _parse_mix(raw: Optional[str]) -> Dict[str, int]:
+    if not raw:
+        return dict(DEFAULT_MIX)
+    mix: Dict[str, int] = {}
+    for part in raw.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in DEFAULT_MIX:
+            raise ValueError(f"Unknown route {name!r} in --mix; expected {list(DEFAULT_MIX)}.")
+        mix[name.strip()] = int(weight or 1)
+    return mix
+
+
+def _requests(client: Any, store_ids: List[int]) -> Dict[str, Callable[[random.Random], Any]]:
+    """One callable per mix entry; each sends a request for a random store."""
+    def pick(rng: random.Random) -> int:
+        return rng.choice(store_ids)
+
+    return {
+        "health": lambda rng: client.get("/api/health"),
+        "stores": lambda rng: client.get("/api/stores"),
+        "forecast": lambda rng: client.get(f"/api/forecast/{pick(rng)}"),
+        "explain": lambda rng: client.post("/api/explain_forecast", json={"store_id": pick(rng)}),
+        "history": lambda rng: client.get(
+            f"/api/stores/{pick(rng)}/history?grain={rng.choice(['month', 'quarter', 'year'])}"
+        ),
+        "rankings": lambda rng: client.get("/api/rankings?metric=forecast_vs_6&n=25"),
+        "anomalies": lambda rng: client.get(f"/api/anomalies?store_id={pick(rng)}"),
+        "similar": lambda rng: client.get(f"/api/stores/{pick(rng)}/similar?k=10"),
+    }
+
+
+def run_soak(
+    *,
+    duration: float,
+    interval: float,
+    warmup: float,
+    mix: Dict[str, int],
+    frames: int = 1,
+    top: int = 10,
+    seed: int = 0,
+    log: Callable[[str], None] = print,
+) -> Dict[str, Any]:
+    """
+    Run the soak against the artifacts in FORECASTER_MODELS_DIR and return
+    the report: per-interval traced / RSS memory and the sites that grew.
+    """
+    from alloc_tracking import diff_stats, reset_baseline, start_tracing, take_snapshot, traced_memory
+    from app import create_app
+    from model_utils import get_latest_feature_matrix
+
+    rng = random.Random(seed)
+    client = create_app().test_client()
+    store_ids = [int(s) for s in get_latest_feature_matrix().store_ids]
+    calls = _requests(client, store_ids)
+    names = [n for n in mix for _ in range(mix[n])]
+
+    counts: Dict[str, int] = {n: 0 for n in mix}
+    errors: Dict[str, int] = {n: 0 for n in mix}
+
+    def drive(seconds: float) -> None:
+        end = time.perf_counter() + seconds
+        while time.perf_counter() < end:
+            name = rng.choice(names)
+            response = calls[name](rng)
+            counts[name] += 1
+            if response.status_code >= 500:
+                errors[name] += 1
+            response.close()
+
+    # Warm-up fills every per-version cache before the baseline is taken.
+    start_tracing(frames)
+    log(f"Warming up for {warmup:.0f}s ...")
+    drive(warmup)
+    reset_baseline()
+    baseline = take_snapshot()
+    base_mem = traced_memory()["current_mb"]
+    log(f"Baseline: traced {base_mem:.2f} MB, RSS {_rss_mb() or 0:.1f} MB")
+
+    samples: List[Dict[str, Any]] = []
+    previous = baseline
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < duration:
+        drive(min(interval, duration - (time.perf_counter() - t0)))
+        snapshot = take_snapshot()
+        mem = traced_memory()["current_mb"]
+        sample = {
+            "elapsed_s": round(time.perf_counter() - t0, 1),
+            "requests": sum(counts.values()),
+            "traced_mb": mem,
+            "growth_mb": round(mem - base_mem, 3),
+            "rss_mb": _rss_mb(),
+            "top_growth_since_last": diff_stats(previous, snapshot, top),
+        }
+        samples.append(sample)
+        previous = snapshot
+        log(
+            f"[{sample['elapsed_s']:>8.1f}s] {sample['requests']:>9} req  "
+            f"traced {mem:8.2f} MB ({sample['growth_mb']:+.2f})  RSS {sample['rss_mb'] or 0:8.1f} MB"
+        )
+        for s in sample["top_growth_since_last"][:3]:
+            log(f"      +{s['size_diff_kb']:>9.1f} KB  {s['site'][0]}")
+
+    final = previous
+    return {
+        "duration_s": duration,
+        "interval_s": interval,
+        "warmup_s": warmup,
+        "mix": mix,
+        "requests": counts,
+        "errors_5xx": errors,
+        "baseline_traced_mb": base_mem,
+        "final_growth_mb": samples[-1]["growth_mb"] if samples else 0.0,
+        "samples": samples,
+        "top_growth_since_baseline": diff_stats(baseline, final, top),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Memory-growth soak test over the Flask app.")
+    parser.add_argument("--stores", type=int, default=3000)
+    parser.add_argument("--months", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--artifacts-root", default=os.path.join(tempfile.gettempdir(), "forecaster_bench"),
+                        help="where synthetic artifacts are generated / reused")
+    parser.add_argument("--duration", type=float, default=3600, help="seconds of traffic after warm-up")
+    parser.add_argument("--interval", type=float, default=300, help="seconds between snapshots")
+    parser.add_argument("--warmup", type=float, default=60, help="seconds of traffic before the baseline")
+    parser.add_argument("--mix", help="route weights, e.g. forecast=6,explain=3,stores=1")
+    parser.add_argument("--frames", type=int, default=1, help="traceback depth recorded per allocation")
+    parser.add_argument("--top", type=int, default=10, help="allocation sites reported per snapshot")
+    parser.add_argument("--max-growth-mb", type=float, default=32.0,
+                        help="fail when traced memory grows more than this after warm-up")
+    parser.add_argument("--out", help="write the JSON report here")
+    args = parser.parse_args(argv)
+
+    # Must be set before app / model_utils are imported by run_soak.
+    os.environ["FORECASTER_MODELS_DIR"] = ensure_artifacts(
+        args.artifacts_root, args.stores, args.months, args.seed
+    )
+    os.environ.pop("RESULT_STORE_PATH", None)  # soak the compute paths
+
+    report = run_soak(
+        duration=args.duration,
+        interval=args.interval,
+        warmup=args.warmup,
+        mix=_parse_mix(args.mix),
+        frames=args.frames,
+        top=args.top,
+        seed=args.seed,
+    )
+    report["max_growth_mb"] = args.max_growth_mb
+    report["passed"] = report["final_growth_mb"] <= args.max_growth_mb
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+    print("\nTop growth since baseline:")
+    for s in report["top_growth_since_baseline"]:
+        print(f"  +{s['size_diff_kb']:>9.1f} KB  {s['count_diff']:>+7} blocks  {s['site'][0]}")
+
+    verdict = "PASS" if report["passed"] else "FAIL"
+    print(
+        f"\n{verdict}: traced memory grew {report['final_growth_mb']:+.2f} MB "
+        f"(limit {args.max_growth_mb} MB) over {sum(report['requests'].values())} requests."
+    )
+    if not report["passed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+# backend/benchmarks/synthetic.py
+#
+# Synthetic artifact generator: a store-month history table, latest and
+# all-months feature tables with the same feature_cols as
+# model_config_v3.json, and a small trained XGBoost model, for any number
+# of stores x months. Point the service at the output with
+# FORECASTER_MODELS_DIR.
+#
+#   cd backend
+#   python -m benchmarks.synthetic --stores 10000 --months 60 --out /tmp/synth_10k
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import pickle
+import time
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from services.feature_derivation import calendar_features
+
+
+REPO_CONFIG_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models", "model_config_v3.json"
+)
+
+# Month-of-year demand multipliers (Jan..Dec), roughly liquor-shaped.
+SEASONALITY = np.array([0.85, 0.88, 0.95, 0.97, 1.02, 1.03, 1.06, 1.00, 0.96, 1.00, 1.12, 1.35])
+
+
+def generate_history(
+    n_stores: int,
+    n_months: int,
+    *,
+    end_month: str = "2024-08",
+    seed: int = 0,
+) -> pd.DataFrame:
+    """
+    One row per (store, month) with monthly sales, in the same shape as
+    store_month_history_v1.pkl: Store Number, InvoiceMonth, Sale (Dollars).
+
+    ~15% of stores open late (some with < 6 months of history), ~8% close
+    before the last month and ~1% of store-months are missing.
+    """
+    rng = np.random.default_rng(seed)
+    end = np.datetime64(end_month, "M").astype(np.int64)
+    months = end - n_months + 1 + np.arange(n_months)
+
+    store_ids = np.arange(1, n_stores + 1, dtype=np.int64) + 1000
+    first = np.where(rng.random(n_stores) < 0.15, rng.integers(0, n_months, n_stores), 0)
+    last = np.where(
+        rng.random(n_stores) < 0.08,
+        np.maximum(first, rng.integers(0, n_months, n_stores)),
+        n_months - 1,
+    )
+
+    level = rng.lognormal(mean=9.3, sigma=1.0, size=n_stores)
+    trend = rng.normal(0.0, 0.006, n_stores)
+    noise = rng.uniform(0.05, 0.40, n_stores)
+
+    t = np.arange(n_months)
+    moy = (months % 12).astype(int)
+    sales = (
+        level[:, None]
+        * SEASONALITY[moy][None, :]
+        * np.exp(trend[:, None] * t[None, :])
+        * rng.lognormal(0.0, 1.0, (n_stores, n_months)) ** noise[:, None]
+    )
+
+    active = (t[None, :] >= first[:, None]) & (t[None, :] <= last[:, None])
+    active &= rng.random((n_stores, n_months)) > 0.01
+    s_idx, m_idx = np.nonzero(active)
+
+    return pd.DataFrame(
+        {
+            "Store Number": store_ids[s_idx],
+            "InvoiceMonth": months[m_idx].astype("datetime64[M]").astype("datetime64[ns]"),
+            "Sale (Dollars)": np.round(sales[s_idx, m_idx], 2),
+        }
+    )
+
+
+def build_feature_tables(history: pd.DataFrame, feature_cols) -> Dict[str, pd.DataFrame]:
+    """
+    Derive v3-style features from a history table.
+
+    Rolling windows include the current month (RollSum_3 = this month +
+    Lag_1 + Lag_2, as in the real tables). The all-months table's
+    'Sale (Dollars)' is the next month's sales, i.e. what the model predicts.
+    """
+    sales_col = "Sale (Dollars)"
+    df = history.rename(columns={"InvoiceMonth": "MonthStart"})
+    df = df.sort_values(["Store Number", "MonthStart"], ignore_index=True)
+    s = df[sales_col]
+    g = s.groupby(df["Store Number"])
+
+    out = pd.DataFrame({"Store Number": df["Store Number"], "MonthStart": df["MonthStart"]})
+    out["Year"] = df["MonthStart"].dt.year
+    out["Month"] = df["MonthStart"].dt.month
+    for name, values in calendar_features(out["Year"].to_numpy(), out["Month"].to_numpy()).items():
+        out[name] = values
+
+    for k in (1, 2, 3, 6, 12):
+        out[f"{sales_col}_Lag_{k}"] = g.shift(k)
+
+    cs = g.cumsum()
+    cs_g = cs.groupby(df["Store Number"])
+    for w in (3, 6, 12):
+        roll_sum = cs - cs_g.shift(w).fillna(0.0)
+        out[f"{sales_col}_RollMean_{w}"] = roll_sum / w
+        out[f"{sales_col}_RollSum_{w}"] = roll_sum
+
+    store_stats = g.agg(["mean", "std", "sum", "median", "size"])
+    per_row = store_stats.reindex(df["Store Number"]).reset_index(drop=True)
+    out["store_mean_sales"] = per_row["mean"]
+    out["store_std_sales"] = per_row["std"].fillna(0.0)
+    out["store_total_sales"] = per_row["sum"]
+    out["store_median_sales"] = per_row["median"]
+    out["months_active"] = per_row["size"]
+    out["coef_var"] = out["store_std_sales"] / out["store_mean_sales"]
+
+    totals = s.groupby(df["MonthStart"]).sum().sort_index()
+    market = pd.DataFrame({"total_monthly_sales": totals})
+    for w in (3, 12):
+        r = totals.rolling(w, min_periods=1)
+        market[f"total_roll{w}_mean"] = r.mean()
+        market[f"total_roll{w}_std"] = r.std().fillna(0.0)
+        market[f"total_roll{w}_cv"] = market[f"total_roll{w}_std"] / market[f"total_roll{w}_mean"]
+    market = market.reindex(df["MonthStart"]).reset_index(drop=True)
+    for c in market.columns:
+        out[c] = market[c]
+
+    out["store_market_share"] = s / out["total_monthly_sales"]
+    for w in (3, 12):
+        mean = out[f"{sales_col}_RollMean_{w}"]
+        out[f"store_vs_market_roll{w}_ratio"] = mean / out[f"total_roll{w}_mean"]
+        out[f"store_vs_market_roll{w}_diff"] = mean - out[f"total_roll{w}_mean"]
+
+    missing = [c for c in feature_cols if c not in out.columns]
+    if missing:
+        raise KeyError(f"Synthetic pipeline does not produce features: {missing}")
+
+    out = out[["Store Number", "MonthStart"] + list(feature_cols)]
+
+    target = g.shift(-1)
+    all_df = out.assign(**{sales_col: target})
+    all_df = all_df[target.notna().to_numpy()].reset_index(drop=True)
+
+    latest = out.groupby("Store Number", sort=True).tail(1).reset_index(drop=True)
+    return {"all": all_df, "latest": latest}
+
+
+def generate_artifacts(
+    out_dir: str,
+    n_stores: int = 3000,
+    n_months: int = 60,
+    *,
+    seed: int = 0,
+    n_estimators: int = 60,
+    max_train_rows: int = 200_000,
+) -> Dict[str, Any]:
+    """
+    Write a full synthetic artifact directory and return a summary dict.
+    """
+    t0 = time.perf_counter()
+    os.makedirs(out_dir, exist_ok=True)
+
+    with open(REPO_CONFIG_PATH, "r") as f:
+        cfg = json.load(f)
+    feature_cols = cfg["feature_cols"]
+
+    history = generate_history(n_stores, n_months, seed=seed)
+    tables = build_feature_tables(history, feature_cols)
+
+    from xgboost import XGBRegressor
+
+    train = tables["all"]
+    if len(train) > max_train_rows:
+        train = train.sample(max_train_rows, random_state=seed)
+    model = XGBRegressor(
+        n_estimators=n_estimators, max_depth=6, learning_rate=0.1, tree_method="hist"
+    )
+    model.fit(train[feature_cols].astype(float), train["Sale (Dollars)"])
+
+    history.to_pickle(os.path.join(out_dir, "store_month_history_v1.pkl"))
+    tables["latest"].to_pickle(os.path.join(out_dir, "features_latest_per_store_v3.pkl"))
+    tables["all"].to_pickle(os.path.join(out_dir, "features_all_stable_v3.pkl"))
+    with open(os.path.join(out_dir, "xgb_all_stable_v3.pkl"), "wb") as f:
+        pickle.dump(model, f)
+    with open(os.path.join(out_dir, "model_config_v3.json"), "w") as f:
+        json.dump(cfg, f, indent=2)
+
+    return {
+        "out_dir": out_dir,
+        "stores": n_stores,
+        "months": n_months,
+        "history_rows": int(len(history)),
+        "all_feature_rows": int(len(tables["all"])),
+        "seconds": round(time.perf_counter() - t0, 2),
+    }
+
+
+def ensure_artifacts(root: str, n_stores: int, n_months: int, seed: int = 0) -> str:
+    """Generate artifacts under `root` unless a matching set already exists."""
+    out_dir = os.path.join(root, f"synthetic_{n_stores}x{n_months}_s{seed}")
+    if not os.path.exists(os.path.join(out_dir, "xgb_all_stable_v3.pkl")):
+        generate_artifacts(out_dir, n_stores, n_months, seed=seed)
+    return out_dir
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description="Generate synthetic forecaster artifacts.")
+    parser.add_argument("--stores", type=int, default=3000)
+    parser.add_argument("--months", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--n-estimators", type=int, default=60)
+    parser.add_argument("--out", required=True, help="output artifact directory")
+    args = parser.parse_args(argv)
+
+    summary = generate_artifacts(
+        args.out, args.stores, args.months, seed=args.seed, n_estimators=args.n_estimators
+    )
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
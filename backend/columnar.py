@@ -0,0 +1,39 @@
+# backend/columnar.py
+#
+# Small helpers for writing tabular batch outputs (backtests, scoring
+# runs). Parquet needs pyarrow, which is not a service dependency, so
+# callers can fall back to CSV when it is missing.
+from __future__ import annotations
+
+import pandas as pd
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def resolve_format(fmt: str) -> str:
+    """
+    Return 'parquet' or 'csv'; 'parquet' degrades to 'csv' without pyarrow.
+    Callers that want to tell the user compare the result with `fmt`.
+    """
+    fmt = (fmt or "parquet").lower()
+    if fmt not in ("parquet", "csv"):
+        raise ValueError(f"Unsupported output format {fmt!r}; expected 'parquet' or 'csv'.")
+    if fmt == "parquet" and not parquet_available():
+        return "csv"
+    return fmt
+
+
+def write_frame(df: pd.DataFrame, base_path: str, fmt: str) -> str:
+    """Write `df` to `base_path` + extension and return the full path."""
+    path = f"{base_path}.{fmt}"
+    if fmt == "parquet":
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+    return path
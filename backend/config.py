@@ -14,3 +14,82 @@ CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173",                                   # Vite dev
     "http://127.0.0.1:5173",                                   # alt localhost
 ]
+
+# Optional shared result store (SQLite, WAL mode) so gunicorn workers share
+# computed forecasts / explanations and keep them across restarts.
+# Disabled when empty. Example: RESULT_STORE_PATH=/home/data/results.sqlite
+RESULT_STORE_PATH = os.environ.get("RESULT_STORE_PATH", "")
+
+# Serving mode: "sync" runs everything on the request thread (default);
+# "async" sends CPU-bound work (including rendering explanations) to a
+# bounded compute pool and sheds load per endpoint with 503 + Retry-After. Use with gthread workers, e.g.
+#   SERVING_MODE=async gunicorn -k gthread --threads 32 run:app
+SERVING_MODE = os.environ.get("SERVING_MODE", "sync").lower()
+COMPUTE_POOL_SIZE = int(os.environ.get("COMPUTE_POOL_SIZE", "0")) or (os.cpu_count() or 2)
+
+# Per-endpoint in-flight limits, e.g. "forecast=32,explain_forecast=16".
+# Endpoints not listed use the async-mode defaults (none in sync mode).
+ENDPOINT_CONCURRENCY = os.environ.get("ENDPOINT_CONCURRENCY", "")
+RETRY_AFTER_SECONDS = int(os.environ.get("RETRY_AFTER_SECONDS", "1"))
+
+# Per-endpoint request deadlines in milliseconds, e.g.
+# "forecast=5000,explain_forecast=20000" (merged over the built-in defaults).
+# A caller (or the proxy) may send a shorter budget in X-Request-Timeout-Ms;
+# work is abandoned between stages once the deadline has passed.
+REQUEST_DEADLINES_MS = os.environ.get("REQUEST_DEADLINES_MS", "")
+
+# Admission control: max requests in flight across all API routes in this
+# worker before new ones are shed with 503 (0 = off; async mode defaults to
+# 8x the compute pool). /api/health and /api/metrics are never shed.
+ADMISSION_MAX_IN_FLIGHT = int(os.environ.get("ADMISSION_MAX_IN_FLIGHT", "0"))
+
+# Optional custom store groups for /api/rollups?level=group, as a JSON file
+# {"group name": [store_id, ...], ...}. Groups may overlap.
+STORE_GROUPS_PATH = os.environ.get("STORE_GROUPS_PATH", "")
+
+# Build the all-months predicted-vs-actual matrix in the background at
+# startup, so as-of forecasts and /forecast/<id>/fit never wait on the model.
+ASOF_PRECOMPUTE_FIT = os.environ.get("ASOF_PRECOMPUTE_FIT", "").lower() in ("1", "true", "yes")
+
+# Derived-state snapshot (history index, fleet stats, forecast / driver /
+# anomaly tables, ...): loaded at startup when its key matches the
+# artifacts and code, otherwise rebuilt in the background and rewritten.
+# Defaults to the artifact directory; "off" disables it.
+DERIVED_SNAPSHOT_DIR = os.environ.get("DERIVED_SNAPSHOT_DIR", "")
+
+# Feature-drift thresholds (population stability index) for /api/drift and
+# the hot-swap gate: < WARN is stable, >= ALERT fails the gate.
+DRIFT_PSI_WARN = float(os.environ.get("DRIFT_PSI_WARN", "0.1"))
+DRIFT_PSI_ALERT = float(os.environ.get("DRIFT_PSI_ALERT", "0.25"))
+
+# Admin-only /api/debug/alloc (tracemalloc top allocators). Disabled (404)
+# unless a token is set; callers send it in the X-Debug-Token header.
+DEBUG_ALLOC_TOKEN = os.environ.get("DEBUG_ALLOC_TOKEN", "")
+# Start tracemalloc at startup with this many frames per traceback (0 = off;
+# the first /api/debug/alloc request starts it instead).
+TRACEMALLOC_FRAMES = int(os.environ.get("TRACEMALLOC_FRAMES", "0"))
+
+# Structured access log (one JSON line per /api request): a file path, "-"
+# for stdout, or empty to disable. Successful requests are sampled at
+# ACCESS_LOG_SAMPLE_RATE (0-1); errors and requests slower than
+# ACCESS_LOG_SLOW_MS are always logged. Lines are written by a background
+# thread; when its queue is full, lines are dropped (and counted in
+# /api/metrics) instead of slowing requests down.
+ACCESS_LOG_PATH = os.environ.get("ACCESS_LOG_PATH", "")
+ACCESS_LOG_SAMPLE_RATE = min(1.0, max(0.0, float(os.environ.get("ACCESS_LOG_SAMPLE_RATE", "0.1"))))
+ACCESS_LOG_SLOW_MS = float(os.environ.get("ACCESS_LOG_SLOW_MS", "1000"))
+ACCESS_LOG_QUEUE_SIZE = int(os.environ.get("ACCESS_LOG_QUEUE_SIZE", "10000"))
+
+# Multi-dataset serving. Every data route is also served per dataset as
+# /api/<dataset>/...; the unprefixed routes (and /api/<DEFAULT_DATASET>/...)
+# serve the default artifacts in FORECASTER_MODELS_DIR. Other datasets are
+# subdirectories of DATASETS_DIR holding the same artifact files (plus an
+# optional store_lookup.csv), e.g. DATASETS_DIR=/home/data/datasets with
+# /home/data/datasets/ohio/xgb_all_stable_v3.pkl, ...
+DEFAULT_DATASET = os.environ.get("DEFAULT_DATASET", "iowa").lower()
+DATASETS_DIR = os.environ.get("DATASETS_DIR", "")
+# Non-default datasets are loaded on first use and evicted after this many
+# idle seconds, or least-recently-used first while the worker's RSS is above
+# DATASET_MEMORY_LIMIT_MB (0 = no ceiling). The default is never evicted.
+DATASET_IDLE_SECONDS = float(os.environ.get("DATASET_IDLE_SECONDS", "1800"))
+DATASET_MEMORY_LIMIT_MB = float(os.environ.get("DATASET_MEMORY_LIMIT_MB", "0"))
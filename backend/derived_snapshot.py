@@ -0,0 +1,297 @@
+# backend/derived_snapshot.py
+#
+# Persist the derived structures (history table / index, store list,
+# fleet stats, forecast / driver / anomaly / interval tables, ...) to one
+# snapshot file, so a restarted or newly scaled-out worker loads them
+# instead of rebuilding each from the artifacts.
+#
+# The snapshot is keyed by the artifact version (model, feature tables,
+# history, config), the store lookup CSV, the code that builds the
+# structures and the pandas / numpy versions. A key mismatch means the
+# snapshot is ignored; the structures are rebuilt on a background thread
+# and a new snapshot is written atomically (temp file + rename).
+from __future__ import annotations
+
+import contextvars
+import glob
+import hashlib
+import os
+import pickle
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config import DEFAULT_DATASET, DERIVED_SNAPSHOT_DIR
+from metrics import register_metrics
+from model_utils import (
+    current_bundle,
+    current_dataset,
+    derived_items,
+    get_artifact_version,
+    install_derived,
+    on_dataset_load,
+)
+from store_lookup import lookup_path
+
+BASE_DIR = os.path.dirname(__file__)
+
+# Bump when the snapshot file layout changes.
+SNAPSHOT_FORMAT = 1
+
+# Source files whose builders end up in the snapshot.
+_CODE_GLOBS = ("model_utils.py", "store_lookup.py", "services/*.py")
+
+# dataset -> snapshot status
+_status: Dict[str, Dict[str, Any]] = {}
+_status_lock = threading.Lock()
+
+
+def snapshot_dir() -> Optional[str]:
+    """
+    Snapshot directory of the current dataset: its artifact directory, or
+    DERIVED_SNAPSHOT_DIR (with a subdirectory per non-default dataset).
+    """
+    if DERIVED_SNAPSHOT_DIR.lower() == "off":
+        return None
+    bundle = current_bundle()
+    if not DERIVED_SNAPSHOT_DIR:
+        return bundle.models_dir
+    if bundle.name == DEFAULT_DATASET:
+        return DERIVED_SNAPSHOT_DIR
+    return os.path.join(DERIVED_SNAPSHOT_DIR, bundle.name)
+
+
+def _file_stat(path: str) -> str:
+    try:
+        st = os.stat(path)
+        return f"{os.path.basename(path)}:{st.st_size}:{st.st_mtime_ns};"
+    except FileNotFoundError:
+        return f"{os.path.basename(path)}:missing;"
+
+
+def snapshot_key() -> str:
+    """Fingerprint of everything the snapshotted structures are built from."""
+    h = hashlib.sha1()
+    h.update(f"format={SNAPSHOT_FORMAT};artifacts={get_artifact_version()};".encode())
+    h.update(_file_stat(lookup_path()).encode())
+    h.update(f"py={sys.version_info[:2]};pandas={pd.__version__};numpy={np.__version__};".encode())
+    for pattern in _CODE_GLOBS:
+        for path in sorted(glob.glob(os.path.join(BASE_DIR, pattern))):
+            with open(path, "rb") as f:
+                h.update(f.read())
+    return h.hexdigest()[:16]
+
+
+def snapshot_path(key: Optional[str] = None) -> Optional[str]:
+    directory = snapshot_dir()
+    if directory is None:
+        return None
+    return os.path.join(directory, f"derived-{key or snapshot_key()}.pkl")
+
+
+def _set_status(**fields: Any) -> None:
+    with _status_lock:
+        status = _status.setdefault(
+            current_dataset(), {"state": "idle", "path": None, "entries": 0, "seconds": None}
+        )
+        status.update(fields)
+
+
+def snapshot_stats() -> Dict[str, Any]:
+    """Default dataset's status, plus "datasets" for the others loaded so far."""
+    with _status_lock:
+        stats = dict(_status.get(DEFAULT_DATASET, {"state": "idle"}))
+        others = {name: dict(s) for name, s in _status.items() if name != DEFAULT_DATASET}
+    if others:
+        stats["datasets"] = others
+    return stats
+
+
+# --- load / write ------------------------------------------
+
+def load_snapshot() -> bool:
+    """
+    Seed the derived cache from the snapshot for the current key. Returns
+    False when there is no matching (readable) snapshot.
+    """
+    key = snapshot_key()
+    path = snapshot_path(key)
+    if path is None or not os.path.exists(path):
+        return False
+
+    t0 = time.perf_counter()
+    try:
+        with open(path, "rb") as f:
+            payload = pickle.load(f)
+        if payload.get("format") != SNAPSHOT_FORMAT or payload.get("key") != key:
+            return False
+        items = {name: pickle.loads(blob) for name, blob in payload["entries"].items()}
+    except Exception:
+        import traceback
+
+        traceback.print_exc()
+        return False
+
+    install_derived(items)
+    _set_status(state="loaded", path=path, entries=len(items),
+                seconds=round(time.perf_counter() - t0, 3))
+    return True
+
+
+def write_snapshot() -> Optional[str]:
+    """
+    Write the _warm_targets() structures built so far for the current
+    version to the snapshot (atomically) and remove snapshots with other
+    keys. Per-request caches (as-of months, ranking orders, ...) and
+    structures that cannot be pickled are left out.
+    """
+    key = snapshot_key()
+    path = snapshot_path(key)
+    if path is None:
+        return None
+
+    persisted = {name for name, _ in _warm_targets()}
+    entries: Dict[str, bytes] = {}
+    skipped: List[str] = []
+    for name, value in derived_items().items():
+        if name not in persisted:
+            continue
+        try:
+            entries[name] = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            skipped.append(name)
+
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=".derived-", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(
+                {"format": SNAPSHOT_FORMAT, "key": key, "created_at": time.time(), "entries": entries},
+                f,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+        os.chmod(tmp, 0o644)  # mkstemp creates 0600; other workers' users must read it
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+    for old in glob.glob(os.path.join(directory, "derived-*.pkl")):
+        if old != path:
+            try:
+                os.unlink(old)
+            except OSError:
+                pass
+
+    _set_status(path=path, entries=len(entries), skipped=skipped)
+    return path
+
+
+# --- rebuild -----------------------------------------------
+
+def _warm_targets() -> List[Tuple[str, Callable[[], Any]]]:
+    """Structures built before a snapshot is written, in dependency order."""
+    from model_utils import get_history_df, get_latest_feature_matrix
+    from services.history_service import get_history_index
+    from services.store_service import get_cached_store_list
+    from services.analytics_service import get_active_fleet_table, get_fleet_stats
+    from services.forecast_service import get_forecast_table
+    from services.drivers_service import get_driver_table
+    from services.anomaly_service import get_anomaly_table
+    from services.similarity_service import get_similarity_index
+    from services.rollup_service import get_rollup_base
+    from services.drift_service import get_drift_reference, get_drift_report
+    from services.interval_service import get_interval_table
+
+    return [
+        ("history_df", get_history_df),
+        ("history_index", get_history_index),
+        ("store_list", get_cached_store_list),
+        ("latest_feature_matrix", get_latest_feature_matrix),
+        ("fleet_stats", get_fleet_stats),
+        ("forecast_table", get_forecast_table),
+        ("active_fleet", get_active_fleet_table),
+        ("driver_table", get_driver_table),
+        ("anomaly_table", get_anomaly_table),
+        ("similarity_index", get_similarity_index),
+        ("rollup_base", get_rollup_base),
+        ("drift_reference", get_drift_reference),
+        ("drift_report", get_drift_report),
+        ("interval_table", get_interval_table),
+    ]
+
+
+def _gate_drift() -> None:
+    """Run the drift gate on the features just loaded (failures are logged)."""
+    from services.drift_service import gate_loaded_features
+
+    try:
+        gate_loaded_features()
+    except Exception:
+        import traceback
+
+        traceback.print_exc()
+
+
+def rebuild_snapshot() -> Optional[str]:
+    """Build every snapshotted structure (failures are logged) and write the snapshot."""
+    t0 = time.perf_counter()
+    _set_status(state="building")
+    failed: List[str] = []
+    for name, build in _warm_targets():
+        try:
+            build()
+        except Exception:
+            import traceback
+
+            traceback.print_exc()
+            failed.append(name)
+    _gate_drift()
+    try:
+        path = write_snapshot()
+    except Exception:
+        import traceback
+
+        traceback.print_exc()
+        _set_status(state="error", failed=failed)
+        return None
+    _set_status(state="written", failed=failed, seconds=round(time.perf_counter() - t0, 3))
+    return path
+
+
+def load_or_rebuild_snapshot(background: bool = True) -> bool:
+    """
+    Startup (and dataset load) hook: load the current dataset's matching
+    snapshot, or rebuild and rewrite it (on a daemon thread unless
+    `background` is False), then run the drift gate on the loaded features.
+    With snapshots disabled only the gate runs. Returns True when a
+    snapshot was loaded.
+    """
+    if snapshot_dir() is None:
+        _set_status(state="disabled")
+        work = _gate_drift
+    elif load_snapshot():
+        _gate_drift()
+        return True
+    else:
+        work = rebuild_snapshot
+    if background:
+        # Run in a copy of this context so the work targets the same dataset.
+        ctx = contextvars.copy_context()
+        threading.Thread(
+            target=ctx.run, args=(work,), name="derived-snapshot", daemon=True
+        ).start()
+    else:
+        work()
+    return False
+
+
+register_metrics("derived_snapshot", snapshot_stats)
+on_dataset_load(load_or_rebuild_snapshot)
@@ -0,0 +1,25 @@
+# backend/metrics.py
+#
+# Tiny in-process metrics registry. Components register a provider that
+# returns a JSON-serializable dict; /api/metrics collects them all.
+from __future__ import annotations
+
+from typing import Any, Callable, Dict
+
+_providers: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+
+def register_metrics(name: str, provider: Callable[[], Dict[str, Any]]) -> None:
+    """Register (or replace) the metrics provider called `name`."""
+    _providers[name] = provider
+
+
+def collect_metrics() -> Dict[str, Any]:
+    """Snapshot every registered provider; a failing provider reports its error."""
+    out: Dict[str, Any] = {}
+    for name, provider in list(_providers.items()):
+        try:
+            out[name] = provider()
+        except Exception as exc:
+            out[name] = {"error": str(exc)}
+    return out
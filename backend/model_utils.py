@@ -1,68 +1,97 @@
 # backend/model_utils.py
 import os
+import gc
+import re
+import time
 import pickle
 import json
+import hashlib
+import threading
+import contextvars
+from contextlib import contextmanager
+import numpy as np
 import pandas as pd
 # any other imports you already had...
+from access_log import note_cache
+from config import (
+    DATASET_IDLE_SECONDS,
+    DATASET_MEMORY_LIMIT_MB,
+    DATASETS_DIR,
+    DEFAULT_DATASET,
+)
+from metrics import register_metrics
 
 # --- paths -------------------------------------------------
 
 BASE_DIR = os.path.dirname(__file__)          # .../backend
 MODELS_DIR = os.path.join(BASE_DIR, "models") # .../backend/models
 
-MODEL_PATH = os.path.join(MODELS_DIR, "xgb_all_stable_v3.pkl")
-FEATURES_LATEST_PATH = os.path.join(MODELS_DIR, "features_latest_per_store_v3.pkl")
-FEATURES_ALL_PATH = os.path.join(MODELS_DIR, "features_all_stable_v3.pkl")
-CONFIG_PATH = os.path.join(MODELS_DIR, "model_config_v3.json")
-HISTORY_PATH = os.path.join(MODELS_DIR, "store_month_history_v1.pkl")
+# Point the service at another artifact directory (e.g. synthetic
+# benchmark artifacts) without touching the files above.
+MODELS_DIR = os.environ.get("FORECASTER_MODELS_DIR") or MODELS_DIR
 
-_model_cache = None
-_features_latest_cache = None
-_features_all_cache = None
-_model_config_cache = None
+# Artifact file names; every dataset bundle directory holds the same set.
+MODEL_FILE = "xgb_all_stable_v3.pkl"
+FEATURES_LATEST_FILE = "features_latest_per_store_v3.pkl"
+FEATURES_ALL_FILE = "features_all_stable_v3.pkl"
+CONFIG_FILE = "model_config_v3.json"
+HISTORY_FILE = "store_month_history_v1.pkl"
+STORE_METADATA_FILE = "store_metadata.json"
+
+# Paths of the default dataset's artifacts.
+MODEL_PATH = os.path.join(MODELS_DIR, MODEL_FILE)
+FEATURES_LATEST_PATH = os.path.join(MODELS_DIR, FEATURES_LATEST_FILE)
+FEATURES_ALL_PATH = os.path.join(MODELS_DIR, FEATURES_ALL_FILE)
+CONFIG_PATH = os.path.join(MODELS_DIR, CONFIG_FILE)
+HISTORY_PATH = os.path.join(MODELS_DIR, HISTORY_FILE)
+STORE_METADATA_PATH = os.path.join(MODELS_DIR, STORE_METADATA_FILE)
 
-STORE_METADATA_PATH = os.path.join(MODELS_DIR, "store_metadata.json")
-_store_metadata_cache = None
 
 def get_store_metadata():
-    global _store_metadata_cache
-    if _store_metadata_cache is None:
+    bundle = current_bundle()
+    if bundle.store_metadata is None:
         try:
-            with open(STORE_METADATA_PATH, "r") as f:
-                _store_metadata_cache = json.load(f)
+            with open(bundle.path(STORE_METADATA_FILE), "r") as f:
+                bundle.store_metadata = json.load(f)
         except FileNotFoundError:
-            _store_metadata_cache = {}
-    return _store_metadata_cache
+            bundle.store_metadata = {}
+    return bundle.store_metadata
 
 
 def get_model():
-    global _model_cache
-    if _model_cache is None:
-        with open(MODEL_PATH, "rb") as f:
-            _model_cache = pickle.load(f)
-    return _model_cache
+    bundle = current_bundle()
+    if bundle.model is None:
+        with bundle.lock:
+            if bundle.model is None:
+                with open(bundle.path(MODEL_FILE), "rb") as f:
+                    bundle.model = pickle.load(f)
+    return bundle.model
 
 
 def get_latest_features_df():
-    global _features_latest_cache
-    if _features_latest_cache is None:
-        _features_latest_cache = pd.read_pickle(FEATURES_LATEST_PATH)
-    return _features_latest_cache
+    bundle = current_bundle()
+    if bundle.features_latest is None:
+        with bundle.lock:
+            if bundle.features_latest is None:
+                bundle.features_latest = pd.read_pickle(bundle.path(FEATURES_LATEST_FILE))
+    return bundle.features_latest
 
 
 def get_all_features_df():
-    global _features_all_cache
-    if _features_all_cache is None:
-        _features_all_cache = pd.read_pickle(FEATURES_ALL_PATH)
-    return _features_all_cache
+    bundle = current_bundle()
+    if bundle.features_all is None:
+        with bundle.lock:
+            if bundle.features_all is None:
+                bundle.features_all = pd.read_pickle(bundle.path(FEATURES_ALL_FILE))
+    return bundle.features_all
 
 
 def get_model_config():
-    global _model_config_cache
-    if _model_config_cache is None:
-        with open(CONFIG_PATH, "r") as f:
-            _model_config_cache = json.load(f)
-    return _model_config_cache
+    bundle = current_bundle()
+    if bundle.model_config is None:
+        with open(bundle.path(CONFIG_FILE), "r") as f:
+            bundle.model_config = json.load(f)
+    return bundle.model_config
 
 def get_store_list_from_features():
     """
@@ -117,30 +146,19 @@ def get_store_list_from_features():
     return stores
 
 
-def build_feature_vector_for_store(store_id: int):
+def get_feature_cols(df: pd.DataFrame):
     """
-    Given a store_id, build a single-row feature DataFrame for the model.
+    Return the model's feature columns, in training order.
 
-    Returns:
-        X : pandas.DataFrame with shape (1, n_features)
+    Uses the explicit list from the model config when present, otherwise
+    every numeric column except the obvious ID / target / date columns.
     """
-    # Use the "latest per store" features table
-    df = get_latest_features_df()
-
-    if "Store Number" not in df.columns:
-        raise KeyError("Column 'Store Number' not found in latest features dataframe")
-
-    row = df[df["Store Number"] == store_id]
-
-    if row.empty:
-        raise ValueError(f"No feature row found for store_id={store_id}")
-
-    # Figure out which columns are features
     config = get_model_config()
 
     # Try to read an explicit list of feature columns from config, if present
     feature_cols = (
         config.get("feature_columns")
+        or config.get("feature_cols")
         or config.get("X_columns")
         or None
     )
@@ -154,10 +172,33 @@ def build_feature_vector_for_store(store_id: int):
             "MonthStart",
         }
         feature_cols = [
-            c for c in row.columns
-            if c not in exclude_cols and pd.api.types.is_numeric_dtype(row[c])
+            c for c in df.columns
+            if c not in exclude_cols and pd.api.types.is_numeric_dtype(df[c])
         ]
 
+    return list(feature_cols)
+
+
+def build_feature_vector_for_store(store_id: int):
+    """
+    Given a store_id, build a single-row feature DataFrame for the model.
+
+    Returns:
+        X : pandas.DataFrame with shape (1, n_features)
+    """
+    # Use the "latest per store" features table
+    df = get_latest_features_df()
+
+    if "Store Number" not in df.columns:
+        raise KeyError("Column 'Store Number' not found in latest features dataframe")
+
+    row = df[df["Store Number"] == store_id]
+
+    if row.empty:
+        raise ValueError(f"No feature row found for store_id={store_id}")
+
+    feature_cols = get_feature_cols(row)
+
     # Ensure the columns exist
     missing = [c for c in feature_cols if c not in row.columns]
     if missing:
@@ -168,8 +209,88 @@ def build_feature_vector_for_store(store_id: int):
 
     return X
 
-# Cached store–month history dataframe
-_history_df_cache = None
+class FeatureMatrix:
+    """
+    The latest-features table as a dense float matrix, one row per store
+    (sorted by store id), in model feature order.
+    """
+
+    def __init__(self, store_ids, X, feature_cols) -> None:
+        self.store_ids = store_ids
+        self.X = X
+        self.feature_cols = list(feature_cols)
+        self.col = {c: j for j, c in enumerate(self.feature_cols)}
+
+    def positions(self, store_ids):
+        """Row positions for `store_ids`; -1 where a store has no row."""
+        store_ids = np.asarray(store_ids, dtype=np.int64)
+        if len(self.store_ids) == 0:
+            return np.full(len(store_ids), -1, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(self.store_ids, store_ids), len(self.store_ids) - 1)
+        return np.where(self.store_ids[pos] == store_ids, pos, -1)
+
+    def frame(self, X=None) -> pd.DataFrame:
+        """Wrap a matrix with this layout as a DataFrame the model accepts."""
+        return pd.DataFrame(self.X if X is None else X, columns=self.feature_cols)
+
+
+def _build_latest_feature_matrix() -> FeatureMatrix:
+    df = get_latest_features_df()
+
+    if "Store Number" not in df.columns:
+        raise KeyError("Column 'Store Number' not found in latest features dataframe")
+
+    # Same row build_feature_vector_for_store would pick: the first per store.
+    df = df.drop_duplicates("Store Number", keep="first")
+    feature_cols = get_feature_cols(df)
+
+    missing = [c for c in feature_cols if c not in df.columns]
+    if missing:
+        raise KeyError(f"Feature columns missing from dataframe: {missing}")
+
+    store_ids = df["Store Number"].to_numpy(dtype=np.int64)
+    order = np.argsort(store_ids, kind="stable")
+    X = df[feature_cols].to_numpy(dtype=float)[order]
+    return FeatureMatrix(store_ids[order], X, feature_cols)
+
+
+def get_latest_feature_matrix() -> FeatureMatrix:
+    """Latest features for all stores as a matrix (built once per artifact version)."""
+    return get_derived("latest_feature_matrix", _build_latest_feature_matrix)
+
+
+def _load_history_df() -> pd.DataFrame:
+    df = pd.read_pickle(current_bundle().path(HISTORY_FILE))
+
+    cfg = get_model_config()
+    desired_date_col = cfg.get("date_col", "MonthStart")
+    store_col = cfg.get("store_col", "Store Number")
+
+    # Detect available date column in the history pickle
+    if desired_date_col not in df.columns:
+        # Fallback candidates
+        candidates = ["InvoiceMonth", "MonthStart"]
+        found = next((c for c in candidates if c in df.columns), None)
+        if found is None:
+            raise KeyError(
+                f"History file missing date column. Expected '{desired_date_col}' "
+                f"or one of {candidates}. Found columns: {list(df.columns)}"
+            )
+        # Use the found column as the working date column
+        working_date_col = found
+    else:
+        working_date_col = desired_date_col
+
+    # Normalize to monthly timestamp (YYYY-MM-01)
+    df[working_date_col] = pd.to_datetime(df[working_date_col]).dt.to_period("M").dt.to_timestamp()
+
+    # If config expects a different name, copy into that name
+    if working_date_col != desired_date_col:
+        df[desired_date_col] = df[working_date_col]
+
+    df[store_col] = df[store_col].astype(int)
+    return df
+
 
 def get_history_df() -> pd.DataFrame:
     """
@@ -179,41 +300,356 @@ def get_history_df() -> pd.DataFrame:
       - InvoiceMonth
       - MonthStart
 
-    Normalizes whichever exists into the config's date_col.
-    """
-    global _history_df_cache
-    if _history_df_cache is None:
-        df = pd.read_pickle(HISTORY_PATH)
-
-        cfg = get_model_config()
-        desired_date_col = cfg.get("date_col", "MonthStart")
-        store_col = cfg.get("store_col", "Store Number")
-
-        # Detect available date column in the history pickle
-        if desired_date_col not in df.columns:
-            # Fallback candidates
-            candidates = ["InvoiceMonth", "MonthStart"]
-            found = next((c for c in candidates if c in df.columns), None)
-            if found is None:
-                raise KeyError(
-                    f"History file missing date column. Expected '{desired_date_col}' "
-                    f"or one of {candidates}. Found columns: {list(df.columns)}"
-                )
-            # Use the found column as the working date column
-            working_date_col = found
-        else:
-            working_date_col = desired_date_col
+    Normalizes whichever exists into the config's date_col. Cached as a
+    derived structure, so it is part of the derived-state snapshot.
+    """
+    return get_derived("history_df", _load_history_df)
+
 
-        # Normalize to monthly timestamp (YYYY-MM-01)
-        df[working_date_col] = pd.to_datetime(df[working_date_col]).dt.to_period("M").dt.to_timestamp()
+# --- artifact version + derived structures -----------------
 
-        # If config expects a different name, copy into that name
-        if working_date_col != desired_date_col:
-            df[desired_date_col] = df[working_date_col]
+def get_artifact_version() -> str:
+    """
+    Return a short fingerprint of the artifacts this process serves for the
+    current dataset.
+
+    Built from the size + mtime of each artifact file and the raw config,
+    so any refreshed pickle or config change yields a new version. Other
+    datasets also mix in their name, so two bundles never share a version.
+    """
+    bundle = current_bundle()
+    if bundle.artifact_version is None:
+        h = hashlib.sha1()
+        for name in (MODEL_FILE, FEATURES_LATEST_FILE, FEATURES_ALL_FILE, HISTORY_FILE):
+            try:
+                st = os.stat(bundle.path(name))
+                h.update(f"{name}:{st.st_size}:{st.st_mtime_ns};".encode())
+            except FileNotFoundError:
+                h.update(f"{name}:missing;".encode())
+        h.update(json.dumps(get_model_config(), sort_keys=True).encode())
+        if bundle.name != DEFAULT_DATASET:
+            h.update(f"dataset={bundle.name};".encode())
+        bundle.artifact_version = h.hexdigest()[:12]
+    return bundle.artifact_version
+
+
+def get_derived(name: str, builder):
+    """
+    Return the derived structure `name` for the current artifact version,
+    calling `builder()` to create it the first time it is requested.
+
+    Everything precomputed from the artifacts (indexes, rollups, rankings)
+    should go through here so it is built once and keyed by version (and
+    dropped with its dataset bundle when that is evicted).
+    """
+    bundle = current_bundle()
+    key = (get_artifact_version(), name)
+    value = bundle.derived.get(key)
+    if value is None:
+        with bundle.lock:
+            value = bundle.derived.get(key)
+            if value is None:
+                note_cache(name, "built")
+                value = builder()
+                bundle.derived[key] = value
+    return value
+
+
+def peek_derived(name: str):
+    """Return the derived structure `name` if it is already built, else None."""
+    return current_bundle().derived.get((get_artifact_version(), name))
+
+
+def derived_items():
+    """{name: structure} for everything derived so far for the current version."""
+    bundle = current_bundle()
+    version = get_artifact_version()
+    with bundle.lock:
+        return {name: value for (v, name), value in bundle.derived.items() if v == version}
+
+
+def install_derived(items) -> None:
+    """Seed the derived cache for the current version (e.g. from a snapshot)."""
+    bundle = current_bundle()
+    version = get_artifact_version()
+    with bundle.lock:
+        for name, value in items.items():
+            bundle.derived.setdefault((version, name), value)
+
+
+# --- datasets ----------------------------------------------
+#
+# Each dataset (state) is served from its own artifact bundle. The default
+# dataset's bundle is MODELS_DIR and is never evicted; the others live in
+# DATASETS_DIR/<name>, are loaded on first use and evicted when idle or
+# while the process is above DATASET_MEMORY_LIMIT_MB. Everything above
+# reads the bundle of the current dataset, selected with use_dataset() /
+# enter_dataset() through a contextvar (so it follows work into the
+# compute pool).
+
+class DatasetNotFoundError(Exception):
+    """Raised when a dataset name has no artifact bundle."""
+    pass
+
+
+class ArtifactBundle:
+    """Loaded artifacts and derived structures of one dataset."""
+
+    def __init__(self, name: str, models_dir: str) -> None:
+        self.name = name
+        self.models_dir = models_dir
+        self.model = None
+        self.features_latest = None
+        self.features_all = None
+        self.model_config = None
+        self.store_metadata = None
+        self.artifact_version = None
+        # (artifact_version, name) -> derived structure built from the artifacts
+        self.derived = {}
+        # Background jobs already started for this bundle (e.g. "interval_table").
+        self.warming = set()
+        self.lock = threading.RLock()
+        self.loaded_at = time.time()
+        self.last_used = self.loaded_at
+        self.active = 0
+
+    def path(self, filename: str) -> str:
+        return os.path.join(self.models_dir, filename)
+
+    def frames_mb(self) -> float:
+        """Approximate size of the loaded DataFrames (features, history, derived)."""
+        frames = [self.features_latest, self.features_all, *self.derived.values()]
+        total = sum(
+            int(f.memory_usage(index=True).sum()) for f in frames if isinstance(f, pd.DataFrame)
+        )
+        return round(total / 1e6, 1)
 
-        df[store_col] = df[store_col].astype(int)
 
-        _history_df_cache = df
+_DATASET_NAME = re.compile(r"^[a-z0-9][a-z0-9_-]{0,63}$")
+
+# Idle / memory checks run at most this often (from enter_dataset).
+_SWEEP_SECONDS = 30.0
+
+_bundles = {}
+_bundles_lock = threading.Lock()
+_default_bundle = ArtifactBundle(DEFAULT_DATASET, MODELS_DIR)
+_current_bundle = contextvars.ContextVar("dataset_bundle", default=None)
+_load_hooks = []
+_last_sweep = 0.0
+
+# Per-dataset counters; kept across evictions.
+_dataset_stats = {}
+
+
+def _count_dataset(name: str, field: str) -> None:
+    stats = _dataset_stats.setdefault(
+        name, {"requests": 0, "loads": 0, "evicted_idle": 0, "evicted_memory": 0}
+    )
+    stats[field] += 1
+
+
+def current_bundle() -> ArtifactBundle:
+    """The artifact bundle of the current dataset (the default outside a scope)."""
+    return _current_bundle.get() or _default_bundle
+
+
+def current_dataset() -> str:
+    return current_bundle().name
+
+
+def dataset_dir(name: str) -> str:
+    """
+    Artifact directory of dataset `name`.
+
+    :raises DatasetNotFoundError: If the name is invalid or has no bundle.
+    """
+    if name == DEFAULT_DATASET:
+        return MODELS_DIR
+    if DATASETS_DIR and _DATASET_NAME.match(name):
+        path = os.path.join(DATASETS_DIR, name)
+        if os.path.isfile(os.path.join(path, MODEL_FILE)):
+            return path
+    raise DatasetNotFoundError(f"Dataset '{name}' was not found.")
+
+
+def list_datasets():
+    """Names of every dataset this process can serve, default first."""
+    names = []
+    if DATASETS_DIR and os.path.isdir(DATASETS_DIR):
+        for name in sorted(os.listdir(DATASETS_DIR)):
+            if name != DEFAULT_DATASET and _DATASET_NAME.match(name):
+                if os.path.isfile(os.path.join(DATASETS_DIR, name, MODEL_FILE)):
+                    names.append(name)
+    return [DEFAULT_DATASET] + names
+
+
+def on_dataset_load(hook) -> None:
+    """Call `hook()` (in the new dataset's scope) whenever a non-default bundle is created."""
+    _load_hooks.append(hook)
+
+
+def _pin(bundle: ArtifactBundle) -> None:
+    # Caller holds _bundles_lock.
+    bundle.active += 1
+    bundle.last_used = time.time()
+    _count_dataset(bundle.name, "requests")
+
+
+def get_bundle(name: str, pin: bool = False) -> ArtifactBundle:
+    """
+    The bundle of dataset `name`, created on first use. Artifacts themselves
+    are read lazily by the getters above. With `pin`, the bundle is marked
+    in use (see enter_dataset) in the same critical section that finds or
+    creates it, so an eviction sweep cannot drop it in between.
+
+    :raises DatasetNotFoundError: If the dataset does not exist.
+    """
+    if name == DEFAULT_DATASET:
+        if pin:
+            with _bundles_lock:
+                _pin(_default_bundle)
+        return _default_bundle
+
+    with _bundles_lock:
+        bundle = _bundles.get(name)
+        if bundle is not None:
+            if pin:
+                _pin(bundle)
+            return bundle
+
+    models_dir = dataset_dir(name)
+    # Make room before loading another dataset.
+    evict_datasets(force_memory=True)
+    with _bundles_lock:
+        bundle = _bundles.get(name)
+        created = bundle is None
+        if created:
+            bundle = ArtifactBundle(name, models_dir)
+            _bundles[name] = bundle
+            _count_dataset(name, "loads")
+        if pin:
+            _pin(bundle)
+    if not created:
+        return bundle
+
+    token = _current_bundle.set(bundle)
+    try:
+        for hook in list(_load_hooks):
+            try:
+                hook()
+            except Exception:
+                import traceback
+
+                traceback.print_exc()
+    finally:
+        _current_bundle.reset(token)
+    return bundle
+
+
+def enter_dataset(name: str):
+    """
+    Make `name` the current dataset until exit_dataset(token). Marks the
+    bundle in use, so it is not evicted meanwhile.
+
+    :raises DatasetNotFoundError: If the dataset does not exist.
+    """
+    evict_datasets()
+    bundle = get_bundle(name, pin=True)
+    return bundle, _current_bundle.set(bundle)
+
+
+def exit_dataset(token) -> None:
+    bundle, var_token = token
+    _current_bundle.reset(var_token)
+    with _bundles_lock:
+        bundle.active -= 1
+        bundle.last_used = time.time()
+
+
+@contextmanager
+def use_dataset(name: str):
+    """Context manager form of enter_dataset() / exit_dataset()."""
+    token = enter_dataset(name)
+    try:
+        yield token[0]
+    finally:
+        exit_dataset(token)
+
+
+def _rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        return None
+    return None
+
+
+def _over_memory_limit() -> bool:
+    if DATASET_MEMORY_LIMIT_MB <= 0:
+        return False
+    rss = _rss_mb()
+    return rss is not None and rss > DATASET_MEMORY_LIMIT_MB
+
+
+def evict_datasets(force_memory: bool = False) -> None:
+    """
+    Drop non-default bundles that are idle past DATASET_IDLE_SECONDS, then
+    least-recently-used idle bundles while RSS is above the ceiling. Runs at
+    most every _SWEEP_SECONDS unless `force_memory`. Requests still holding
+    an evicted bundle finish with it; its memory goes with them.
+    """
+    global _last_sweep
+    now = time.time()
+    if not force_memory and now - _last_sweep < _SWEEP_SECONDS:
+        return
+    _last_sweep = now
+
+    with _bundles_lock:
+        for name, bundle in list(_bundles.items()):
+            if bundle.active == 0 and now - bundle.last_used > DATASET_IDLE_SECONDS:
+                del _bundles[name]
+                _count_dataset(name, "evicted_idle")
+
+    while _over_memory_limit():
+        with _bundles_lock:
+            idle = [b for b in _bundles.values() if b.active == 0]
+            if not idle:
+                return
+            victim = min(idle, key=lambda b: b.last_used)
+            del _bundles[victim.name]
+            _count_dataset(victim.name, "evicted_memory")
+        del victim, idle
+        gc.collect()
+
+
+def dataset_stats():
+    now = time.time()
+    with _bundles_lock:
+        bundles = [_default_bundle, *_bundles.values()]
+        counters = {name: dict(stats) for name, stats in _dataset_stats.items()}
+    rss = _rss_mb()
+    return {
+        "default": DEFAULT_DATASET,
+        "rss_mb": round(rss, 1) if rss is not None else None,
+        "memory_limit_mb": DATASET_MEMORY_LIMIT_MB or None,
+        "idle_seconds": DATASET_IDLE_SECONDS,
+        "loaded": {
+            b.name: {
+                "artifact_version": b.artifact_version,
+                "active": b.active,
+                "loaded_seconds": round(now - b.loaded_at, 1),
+                "idle_seconds": round(now - b.last_used, 1),
+                "model_loaded": b.model is not None,
+                "derived": len(b.derived),
+                "frames_mb": b.frames_mb(),
+            }
+            for b in bundles
+        },
+        "datasets": counters,
+    }
 
-    return _history_df_cache
 
+register_metrics("datasets", dataset_stats)
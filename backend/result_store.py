@@ -0,0 +1,273 @@
+# backend/result_store.py
+#
+# Optional cross-worker result tier: a local SQLite file in WAL mode keyed
+# by (store_id, model_version). Whichever worker computes a forecast or
+# explanation first writes it; every worker (and every restart) reads it.
+# The first write under a new model version drops the rows of the same
+# dataset's older versions, so refreshed artifacts don't leave dead rows.
+from __future__ import annotations
+
+import json
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from access_log import note_cache
+from config import RESULT_STORE_PATH
+from metrics import register_metrics
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS store_results (
+    store_id      INTEGER NOT NULL,
+    model_version TEXT    NOT NULL,
+    prediction    REAL,
+    context       BLOB,
+    explanation   TEXT,
+    updated_at    REAL    NOT NULL,
+    PRIMARY KEY (store_id, model_version)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS model_versions (
+    model_version TEXT PRIMARY KEY,
+    dataset       TEXT NOT NULL,
+    first_seen    REAL NOT NULL
+)
+"""
+
+# Columns left NULL by a write keep their stored value, so the forecast
+# route and the explain route can each fill in their part of the row.
+_UPSERT = """
+INSERT INTO store_results (store_id, model_version, prediction, context, explanation, updated_at)
+VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (store_id, model_version) DO UPDATE SET
+    prediction  = COALESCE(excluded.prediction, prediction),
+    context     = COALESCE(excluded.context, context),
+    explanation = COALESCE(excluded.explanation, explanation),
+    updated_at  = excluded.updated_at
+"""
+
+
+# --- context blob encoding ---------------------------------
+#
+# Packed layout (zlib-compressed):
+#   b"P" | n_history: uint32 | n_json: uint32
+#   | months: int32[n]  (months since 1970-01)
+#   | sales: float64[n]
+#   | json: everything except "history" (stats, drivers, ...)
+# Falls back to b"J" + compressed JSON when a history date is not a
+# month start.
+
+def _month_index(date_str: Any) -> Optional[int]:
+    s = str(date_str)
+    if len(s) < 10 or s[7:10] != "-01" or (len(s) > 10 and s[10:] != "T00:00:00"):
+        return None
+    try:
+        return int(np.datetime64(s[:7], "M").astype(np.int64))
+    except ValueError:
+        return None
+
+
+def encode_context(context: Dict[str, Any]) -> bytes:
+    """Encode a {history, stats, ...} context into a compact blob."""
+    history = context.get("history") or []
+    rest = {k: v for k, v in context.items() if k != "history"}
+    months = [_month_index(row.get("date")) for row in history]
+
+    if any(m is None for m in months):
+        raw = json.dumps(context, separators=(",", ":")).encode()
+        return b"J" + zlib.compress(raw)
+
+    rest_json = json.dumps(rest, separators=(",", ":")).encode()
+    body = (
+        struct.pack("<II", len(history), len(rest_json))
+        + np.asarray(months, dtype="<i4").tobytes()
+        + np.asarray([float(row.get("sales") or 0.0) for row in history], dtype="<f8").tobytes()
+        + rest_json
+    )
+    return b"P" + zlib.compress(body)
+
+
+def decode_context(blob: bytes) -> Dict[str, Any]:
+    """Inverse of encode_context()."""
+    kind, body = blob[:1], zlib.decompress(blob[1:])
+    if kind == b"J":
+        return json.loads(body)
+
+    n, n_json = struct.unpack_from("<II", body, 0)
+    offset = 8
+    months = np.frombuffer(body, dtype="<i4", count=n, offset=offset)
+    offset += 4 * n
+    sales = np.frombuffer(body, dtype="<f8", count=n, offset=offset)
+    offset += 8 * n
+    context = json.loads(body[offset:offset + n_json])
+    context["history"] = [
+        {"date": f"{np.datetime64(int(m), 'M')}-01T00:00:00", "sales": float(v)}
+        for m, v in zip(months, sales)
+    ]
+    return context
+
+
+# --- store -------------------------------------------------
+
+class ResultStore:
+    """SQLite-backed (store_id, model_version) -> prediction/context/explanation."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "writes": 0, "errors": 0, "purged": 0}
+        self._registered: set = set()
+        self._connect().executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # sqlite3 connections are per thread; WAL lets readers in every
+        # worker proceed while one writer commits.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, field: str, n: int = 1) -> None:
+        with self._stats_lock:
+            self._stats[field] += n
+
+    def get(self, store_id: int, model_version: str) -> Optional[Dict[str, Any]]:
+        """Return {"prediction", "context", "explanation"} or None; never raises."""
+        try:
+            row = self._connect().execute(
+                "SELECT prediction, context, explanation FROM store_results "
+                "WHERE store_id = ? AND model_version = ?",
+                (int(store_id), model_version),
+            ).fetchone()
+        except sqlite3.Error:
+            self._count("errors")
+            note_cache("result_store", "error")
+            return None
+
+        if row is None:
+            self._count("misses")
+            note_cache("result_store", "miss")
+            return None
+
+        prediction, context, explanation = row
+        try:
+            context = decode_context(context) if context is not None else None
+        except (zlib.error, struct.error, ValueError):
+            self._count("errors")
+            note_cache("result_store", "error")
+            return None
+
+        self._count("hits")
+        note_cache("result_store", "hit")
+        return {"prediction": prediction, "context": context, "explanation": explanation}
+
+    def upsert_many(self, model_version: str, rows: Iterable[Dict[str, Any]]) -> int:
+        """
+        Bulk upsert rows of {"store_id", "prediction"?, "context"?, "explanation"?}
+        in one transaction. Returns the number of rows written; never raises.
+        """
+        now = time.time()
+        params: List[tuple] = [
+            (
+                int(r["store_id"]),
+                model_version,
+                None if r.get("prediction") is None else float(r["prediction"]),
+                None if r.get("context") is None else encode_context(r["context"]),
+                r.get("explanation"),
+                now,
+            )
+            for r in rows
+        ]
+        if not params:
+            return 0
+        if model_version not in self._registered:
+            from model_utils import current_dataset
+
+            self.purge_older_versions(model_version, current_dataset())
+
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(_UPSERT, params)
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            self._count("errors")
+            try:
+                conn.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+            return 0
+
+        self._count("writes", len(params))
+        return len(params)
+
+    def upsert(self, store_id: int, model_version: str, **fields: Any) -> int:
+        return self.upsert_many(model_version, [dict(fields, store_id=store_id)])
+
+    def purge_older_versions(self, model_version: str, dataset: str) -> int:
+        """
+        Register `model_version` for `dataset` and drop the rows of that
+        dataset's versions first seen before it. Other datasets' rows stay,
+        and a worker still on an older version never purges a newer one.
+        Returns the number of rows dropped; never raises.
+        """
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT OR IGNORE INTO model_versions (model_version, dataset, first_seen) "
+                "VALUES (?, ?, ?)",
+                (model_version, dataset, time.time()),
+            )
+            cur = conn.execute(
+                "DELETE FROM store_results WHERE model_version IN ("
+                "  SELECT model_version FROM model_versions WHERE dataset = ? AND first_seen < ("
+                "    SELECT first_seen FROM model_versions WHERE model_version = ?))",
+                (dataset, model_version),
+            )
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            self._count("errors")
+            try:
+                conn.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+            return 0
+
+        self._registered.add(model_version)
+        self._count("purged", max(cur.rowcount, 0))
+        return max(cur.rowcount, 0)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else None
+        stats["path"] = self.path
+        return stats
+
+
+_result_store_cache: Optional[ResultStore] = None
+_result_store_lock = threading.Lock()
+
+
+def get_result_store() -> Optional[ResultStore]:
+    """The shared result store, or None when RESULT_STORE_PATH is not set."""
+    global _result_store_cache
+    if not RESULT_STORE_PATH:
+        return None
+    if _result_store_cache is None:
+        with _result_store_lock:
+            if _result_store_cache is None:
+                _result_store_cache = ResultStore(RESULT_STORE_PATH)
+                register_metrics("result_store", _result_store_cache.stats)
+    return _result_store_cache
@@ -1,7 +1,7 @@
 # backend/routes/ai_routes.py
 from __future__ import annotations
 
-from typing import Any, Dict, Tuple
+from typing import Any, Dict, Optional
 
 from flask import Blueprint, request, jsonify, Response
 
@@ -11,11 +11,43 @@ from services.ai_explanation_service import (
     ForecastComputationError,
     ExplanationGenerationError,
 )
+from services.history_service import parse_month, HistoryQueryError
+from model_utils import get_artifact_version
+from single_flight import request_flight
+from serving import DeadlineExceeded, limit_concurrency, with_deadline
 
 ai_bp = Blueprint("ai", __name__)
 
 
+def get_explanation(
+    store_id: int,
+    prediction_override: Any = None,
+    as_of: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    The /explain_forecast result for a store. Concurrent callers (this
+    route and /bootstrap) for the same store/prediction share one computation.
+    """
+    flight_key = (
+        "explain_forecast",
+        store_id,
+        get_artifact_version(),
+        None if prediction_override is None else str(prediction_override),
+        as_of,
+    )
+    return request_flight.do(
+        flight_key,
+        lambda: generate_forecast_explanation(
+            store_id=store_id,
+            prediction_override=prediction_override,
+            as_of=as_of,
+        ),
+    )
+
+
 @ai_bp.post("/explain_forecast")
+@limit_concurrency("explain_forecast")
+@with_deadline("explain_forecast")
 def api_explain_forecast() -> Response:
     """
     Explain a store-level forecast in plain language.
@@ -23,7 +55,8 @@ def api_explain_forecast() -> Response:
     Request JSON:
     {
       "store_id": 2327,          # required
-      "prediction": 5723.03      # optional; if missing, we compute it
+      "prediction": 5723.03,     # optional; if missing, we compute it
+      "as_of": "2024-03"         # optional; explain the point-in-time forecast
     }
 
     Response JSON (200):
@@ -52,12 +85,17 @@ def api_explain_forecast() -> Response:
     prediction_override: Any = prediction_raw
 
     try:
-        result: Dict[str, Any] = generate_forecast_explanation(
-            store_id=store_id,
-            prediction_override=prediction_override,
-        )
+        as_of: Optional[int] = parse_month(data.get("as_of"))
+    except HistoryQueryError as exc:
+        return jsonify({"error": str(exc)}), 400
+
+    try:
+        result: Dict[str, Any] = get_explanation(store_id, prediction_override, as_of)
         return jsonify(result)
 
+    except DeadlineExceeded:
+        raise  # answered with 504 by with_deadline
+
     except StoreNotFoundError as exc:
         # Domain-level 404 when we can't build features/forecast for this store
         return jsonify({"error": str(exc)}), 404
@@ -0,0 +1,70 @@
+# backend/routes/anomaly_routes.py
+from __future__ import annotations
+
+from typing import Any, Dict, Tuple
+
+from flask import Blueprint, jsonify, request, Response
+
+from services.anomaly_service import list_anomalies, AnomalyQueryError
+from services.history_service import parse_month, HistoryQueryError
+
+anomaly_bp = Blueprint("anomalies", __name__)
+
+
+@anomaly_bp.get("/anomalies")
+def api_anomalies() -> Tuple[Response, int]:
+    """
+    Flagged store-months from the precomputed anomaly table.
+
+    Query params (all optional):
+      store_id  - one store's flags, oldest first (default: fleet, newest first)
+      type      - spike | drop | missing | level_shift
+      from, to  - month range, YYYY-MM (inclusive)
+      limit     - max rows returned (default 100, max 1000)
+
+    Response (200):
+    {
+      "model_version": "3f2a9c1d0b7e",
+      "total": 412,
+      "anomalies": [
+        { "store_id": 2106, "date": "2024-07-01T00:00:00", "type": "drop", "score": -4.8 },
+        ...
+      ]
+    }
+
+    score is the robust z for spike / drop, the gap length for missing,
+    and log(after / before) for level_shift.
+    """
+    try:
+        raw_store = request.args.get("store_id")
+        store_id = int(raw_store) if raw_store not in (None, "") else None
+        limit = int(request.args.get("limit", 100))
+    except (TypeError, ValueError):
+        return jsonify({"error": "store_id and limit must be integers"}), 400
+
+    try:
+        payload: Dict[str, Any] = list_anomalies(
+            store_id=store_id,
+            kind=request.args.get("type") or None,
+            start_month=parse_month(request.args.get("from")),
+            end_month=parse_month(request.args.get("to")),
+            limit=limit,
+        )
+        return jsonify(payload), 200
+
+    except (AnomalyQueryError, HistoryQueryError) as exc:
+        return jsonify({"error": str(exc)}), 400
+
+    except Exception as exc:
+        import traceback
+
+        traceback.print_exc()
+        return (
+            jsonify(
+                {
+                    "error": "Unexpected server error in /anomalies.",
+                    "details": str(exc),
+                }
+            ),
+            500,
+        )
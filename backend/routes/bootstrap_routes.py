@@ -0,0 +1,182 @@
+# backend/routes/bootstrap_routes.py
+from __future__ import annotations
+
+import hashlib
+from typing import Any, Dict, Optional, Tuple
+
+from flask import Blueprint, jsonify, request, Response
+
+from access_log import stage
+from model_utils import get_artifact_version, get_model, peek_derived
+from services.forecast_service import StoreNotFoundError
+from services.store_service import get_cached_store_list
+from routes.forecast_routes import get_forecast_payload
+from routes.ai_routes import get_explanation
+from serving import limit_concurrency, with_deadline
+
+bootstrap_bp = Blueprint("bootstrap", __name__)
+
+DEFAULT_STORE_PAGE = 50
+MAX_STORE_PAGE = 1000
+
+# Derived tables reported in "warm" (built ones answer without a rebuild).
+_WARM_TABLES = ("store_list", "forecast_table", "driver_table", "fleet_stats", "anomaly_table")
+
+
+def _readiness() -> Dict[str, Any]:
+    """ready = the model loads, so /forecast can answer; warm = built tables."""
+    try:
+        get_model()
+        ready = True
+    except Exception:
+        ready = False
+    warm = {name: peek_derived(name) is not None for name in _WARM_TABLES}
+    return {"ready": ready, "warm": warm}
+
+
+def _has_optional_parts(part: Optional[Dict[str, Any]]) -> bool:
+    """
+    True when a forecast payload / explanation context carries the parts
+    that degrade silently while tables are cold or a lookup fails: the
+    interval, the drivers and (for limited-history stores) the peer blend.
+    """
+    if part is None:
+        return True
+    if part.get("interval") is None or not part.get("drivers"):
+        return False
+    stats = part.get("stats") or {}
+    return not stats.get("is_limited_history") or bool(part.get("peer_blend"))
+
+
+def _etag(version: str, store: str, insight: bool, offset: int, limit: int) -> str:
+    key = f"{version}:{store}:{int(insight)}:{offset}:{limit}"
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+
+@bootstrap_bp.get("/bootstrap")
+@limit_concurrency("bootstrap")
+@with_deadline("bootstrap")
+def api_bootstrap() -> Tuple[Response, int]:
+    """
+    Everything the frontend needs for first paint in one round trip.
+
+    Query params (all optional):
+      store_id - store to forecast / explain: an id (e.g. the last-used
+                 store) or 'default' for the first store in the list
+      insight  - 0 to skip the AI explanation (default 1 with store_id)
+      offset   - first store of the page (default 0)
+      limit    - stores per page (default 50, max 1000)
+
+    Response (200):
+    {
+      "model_version": "3f2a9c1d0b7e",
+      "ready": true,
+      "warm": { "forecast_table": true, "driver_table": true, ... },
+      "stores": [ { "value": 2327, "label": "2327 - Milwaukee" }, ... ],
+      "total_stores": 1423,
+      "next_offset": 50,
+      "store_id": 2327,
+      "forecast": { ... same as /forecast/<id> ... },
+      "insight": { ... same as /explain_forecast ... }
+    }
+
+    forecast / insight are null when not requested. If either fails, the
+    rest is still returned with "forecast_error" / "insight_error".
+
+    Complete responses carry a weak ETag derived from the model version and
+    the query, so a matching If-None-Match is answered 304 without any
+    forecast or LLM work. Partial responses (not ready, an error, or an
+    interval / drivers / peer blend still missing) are sent with
+    Cache-Control: no-store and no ETag, so the next load fetches them.
+    """
+    raw_store = (request.args.get("store_id") or "").strip()
+    try:
+        store_id: Optional[int] = (
+            None if raw_store in ("", "default") else int(raw_store)
+        )
+        offset = max(0, int(request.args.get("offset", 0)))
+        limit = min(max(1, int(request.args.get("limit", DEFAULT_STORE_PAGE))), MAX_STORE_PAGE)
+    except (TypeError, ValueError):
+        return jsonify({"error": "store_id must be an integer or 'default'; offset and limit integers"}), 400
+    wants_store = raw_store != ""
+    insight = wants_store and request.args.get("insight", "1").lower() not in ("0", "false", "no")
+
+    try:
+        version = get_artifact_version()
+        etag = _etag(version, raw_store, insight, offset, limit)
+        if request.if_none_match.contains_weak(etag) and _readiness()["ready"]:
+            response = Response(status=304)
+            response.set_etag(etag, weak=True)
+            response.headers["Cache-Control"] = "no-cache"
+            return response, 304
+
+        with stage("stores"):
+            stores = get_cached_store_list()
+        if raw_store == "default" and stores:
+            store_id = int(stores[0]["value"])
+
+        payload: Dict[str, Any] = {
+            "model_version": version,
+            "stores": stores[offset: offset + limit],
+            "total_stores": len(stores),
+            "next_offset": offset + limit if offset + limit < len(stores) else None,
+            "store_id": store_id,
+            "forecast": None,
+            "insight": None,
+        }
+        complete = True
+
+        if store_id is not None:
+            try:
+                with stage("forecast_payload"):
+                    forecast = get_forecast_payload(store_id)
+                payload["forecast"] = forecast
+            except Exception as exc:
+                # The store may be gone since the client last used it; the
+                # page can still render the store list.
+                forecast = None
+                payload["forecast_error"] = (
+                    f"Store {store_id} was not found."
+                    if isinstance(exc, StoreNotFoundError)
+                    else str(exc)
+                )
+                complete = False
+
+            if forecast is not None and insight:
+                try:
+                    with stage("insight"):
+                        payload["insight"] = get_explanation(store_id, forecast["prediction"])
+                except Exception as exc:
+                    payload["insight_error"] = str(exc)
+                    complete = False
+
+        payload.update(_readiness())
+        insight_context = (payload["insight"] or {}).get("context")
+        complete = (
+            complete
+            and payload["ready"]
+            and _has_optional_parts(payload["forecast"])
+            and _has_optional_parts(insight_context)
+        )
+
+        response = jsonify(payload)
+        if complete:
+            response.set_etag(etag, weak=True)
+            response.headers["Cache-Control"] = "no-cache"
+        else:
+            response.headers["Cache-Control"] = "no-store"
+        return response, 200
+
+    except Exception as exc:
+        import traceback
+
+        traceback.print_exc()
+        return (
+            jsonify(
+                {
+                    "error": "Unexpected server error in /bootstrap.",
+                    "details": str(exc),
+                }
+            ),
+            500,
+        )
@@ -0,0 +1,87 @@
+# backend/routes/debug_routes.py
+from __future__ import annotations
+
+import hmac
+from typing import Any, Dict, Optional, Tuple
+
+from flask import Blueprint, jsonify, request, Response
+
+from alloc_tracking import alloc_report, reset_baseline, stop_tracing
+from config import DEBUG_ALLOC_TOKEN
+
+debug_bp = Blueprint("debug", __name__)
+
+
+def _check_token() -> Optional[Tuple[Response, int]]:
+    """404 while the endpoint is disabled, 403 on a missing / wrong token."""
+    if not DEBUG_ALLOC_TOKEN:
+        return jsonify({"error": "Not found."}), 404
+    token = request.headers.get("X-Debug-Token", "")
+    if not hmac.compare_digest(token.encode(), DEBUG_ALLOC_TOKEN.encode()):
+        return jsonify({"error": "Forbidden."}), 403
+    return None
+
+
+@debug_bp.get("/debug/alloc")
+def api_debug_alloc() -> Tuple[Response, int]:
+    """
+    Top allocation sites of this worker (admin only, X-Debug-Token header).
+
+    Query params:
+      limit     - sites per list (default 25, max 200)
+      key       - lineno | filename | traceback (default lineno)
+      reset     - 1 to make the current heap the new baseline afterwards
+
+    The first call starts tracemalloc (unless TRACEMALLOC_FRAMES started it
+    at boot) and returns empty lists; later calls return:
+    {
+      "tracing": true, "started": false,
+      "current_mb": 412.3, "peak_mb": 530.1,
+      "top":    [ { "site": ["services/x.py:42"], "size_kb": 2048.0, "count": 311 }, ... ],
+      "growth": [ { "site": [...], "size_kb": 2048.0, "size_diff_kb": 512.0, "count_diff": 90 }, ... ]
+    }
+    "growth" compares against the baseline taken when tracing started.
+    """
+    denied = _check_token()
+    if denied:
+        return denied
+
+    try:
+        limit = int(request.args.get("limit", 25))
+    except (TypeError, ValueError):
+        return jsonify({"error": "limit must be an integer"}), 400
+    if limit < 1 or limit > 200:
+        return jsonify({"error": "limit must be between 1 and 200."}), 400
+
+    try:
+        report: Dict[str, Any] = alloc_report(limit, request.args.get("key", "lineno"))
+        if request.args.get("reset") in ("1", "true", "yes"):
+            reset_baseline()
+        return jsonify(report), 200
+
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+
+    except Exception as exc:
+        import traceback
+
+        traceback.print_exc()
+        return (
+            jsonify(
+                {
+                    "error": "Unexpected server error in /debug/alloc.",
+                    "details": str(exc),
+                }
+            ),
+            500,
+        )
+
+
+@debug_bp.delete("/debug/alloc")
+def api_debug_alloc_stop() -> Tuple[Response, int]:
+    """Stop tracemalloc on this worker and drop the baseline (admin only)."""
+    denied = _check_token()
+    if denied:
+        return denied
+    stop_tracing()
+    return jsonify({"tracing": False}), 200
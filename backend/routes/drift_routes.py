@@ -0,0 +1,55 @@
+# backend/routes/drift_routes.py
+from __future__ import annotations
+
+from typing import Any, Dict, Tuple
+
+from flask import Blueprint, jsonify, Response
+
+from services.drift_service import get_drift_report, DriftError
+
+drift_bp = Blueprint("drift", __name__)
+
+
+@drift_bp.get("/drift")
+def api_drift() -> Tuple[Response, int]:
+    """
+    Distribution drift of the latest features vs the training table.
+
+    Response (200):
+    {
+      "model_version": "3f2a9c1d0b7e",
+      "n_rows": 2537,
+      "n_train_rows": 151220,
+      "thresholds": { "psi_warn": 0.1, "psi_alert": 0.25 },
+      "gate": { "passed": true, "failing_features": [] },
+      "features": [
+        { "feature": "coef_var", "psi": 0.03, "ks": 0.05, "mean_shift_std": 0.1,
+          "missing_rate": 0.0, "train_missing_rate": 0.0,
+          "scope": "store", "status": "ok" },
+        ...
+      ]
+    }
+
+    "time" scoped features (calendar flags, statewide totals) are constant
+    within the latest month, so they are reported but never fail the gate.
+    """
+    try:
+        report: Dict[str, Any] = get_drift_report()
+        return jsonify(report), 200
+
+    except DriftError as exc:
+        return jsonify({"error": str(exc)}), 500
+
+    except Exception as exc:
+        import traceback
+
+        traceback.print_exc()
+        return (
+            jsonify(
+                {
+                    "error": "Unexpected server error in /drift.",
+                    "details": str(exc),
+                }
+            ),
+            500,
+        )
@@ -0,0 +1,85 @@
+# backend/routes/export_routes.py
+from __future__ import annotations
+
+from typing import Any, Iterator, List, Tuple, Union
+
+from flask import Blueprint, jsonify, request, Response, stream_with_context
+
+from columnar import parquet_available
+from model_utils import get_artifact_version
+from services.analytics_service import get_active_fleet_table
+from services.forecast_service import ForecastError
+from services.export_service import (
+    EXPORT_FORMATS,
+    ExportQueryError,
+    parse_includes,
+    stream_csv,
+    stream_parquet,
+)
+
+export_bp = Blueprint("export", __name__)
+
+_MIMETYPES = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+@export_bp.get("/export")
+def api_export() -> Union[Response, Tuple[Response, int]]:
+    """
+    Stream every active store's forecast as one file.
+
+    Query params:
+      format  - csv (default) | parquet
+      include - comma-separated extras: stats, explanation
+
+    Rows are produced in batches of stores and written to the response as
+    they are ready, so the download starts immediately and memory stays
+    bounded by the batch size.
+    """
+    fmt = request.args.get("format", "csv").lower()
+    if fmt not in EXPORT_FORMATS:
+        return (
+            jsonify({"error": f"Invalid format {fmt!r}; expected one of {list(EXPORT_FORMATS)}."}),
+            400,
+        )
+    if fmt == "parquet" and not parquet_available():
+        return jsonify({"error": "Parquet export is not available on this server (pyarrow missing)."}), 501
+
+    try:
+        includes: List[str] = parse_includes(request.args.get("include", ""))
+        # Build (or reuse) the batch forecasts up front so failures become
+        # a proper error status instead of a truncated download.
+        get_active_fleet_table()
+        version = get_artifact_version()
+
+    except ExportQueryError as exc:
+        return jsonify({"error": str(exc)}), 400
+
+    except ForecastError as exc:
+        return jsonify({"error": str(exc)}), 500
+
+    except Exception as exc:
+        import traceback
+
+        traceback.print_exc()
+        return (
+            jsonify(
+                {
+                    "error": "Unexpected server error in /export.",
+                    "details": str(exc),
+                }
+            ),
+            500,
+        )
+
+    body: Iterator[Any] = stream_csv(includes) if fmt == "csv" else stream_parquet(includes)
+    return Response(
+        stream_with_context(body),
+        mimetype=_MIMETYPES[fmt],
+        headers={
+            "Content-Disposition": f'attachment; filename="forecasts_{version}.{fmt}"',
+            "X-Model-Version": version,
+        },
+    )
@@ -4,10 +4,25 @@ from __future__ import annotations
 from typing import Any, Dict, Tuple
 from datetime import datetime
 
-from flask import Blueprint, jsonify, Response
+from flask import Blueprint, jsonify, request, Response
 
-from services.forecast_service import forecast_for_store, ForecastError
+from services.forecast_service import forecast_for_store, ForecastError, StoreNotFoundError
 from services.analytics_service import build_forecast_context
+from services.drivers_service import get_store_drivers
+from services.similarity_service import peer_blend
+from services.interval_service import peek_store_interval
+from services.asof_service import (
+    build_asof_forecast_payload,
+    get_store_fit,
+    AsOfError,
+    AsOfNotFoundError,
+)
+from services.history_service import parse_month, HistoryQueryError
+from access_log import note_cache, stage
+from model_utils import get_artifact_version
+from single_flight import request_flight
+from result_store import get_result_store
+from serving import DeadlineExceeded, check_deadline, limit_concurrency, run_compute, with_deadline
 
 forecast_bp = Blueprint("forecast", __name__)
 
@@ -34,43 +49,172 @@ def _next_month_label(last_date_str: str) -> str:
         return f"{year}-{month + 1:02d}"
 
 
-@forecast_bp.get("/forecast/<int:store_id>")
-def api_forecast(store_id: int) -> Tuple[Response, int]:
-    try:
+def _build_forecast_payload(store_id: int, history_months: int = 12) -> Dict[str, Any]:
+    with stage("forecast"):
         prediction: float = float(forecast_for_store(store_id))
 
+    check_deadline("context")
+    with stage("context"):
         context: Dict[str, Any] = build_forecast_context(
             store_id=store_id,
             prediction=prediction,
-            history_months=12,
+            history_months=history_months,
         )
 
-        history = context.get("history", []) or []
-        stats = context.get("stats", {}) or {}
+    history = context.get("history", []) or []
+    stats = context.get("stats", {}) or {}
+
+    # last history date -> next month label (e.g. '2024-09')
+    if history:
+        last_date_str = history[-1].get("date")
+        next_period_label = _next_month_label(last_date_str)
+    else:
+        next_period_label = "Next"
+
+    # Top feature contributions, read from the precomputed table.
+    # Drivers are optional: never fail the forecast because of them.
+    check_deadline("drivers")
+    try:
+        with stage("drivers"):
+            drivers = get_store_drivers(store_id)
+    except Exception:
+        drivers = []
 
-        # last history date -> next month label (e.g. '2024-09')
-        if history:
-            last_date_str = history[-1].get("date")
-            next_period_label = _next_month_label(last_date_str)
-        else:
-            next_period_label = "Next"
+    # P10 / P50 / P90 band from the calibrated residual table; optional too,
+    # and null until the table has been built in the background.
+    try:
+        interval = peek_store_interval(store_id, prediction)
+    except Exception:
+        interval = None
+    note_cache("interval_table", "hit" if interval is not None else "miss")
+
+    payload = {
+        "store_id": store_id,
+        "prediction": prediction,
+        "history": history,
+        "stats": stats,
+        "next_period_label": next_period_label,  # ⭐ NEW
+        "drivers": drivers,
+        "anomalies": context.get("anomalies", []) or [],
+        "interval": interval,
+    }
+
+    # Limited-history stores also get a blend with similar established stores.
+    if stats.get("is_limited_history"):
+        try:
+            blend = peer_blend(store_id, prediction, int(stats.get("months_active") or 0))
+        except Exception:
+            blend = None
+        if blend is not None:
+            payload["peer_blend"] = blend
+
+    return payload
 
-        payload: Dict[str, Any] = {
+
+def _stored_forecast_payload(store_id: int, history_months: int = 12) -> Dict[str, Any]:
+    """
+    Forecast payload via the shared result store when it is enabled:
+    reuse a row another worker already computed, otherwise compute and
+    write it. Store problems fall back to computing.
+    """
+    try:
+        store = get_result_store() if history_months == 12 else None
+    except Exception:
+        store = None
+    if store is None:
+        return _build_forecast_payload(store_id, history_months)
+
+    version = get_artifact_version()
+    row = store.get(store_id, version)
+    if row and row["prediction"] is not None and row["context"] is not None:
+        context = row["context"]
+        history = context.get("history", []) or []
+        return {
             "store_id": store_id,
-            "prediction": prediction,
+            "prediction": row["prediction"],
             "history": history,
-            "stats": stats,
-            "next_period_label": next_period_label,  # ⭐ NEW
+            "stats": context.get("stats", {}) or {},
+            "next_period_label": (
+                _next_month_label(history[-1].get("date")) if history else "Next"
+            ),
+            "drivers": context.get("drivers", []) or [],
+            "anomalies": context.get("anomalies", []) or [],
+            "interval": context.get("interval") or peek_store_interval(store_id, row["prediction"]),
+            **({"peer_blend": context["peer_blend"]} if context.get("peer_blend") else {}),
         }
 
+    payload = _build_forecast_payload(store_id, history_months)
+    store.upsert(
+        store_id,
+        version,
+        prediction=payload["prediction"],
+        context={
+            "history": payload["history"],
+            "stats": payload["stats"],
+            "drivers": payload["drivers"],
+            "anomalies": payload["anomalies"],
+            "interval": payload["interval"],
+            **({"peer_blend": payload["peer_blend"]} if "peer_blend" in payload else {}),
+        },
+    )
+    return payload
+
+
+def get_forecast_payload(store_id: int, history_months: int = 12) -> Dict[str, Any]:
+    """
+    The /forecast payload for a store. Concurrent callers (this route and
+    /bootstrap) for the same store share one computation.
+    """
+    return request_flight.do(
+        ("forecast", store_id, get_artifact_version(), history_months),
+        lambda: run_compute(_stored_forecast_payload, store_id, history_months),
+    )
+
+
+@forecast_bp.get("/forecast/<int:store_id>")
+@limit_concurrency("forecast")
+@with_deadline("forecast")
+def api_forecast(store_id: int) -> Tuple[Response, int]:
+    """
+    Next-period forecast, history, stats and drivers for a store.
+
+    Query params:
+      as_of - optional YYYY-MM; return the forecast the model makes from
+              that month's feature row (for the following month), with
+              history / stats as they stood then and the actual outcome.
+    """
+    try:
+        as_of = parse_month(request.args.get("as_of"))
+        history_months = 12
+
+        if as_of is not None:
+            payload: Dict[str, Any] = request_flight.do(
+                ("forecast_as_of", store_id, get_artifact_version(), as_of),
+                lambda: run_compute(build_asof_forecast_payload, store_id, as_of, history_months),
+            )
+            return jsonify(payload), 200
+
+        payload = get_forecast_payload(store_id, history_months)
         return jsonify(payload), 200
 
-    except ForecastError as exc:
+    except DeadlineExceeded:
+        raise  # answered with 504 by with_deadline
+
+    except HistoryQueryError as exc:
+        return jsonify({"error": str(exc)}), 400
+
+    except AsOfNotFoundError as exc:
+        return jsonify({"store_id": store_id, "error": str(exc)}), 404
+
+    except AsOfError as exc:
         return jsonify({"store_id": store_id, "error": str(exc)}), 500
 
-    except KeyError:
+    except (StoreNotFoundError, KeyError):
         return jsonify({"error": f"Store {store_id} was not found."}), 404
 
+    except ForecastError as exc:
+        return jsonify({"store_id": store_id, "error": str(exc)}), 500
+
     except Exception as exc:
         import traceback
 
@@ -85,3 +229,52 @@ def api_forecast(store_id: int) -> Tuple[Response, int]:
             ),
             500,
         )
+
+
+@forecast_bp.get("/forecast/<int:store_id>/fit")
+def api_forecast_fit(store_id: int) -> Tuple[Response, int]:
+    """
+    Historical model fit: what the model predicted for each past month
+    (from the previous month's feature row) next to the actual.
+
+    Query params:
+      from, to - optional YYYY-MM bounds on the forecast month
+
+    Response (200):
+    {
+      "store_id": 2327,
+      "model_version": "3f2a9c1d0b7e",
+      "points": [ { "date": "2023-09-01T00:00:00", "predicted": 5210.4, "actual": 5388.1 }, ... ],
+      "metrics": { "n": 48, "mae": 402.1, "mape": 0.081, "bias": -35.2 }
+    }
+    """
+    try:
+        start_month = parse_month(request.args.get("from"))
+        end_month = parse_month(request.args.get("to"))
+        payload: Dict[str, Any] = run_compute(get_store_fit, store_id, start_month, end_month)
+        payload["model_version"] = get_artifact_version()
+        return jsonify(payload), 200
+
+    except HistoryQueryError as exc:
+        return jsonify({"error": str(exc)}), 400
+
+    except AsOfNotFoundError as exc:
+        return jsonify({"store_id": store_id, "error": str(exc)}), 404
+
+    except AsOfError as exc:
+        return jsonify({"store_id": store_id, "error": str(exc)}), 500
+
+    except Exception as exc:
+        import traceback
+
+        traceback.print_exc()
+        return (
+            jsonify(
+                {
+                    "store_id": store_id,
+                    "error": "Unexpected server error in /forecast/fit.",
+                    "details": str(exc),
+                }
+            ),
+            500,
+        )
@@ -1,9 +1,17 @@
 # routes/health_routes.py
 from flask import Blueprint
 
+from metrics import collect_metrics
+
 health_bp = Blueprint("health", __name__)
 
 
 @health_bp.get("/health")
 def health():
     return {"ok": True}
+
+
+@health_bp.get("/metrics")
+def metrics():
+    """In-process counters (request coalescing, caches, ...) for this worker."""
+    return collect_metrics()
@@ -0,0 +1,66 @@
+# backend/routes/rankings_routes.py
+from __future__ import annotations
+
+from typing import Any, Dict, Tuple
+
+from flask import Blueprint, jsonify, request, Response
+
+from services.forecast_service import ForecastError
+from services.ranking_service import get_rankings, RankingQueryError
+
+rankings_bp = Blueprint("rankings", __name__)
+
+
+@rankings_bp.get("/rankings")
+def api_rankings() -> Tuple[Response, int]:
+    """
+    Rank the active store fleet by a forecast / history metric.
+
+    Query params:
+      metric - forecast_vs_6 | yoy_growth_12v12 | volatility_ratio | trend_pct
+      order  - desc (default) | asc
+      n      - number of stores to return (default 25)
+
+    Response (200):
+    {
+      "metric": "forecast_vs_6",
+      "order": "desc",
+      "n": 25,
+      "model_version": "3f2a9c1d0b7e",
+      "stores": [
+        { "rank": 1, "store_id": 2327, "label": "2327 - ...", "value": 0.41, ... },
+        ...
+      ]
+    }
+    """
+    metric = request.args.get("metric", "forecast_vs_6")
+    order = request.args.get("order", "desc").lower()
+
+    try:
+        n = int(request.args.get("n", 25))
+    except (TypeError, ValueError):
+        return jsonify({"error": "n must be an integer"}), 400
+
+    try:
+        payload: Dict[str, Any] = get_rankings(metric, order, n)
+        return jsonify(payload), 200
+
+    except RankingQueryError as exc:
+        return jsonify({"error": str(exc)}), 400
+
+    except ForecastError as exc:
+        return jsonify({"error": str(exc)}), 500
+
+    except Exception as exc:
+        import traceback
+
+        traceback.print_exc()
+        return (
+            jsonify(
+                {
+                    "error": "Unexpected server error in /rankings.",
+                    "details": str(exc),
+                }
+            ),
+            500,
+        )
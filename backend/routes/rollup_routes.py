@@ -0,0 +1,83 @@
+# backend/routes/rollup_routes.py
+from __future__ import annotations
+
+from typing import Any, Dict, Tuple
+
+from flask import Blueprint, jsonify, request, Response
+
+from services.forecast_service import ForecastError
+from services.rollup_service import get_custom_rollup, get_rollup, RollupQueryError
+
+rollup_bp = Blueprint("rollups", __name__)
+
+
+def _error_response(exc: Exception) -> Tuple[Response, int]:
+    if isinstance(exc, RollupQueryError):
+        return jsonify({"error": str(exc)}), 400
+    if isinstance(exc, ForecastError):
+        return jsonify({"error": str(exc)}), 500
+
+    import traceback
+
+    traceback.print_exc()
+    return (
+        jsonify(
+            {
+                "error": "Unexpected server error in /rollups.",
+                "details": str(exc),
+            }
+        ),
+        500,
+    )
+
+
+@rollup_bp.get("/rollups")
+def api_rollups() -> Tuple[Response, int]:
+    """
+    Forecast totals aggregated from the active stores' batch forecasts.
+
+    Query params:
+      level - all (default) | city | county | group
+
+    Response (200):
+    {
+      "level": "county",
+      "model_version": "3f2a9c1d0b7e",
+      "n_stores": 1834,
+      "history_months": ["2023-09-01T00:00:00", ..., "2024-08-01T00:00:00"],
+      "total": { "forecast": ..., "last_actual": ..., "avg_last_6": ..., "history": [...] },
+      "groups": [
+        { "group": "POLK", "n_stores": 212, "forecast": ..., "last_actual": ...,
+          "avg_last_6": ..., "forecast_vs_6": 0.04, "share_of_total": 0.18,
+          "history": [...] },
+        ...
+      ],
+      "reconciliation": { "groups_forecast_sum": ..., "total_forecast": ..., "difference": 0.0 }
+    }
+    """
+    level = request.args.get("level", "all").lower()
+    try:
+        payload: Dict[str, Any] = get_rollup(level)
+        return jsonify(payload), 200
+    except Exception as exc:
+        return _error_response(exc)
+
+
+@rollup_bp.post("/rollups")
+def api_custom_rollups() -> Tuple[Response, int]:
+    """
+    Roll up caller-defined store groups.
+
+    Request JSON:
+    { "groups": { "east_region": [2327, 2106], "flagships": [2633, 4829] } }
+
+    Response (200): same shape as GET /rollups with level "group", plus
+    "missing_store_ids" (not active) and "coverage". Groups may overlap,
+    so no reconciliation block is returned.
+    """
+    data: Dict[str, Any] = request.get_json(silent=True) or {}
+    try:
+        payload: Dict[str, Any] = get_custom_rollup(data.get("groups"))
+        return jsonify(payload), 200
+    except Exception as exc:
+        return _error_response(exc)
@@ -0,0 +1,94 @@
+# backend/routes/scenario_routes.py
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from flask import Blueprint, request, jsonify, Response
+
+from serving import limit_concurrency, run_compute
+from services.scenario_service import (
+    run_scenarios,
+    ScenarioError,
+    ScenarioComputationError,
+)
+
+scenario_bp = Blueprint("scenarios", __name__)
+
+
+@scenario_bp.post("/scenarios")
+@limit_concurrency("scenarios")
+def api_scenarios() -> Tuple[Response, int]:
+    """
+    Re-score stores under what-if feature scenarios.
+
+    Request JSON:
+    {
+      "store_ids": [2327, 2106],          # optional; default = all stores
+      "scenarios": [
+        {
+          "name": "last_3_down_20",
+          "multipliers": {
+            "Sale (Dollars)_Lag_1": 0.8,
+            "Sale (Dollars)_Lag_2": 0.8,
+            "Sale (Dollars)_Lag_3": 0.8
+          }
+        },
+        { "name": "as_december", "overrides": { "Month": 12 } }
+      ]
+    }
+
+    Response JSON (200):
+    {
+      "model_version": "...",
+      "scenarios": ["last_3_down_20", "as_december"],
+      "totals": { "baseline": ..., "last_3_down_20": ..., ... },
+      "stores": [
+        { "store_id": 2327, "baseline": 5723.0,
+          "scenarios": { "last_3_down_20": { "prediction": ..., "delta": ..., "delta_pct": ... } } }
+      ],
+      "missing_store_ids": []
+    }
+    """
+    data: Dict[str, Any] = request.get_json(silent=True) or {}
+
+    store_ids: Optional[List[int]] = None
+    if data.get("store_ids") is not None:
+        raw_ids = data["store_ids"]
+        if not isinstance(raw_ids, list):
+            return jsonify({"error": "store_ids must be a list of integers"}), 400
+        try:
+            store_ids = [int(s) for s in raw_ids]
+        except (TypeError, ValueError):
+            return jsonify({"error": "store_ids must be a list of integers"}), 400
+
+    try:
+        result: Dict[str, Any] = run_compute(run_scenarios, data.get("scenarios"), store_ids)
+        return jsonify(result), 200
+
+    except ScenarioError as exc:
+        return jsonify({"error": str(exc)}), 400
+
+    except ScenarioComputationError as exc:
+        return (
+            jsonify(
+                {
+                    "error": "Could not score scenarios.",
+                    "details": str(exc),
+                }
+            ),
+            500,
+        )
+
+    except Exception as exc:
+        import traceback
+
+        traceback.print_exc()
+        return (
+            jsonify(
+                {
+                    "error": "Unexpected server error in /scenarios.",
+                    "details": str(exc),
+                }
+            ),
+            500,
+        )
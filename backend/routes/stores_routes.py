@@ -1,11 +1,22 @@
 # routes/stores_routes.py
 from __future__ import annotations
 
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Tuple
 
-from flask import Blueprint, jsonify, Response
+from flask import Blueprint, jsonify, request, Response
 
-from services.store_service import get_store_list
+from services.store_service import get_cached_store_list
+from services.history_service import (
+    get_store_history,
+    HistoryQueryError,
+    StoreHistoryNotFoundError,
+)
+from services.similarity_service import (
+    get_similar_stores,
+    SimilarityError,
+    SimilarityQueryError,
+    SimilarStoreNotFoundError,
+)
 
 stores_bp = Blueprint("stores", __name__)
 
@@ -26,7 +37,7 @@ def api_get_stores() -> Response:
     On error, returns a 500 with a JSON error payload.
     """
     try:
-        stores: Any = get_store_list()
+        stores: Any = get_cached_store_list()
 
         # Normalize / validate shape defensively (Single Responsibility: route handles HTTP + shape).
         if not isinstance(stores, list):
@@ -67,3 +78,110 @@ def api_get_stores() -> Response:
             ),
             500,
         )
+
+
+@stores_bp.get("/stores/<int:store_id>/history")
+def api_get_store_history(store_id: int) -> Tuple[Response, int]:
+    """
+    Return a store's sales history for a month range at a given grain.
+
+    Query params:
+      from  - first month, 'YYYY-MM' (optional, defaults to the first month)
+      to    - last month, 'YYYY-MM' (optional, defaults to the latest month)
+      grain - 'month' (default), 'quarter' or 'year'
+
+    Response (200):
+    {
+      "store_id": 2327,
+      "grain": "quarter",
+      "from": "2020-01",
+      "to": null,
+      "history": [
+        { "date": "2020-01-01T00:00:00", "period": "2020-Q1", "sales": 18234.5, "months": 3 },
+        ...
+      ]
+    }
+    """
+    try:
+        payload: Dict[str, Any] = get_store_history(
+            store_id,
+            start=request.args.get("from"),
+            end=request.args.get("to"),
+            grain=request.args.get("grain", "month"),
+        )
+        return jsonify(payload), 200
+
+    except HistoryQueryError as exc:
+        return jsonify({"store_id": store_id, "error": str(exc)}), 400
+
+    except StoreHistoryNotFoundError as exc:
+        return jsonify({"store_id": store_id, "error": str(exc)}), 404
+
+    except Exception as exc:
+        import traceback
+
+        traceback.print_exc()
+        return (
+            jsonify(
+                {
+                    "store_id": store_id,
+                    "error": "Unexpected server error in /stores/<id>/history.",
+                    "details": str(exc),
+                }
+            ),
+            500,
+        )
+
+
+@stores_bp.get("/stores/<int:store_id>/similar")
+def api_get_similar_stores(store_id: int) -> Tuple[Response, int]:
+    """
+    Return the stores most similar to `store_id` by profile (sales level,
+    market share, variability and seasonal shape), nearest first.
+
+    Query params:
+      k - number of peers (default 10, max 50)
+
+    Response (200):
+    {
+      "store_id": 2327,
+      "k": 10,
+      "model_version": "3f2a9c1d0b7e",
+      "profile_features": ["log_store_mean_sales", ...],
+      "similar": [
+        { "store_id": 2106, "label": "2106 - ...", "distance": 0.42, "prediction": 5310.2 },
+        ...
+      ]
+    }
+    """
+    try:
+        k = int(request.args.get("k", 10))
+    except (TypeError, ValueError):
+        return jsonify({"error": "k must be an integer"}), 400
+
+    try:
+        payload: Dict[str, Any] = get_similar_stores(store_id, k)
+        return jsonify(payload), 200
+
+    except SimilarityQueryError as exc:
+        return jsonify({"error": str(exc)}), 400
+
+    except SimilarStoreNotFoundError as exc:
+        return jsonify({"store_id": store_id, "error": str(exc)}), 404
+
+    except SimilarityError as exc:
+        return jsonify({"store_id": store_id, "error": str(exc)}), 500
+
+    except Exception as exc:
+        import traceback
+
+        traceback.print_exc()
+        return (
+            jsonify(
+                {
+                    "error": "Unexpected server error in /stores/<id>/similar.",
+                    "details": str(exc),
+                }
+            ),
+            500,
+        )
@@ -0,0 +1,412 @@
+# backend/score.py
+#
+# Offline batch scoring of every store in the latest features table,
+# without going through Flask. Stores are split into shards that run on a
+# process pool; the feature matrix and fleet stats are put in shared
+# memory once and every worker reads the same pages. Each worker writes
+# its own shard file; the parent writes a manifest and, optionally, the
+# results into the shared result store.
+#
+#   cd backend
+#   python -m score --workers 8 --horizons 3 --stats --intervals --out score_out
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from columnar import resolve_format, write_frame
+from config import DEFAULT_DATASET
+from model_utils import (
+    current_dataset,
+    enter_dataset,
+    get_artifact_version,
+    get_latest_feature_matrix,
+    get_model,
+    use_dataset,
+)
+from services.analytics_service import (
+    _compute_trend_direction,
+    forecast_vs_avg,
+    get_fleet_stats,
+    volatility_labels,
+)
+from services.feature_derivation import advance_one_month
+from shared_arrays import SharedArrays, attach
+from store_lookup import get_store_name
+
+
+DEFAULT_SHARD_SIZE = 500
+MAX_HORIZONS = 12
+
+# Fleet stats carried into the shared arrays (numeric; labels are derived
+# in the workers).
+_STAT_ARRAYS = [
+    "months_active",
+    "last_actual",
+    "avg_last_3",
+    "avg_last_6",
+    "avg_last_12",
+    "volatility_ratio",
+    "yoy_growth_12v12",
+]
+
+
+# --- artifact -> arrays ------------------------------------
+
+def load_score_arrays(with_intervals: bool = False) -> Dict[str, Any]:
+    """
+    The latest feature matrix plus each store's fleet stats (and, with
+    `with_intervals`, its P10 / P50 / P90 residual factors), as flat arrays
+    aligned on the feature matrix rows (sorted store ids).
+    """
+    fm = get_latest_feature_matrix()
+    arrays: Dict[str, np.ndarray] = {
+        "X": np.ascontiguousarray(fm.X, dtype=np.float64),
+        "store": fm.store_ids.astype(np.int64),
+    }
+
+    stats = get_fleet_stats().reindex(fm.store_ids)
+    for name in _STAT_ARRAYS:
+        arrays[f"stat_{name}"] = stats[name].to_numpy(dtype=np.float64)
+    arrays["stat_months_active"] = np.nan_to_num(arrays["stat_months_active"])
+
+    if with_intervals:
+        from services.interval_service import get_interval_table
+
+        table = get_interval_table()
+        arrays["interval_factors"] = np.ascontiguousarray(
+            table.factors[table.bucket_of(fm.store_ids)], dtype=np.float64
+        )
+
+    return {"arrays": arrays, "feature_cols": list(fm.feature_cols)}
+
+
+def target_months(X: np.ndarray, col: Dict[str, int]) -> np.ndarray:
+    """Month index (months since 1970-01) each row forecasts: the row's month + 1."""
+    if "Year" not in col or "Month" not in col:
+        return np.full(len(X), -1, dtype=np.int64)
+    year = np.nan_to_num(X[:, col["Year"]], nan=1970).astype(np.int64)
+    month = np.nan_to_num(X[:, col["Month"]], nan=1).astype(np.int64)
+    return (year - 1970) * 12 + (month - 1) + 1
+
+
+def score_columns(horizons: int, with_stats: bool, with_intervals: bool = False) -> List[str]:
+    columns = ["store_id", "store_name", "target_month", "prediction"]
+    if with_intervals:
+        columns += ["p10", "p50", "p90"]
+    columns += [f"prediction_h{h}" for h in range(2, horizons + 1)]
+    if with_stats:
+        columns += [
+            "months_active",
+            "last_actual",
+            "avg_last_3",
+            "avg_last_6",
+            "avg_last_12",
+            "trend_direction",
+            "volatility",
+            "forecast_vs_6",
+            "yoy_growth_12v12",
+            "is_limited_history",
+        ]
+    return columns
+
+
+# --- worker side -------------------------------------------
+
+_worker: Dict[str, Any] = {}
+
+
+def _init_worker(spec, feature_cols: List[str], n_threads: int, horizons: int,
+                 with_stats: bool, out_dir: str, fmt: str, dataset: str) -> None:
+    # Limit OpenMP before the model (and xgboost) is loaded in this process.
+    os.environ["OMP_NUM_THREADS"] = str(n_threads)
+    enter_dataset(dataset)  # for the life of the worker
+
+    model: Any = get_model()
+    try:
+        model.set_params(n_jobs=n_threads)
+    except Exception:
+        pass  # not an sklearn-style estimator; OMP_NUM_THREADS still applies
+
+    _worker.update(
+        arrays=attach(spec),
+        feature_cols=feature_cols,
+        col={c: j for j, c in enumerate(feature_cols)},
+        model=model,
+        horizons=horizons,
+        with_stats=with_stats,
+        out_dir=out_dir,
+        fmt=fmt,
+    )
+
+
+def _predict(X: np.ndarray) -> np.ndarray:
+    frame = pd.DataFrame(X, columns=_worker["feature_cols"])
+    return np.asarray(_worker["model"].predict(frame), dtype=float).reshape(-1)
+
+
+def _score_shard(shard: int, lo: int, hi: int) -> Dict[str, Any]:
+    """Score rows [lo, hi): all horizons, optional stats, one output file."""
+    t0 = time.perf_counter()
+    a = _worker["arrays"]
+    col = _worker["col"]
+
+    X = a["X"][lo:hi]
+    store_ids = a["store"][lo:hi]
+
+    # Horizon h + 1 is predicted from the row advanced with horizon h.
+    preds: List[np.ndarray] = [_predict(X)]
+    for _ in range(2, _worker["horizons"] + 1):
+        X = advance_one_month(X, col, preds[-1])
+        preds.append(_predict(X))
+
+    data: Dict[str, Any] = {
+        "store_id": store_ids,
+        "store_name": [get_store_name(int(s)) for s in store_ids],
+        "target_month": np.datetime_as_string(
+            target_months(a["X"][lo:hi], col).astype("datetime64[M]")
+        ),
+        "prediction": preds[0],
+    }
+    if "interval_factors" in a:
+        bands = np.sort(preds[0][:, None] * a["interval_factors"][lo:hi], axis=1)
+        data.update(p10=bands[:, 0], p50=bands[:, 1], p90=bands[:, 2])
+    for h, p in enumerate(preds[1:], start=2):
+        data[f"prediction_h{h}"] = p
+
+    if _worker["with_stats"]:
+        months_active = a["stat_months_active"][lo:hi].astype(np.int64)
+        last_actual = a["stat_last_actual"][lo:hi]
+        avg_6 = a["stat_avg_last_6"][lo:hi]
+        data.update(
+            {
+                "months_active": months_active,
+                "last_actual": last_actual,
+                "avg_last_3": a["stat_avg_last_3"][lo:hi],
+                "avg_last_6": avg_6,
+                "avg_last_12": a["stat_avg_last_12"][lo:hi],
+                "trend_direction": [
+                    _compute_trend_direction(
+                        None if np.isnan(la) else float(la),
+                        None if np.isnan(a6) else float(a6),
+                    )
+                    for la, a6 in zip(last_actual, avg_6)
+                ],
+                "volatility": volatility_labels(a["stat_volatility_ratio"][lo:hi]),
+                "forecast_vs_6": forecast_vs_avg(preds[0], np.nan_to_num(avg_6)),
+                "yoy_growth_12v12": a["stat_yoy_growth_12v12"][lo:hi],
+                "is_limited_history": months_active < 6,
+            }
+        )
+
+    df = pd.DataFrame(data)
+    path = write_frame(
+        df, os.path.join(_worker["out_dir"], f"shard-{shard:05d}"), _worker["fmt"]
+    )
+    return {
+        "shard": shard,
+        "path": os.path.basename(path),
+        "rows": int(len(df)),
+        "first_store_id": int(store_ids[0]) if len(store_ids) else None,
+        "last_store_id": int(store_ids[-1]) if len(store_ids) else None,
+        "seconds": round(time.perf_counter() - t0, 3),
+        "store_ids": store_ids.copy(),
+        "predictions": preds[0],
+    }
+
+
+# --- result store ------------------------------------------
+
+def write_result_store(path: str, store_ids: np.ndarray, predictions: np.ndarray,
+                       batch_size: int = 500) -> int:
+    """
+    Upsert forecast rows (prediction + the context the forecast route
+    serves) for every scored store, so API workers start warm.
+    """
+    from result_store import ResultStore
+    from services.analytics_service import build_forecast_contexts
+    from services.drivers_service import get_driver_table
+    from services.interval_service import get_interval_table
+    from services.similarity_service import peer_blend
+
+    store = ResultStore(path)
+    version = get_artifact_version()
+    try:
+        drivers = get_driver_table()
+    except Exception:
+        drivers = None
+    try:
+        intervals = get_interval_table()
+    except Exception:
+        intervals = None
+
+    written = 0
+    for lo in range(0, len(store_ids), batch_size):
+        ids = store_ids[lo:lo + batch_size]
+        preds = predictions[lo:lo + batch_size]
+        rows = []
+        for ctx in build_forecast_contexts(ids, preds):
+            context = {
+                "history": ctx["history"],
+                "stats": ctx["stats"],
+                "drivers": drivers.top_drivers(ctx["store_id"]) if drivers else [],
+                "anomalies": ctx.get("anomalies", []),
+                "interval": (
+                    intervals.interval(ctx["store_id"], ctx["prediction"]) if intervals else None
+                ),
+            }
+            if ctx["stats"]["is_limited_history"]:
+                try:
+                    blend = peer_blend(
+                        ctx["store_id"], ctx["prediction"], ctx["stats"]["months_active"]
+                    )
+                except Exception:
+                    blend = None
+                if blend is not None:
+                    context["peer_blend"] = blend
+            rows.append(
+                {"store_id": ctx["store_id"], "prediction": ctx["prediction"], "context": context}
+            )
+        written += store.upsert_many(version, rows)
+    return written
+
+
+# --- driver ------------------------------------------------
+
+def run_score(
+    *,
+    out_dir: str,
+    fmt: str,
+    workers: Optional[int] = None,
+    horizons: int = 1,
+    with_stats: bool = False,
+    with_intervals: bool = False,
+    shard_size: int = DEFAULT_SHARD_SIZE,
+) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+    """
+    Score every store into shard files under `out_dir`. Returns the
+    manifest and the next-period forecasts ({"store_id", "prediction"}).
+    """
+    if horizons < 1 or horizons > MAX_HORIZONS:
+        raise ValueError(f"horizons must be between 1 and {MAX_HORIZONS}.")
+    if shard_size < 1:
+        raise ValueError("shard_size must be at least 1.")
+
+    t0 = time.perf_counter()
+    loaded = load_score_arrays(with_intervals)
+    arrays = loaded["arrays"]
+    n = len(arrays["store"])
+    bounds = [(i, lo, min(lo + shard_size, n)) for i, lo in enumerate(range(0, n, shard_size))]
+    if not bounds:
+        raise ValueError("The latest features table has no stores to score.")
+
+    cpus = os.cpu_count() or 1
+    workers = max(1, min(workers or cpus, len(bounds)))
+    n_threads = max(1, cpus // workers)  # workers * threads <= cores
+    os.makedirs(out_dir, exist_ok=True)
+
+    shards: List[Dict[str, Any]] = []
+    with SharedArrays(arrays) as shared:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(shared.spec, loaded["feature_cols"], n_threads, horizons,
+                      with_stats, out_dir, fmt, current_dataset()),
+        ) as pool:
+            futures = [pool.submit(_score_shard, *b) for b in bounds]
+            for fut in as_completed(futures):
+                shards.append(fut.result())
+
+    shards.sort(key=lambda s: s["shard"])
+    elapsed = time.perf_counter() - t0
+
+    manifest: Dict[str, Any] = {
+        "dataset": current_dataset(),
+        "model_version": get_artifact_version(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "format": fmt,
+        "horizons": horizons,
+        "columns": score_columns(horizons, with_stats, with_intervals),
+        "n_stores": n,
+        "workers": workers,
+        "threads_per_worker": n_threads,
+        "elapsed_seconds": round(elapsed, 3),
+        "stores_per_second": round(n / elapsed, 1) if elapsed > 0 else None,
+        "shards": [
+            {k: v for k, v in s.items() if k not in ("store_ids", "predictions")}
+            for s in shards
+        ],
+    }
+    scored = {
+        "store_id": np.concatenate([s["store_ids"] for s in shards]),
+        "prediction": np.concatenate([s["predictions"] for s in shards]),
+    }
+    return manifest, scored
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Batch-score every store offline.")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes (default: all cores)")
+    parser.add_argument("--horizons", type=int, default=1,
+                        help=f"months ahead to forecast, 1-{MAX_HORIZONS} (default 1)")
+    parser.add_argument("--stats", action="store_true",
+                        help="include the context stats columns")
+    parser.add_argument("--intervals", action="store_true",
+                        help="include P10 / P50 / P90 columns for the next period")
+    parser.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE,
+                        help="stores per output shard")
+    parser.add_argument("--format", default="parquet", choices=["parquet", "csv"])
+    parser.add_argument("--out", default="score_out", help="output directory")
+    parser.add_argument("--result-store", default=None, metavar="PATH",
+                        help="also upsert forecasts into this result store (SQLite)")
+    parser.add_argument("--dataset", default=DEFAULT_DATASET,
+                        help=f"dataset to score (default {DEFAULT_DATASET}; others from DATASETS_DIR)")
+    args = parser.parse_args(argv)
+
+    with use_dataset(args.dataset):
+        _score_main(args)
+
+
+def _score_main(args: argparse.Namespace) -> None:
+    fmt = resolve_format(args.format)
+    if fmt != args.format:
+        print("pyarrow is not installed; writing CSV instead of Parquet.")
+    manifest, scored = run_score(
+        out_dir=args.out,
+        fmt=fmt,
+        workers=args.workers,
+        horizons=args.horizons,
+        with_stats=args.stats,
+        with_intervals=args.intervals,
+        shard_size=args.shard_size,
+    )
+    if args.result_store:
+        manifest["result_store"] = {
+            "path": args.result_store,
+            "rows_written": write_result_store(
+                args.result_store, scored["store_id"], scored["prediction"]
+            ),
+        }
+
+    with open(os.path.join(args.out, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    print(
+        f"Scored {manifest['n_stores']} stores x {manifest['horizons']} horizon(s) "
+        f"into {len(manifest['shards'])} {fmt} shard(s) in {manifest['elapsed_seconds']}s "
+        f"on {manifest['workers']} workers: {manifest['stores_per_second']:,} stores/s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -3,9 +3,17 @@ from __future__ import annotations
 
 from typing import Any, Dict, Optional
 
-from services.forecast_service import forecast_for_store
+from access_log import stage
+from model_utils import get_artifact_version
+from result_store import get_result_store
+from services.forecast_service import forecast_for_store, get_forecast_table
 from services.analytics_service import build_forecast_context
 from services.llm_service import explain_forecast
+from serving import DeadlineExceeded, check_deadline, run_compute
+from services.drivers_service import get_store_drivers
+from services.similarity_service import peer_blend
+from services.interval_service import peek_store_interval
+from services.asof_service import build_asof_forecast_payload, AsOfNotFoundError
 
 
 # --------
@@ -31,23 +39,71 @@ class ExplanationGenerationError(Exception):
 # Use case / application service
 # --------
 
+def _model_prediction(store_id: int) -> Optional[float]:
+    """The model's batch prediction for a store, or None if unavailable."""
+    try:
+        return get_forecast_table().get(store_id)
+    except Exception:
+        return None
+
+
 def generate_forecast_explanation(
     store_id: int,
     prediction_override: Optional[float] = None,
+    as_of: Optional[int] = None,
 ) -> Dict[str, Any]:
     """
     Orchestrate the full 'explain forecast' use case:
 
     1) Compute or use the given prediction.
-    2) Build analytics context (history, stats, category mix, etc.).
+    2) Build analytics context (history, stats, top feature drivers, etc.).
     3) Ask the LLM to generate a manager-friendly explanation.
 
+    The request deadline (if any) is checked between stages, including
+    before the explanation is rendered; DeadlineExceeded is raised as-is so
+    the route can answer 504.
+
+    When the shared result store is enabled, a stored explanation for the
+    same store, artifact version and prediction is returned directly, and
+    new explanations are written back for other workers.
+
+    With `as_of` (a month index), the forecast and context are the
+    point-in-time ones from the all-months table; those are never stored.
+
     Returns a dict ready to jsonify in the route.
     """
+    if as_of is not None:
+        return _explain_as_of(store_id, as_of, prediction_override)
+
+    try:
+        store = get_result_store()
+    except Exception:
+        store = None
+    version = get_artifact_version() if store is not None else None
+
+    if store is not None:
+        row = store.get(store_id, version)
+        if row and row["explanation"] is not None and row["context"] is not None:
+            same_prediction = prediction_override is None
+            if not same_prediction:
+                try:
+                    same_prediction = float(prediction_override) == row["prediction"]
+                except (TypeError, ValueError):
+                    same_prediction = False
+            if same_prediction:
+                context = dict(row["context"], store_id=store_id, prediction=row["prediction"])
+                return {
+                    "store_id": store_id,
+                    "prediction": row["prediction"],
+                    "context": context,
+                    "explanation": row["explanation"],
+                }
+
     # 1) Get numeric forecast
     try:
         if prediction_override is None:
-            prediction: float = float(forecast_for_store(store_id))
+            with stage("forecast"):
+                prediction: float = float(run_compute(forecast_for_store, store_id))
         else:
             prediction = float(prediction_override)
     except KeyError as exc:
@@ -59,17 +115,106 @@ def generate_forecast_explanation(
         ) from exc
 
     # 2) Build analytics context
+    check_deadline("context")
     try:
-        context: Dict[str, Any] = build_forecast_context(store_id, prediction)
+        with stage("context"):
+            context: Dict[str, Any] = run_compute(build_forecast_context, store_id, prediction)
     except Exception as exc:
         # keep this generic for now; you could add an AnalyticsError later
         raise ForecastComputationError(
             f"Failed to build analytics context for store {store_id}"
         ) from exc
 
+    # Top feature contributions come from the precomputed table; they are
+    # optional, so never fail the explanation because of them.
+    try:
+        with stage("drivers"):
+            context["drivers"] = get_store_drivers(store_id)
+    except Exception:
+        context["drivers"] = []
+
+    try:
+        context["interval"] = peek_store_interval(store_id, prediction)
+    except Exception:
+        context["interval"] = None
+
+    stats = context.get("stats") or {}
+    if stats.get("is_limited_history"):
+        try:
+            blend = peer_blend(store_id, prediction, int(stats.get("months_active") or 0))
+        except Exception:
+            blend = None
+        if blend is not None:
+            context["peer_blend"] = blend
+
     # 3) Generate LLM explanation
+    check_deadline("explanation")
+    try:
+        with stage("explanation"):
+            explanation: str = run_compute(explain_forecast, context)
+    except DeadlineExceeded:
+        raise
+    except Exception as exc:
+        raise ExplanationGenerationError(
+            f"Failed to generate explanation for store {store_id}"
+        ) from exc
+
+    # Only explanations of the model's own prediction are shareable.
+    if store is not None and (
+        prediction_override is None or prediction == _model_prediction(store_id)
+    ):
+        store.upsert(
+            store_id,
+            version,
+            prediction=prediction,
+            context={k: v for k, v in context.items() if k not in ("store_id", "prediction")},
+            explanation=explanation,
+        )
+
+    return {
+        "store_id": store_id,
+        "prediction": prediction,
+        "context": context,
+        "explanation": explanation,
+    }
+
+
+def _explain_as_of(
+    store_id: int,
+    as_of: int,
+    prediction_override: Optional[float] = None,
+) -> Dict[str, Any]:
+    try:
+        payload = run_compute(build_asof_forecast_payload, store_id, as_of)
+    except AsOfNotFoundError as exc:
+        raise StoreNotFoundError(str(exc)) from exc
+    except Exception as exc:
+        raise ForecastComputationError(
+            f"Failed to compute the as-of forecast for store {store_id}"
+        ) from exc
+
+    try:
+        prediction = (
+            payload["prediction"] if prediction_override is None else float(prediction_override)
+        )
+    except (TypeError, ValueError) as exc:
+        raise ForecastComputationError("prediction must be a number") from exc
+
+    context: Dict[str, Any] = {
+        "store_id": store_id,
+        "prediction": prediction,
+        "history": payload["history"],
+        "stats": payload["stats"],
+        "drivers": [],
+        "as_of": payload["as_of"],
+    }
+
+    check_deadline("explanation")
     try:
-        explanation: str = explain_forecast(context)
+        with stage("explanation"):
+            explanation: str = run_compute(explain_forecast, context)
+    except DeadlineExceeded:
+        raise
     except Exception as exc:
         raise ExplanationGenerationError(
             f"Failed to generate explanation for store {store_id}"
@@ -1,8 +1,12 @@
 # backend/services/analytics_service.py
 from typing import Dict, Any, List, Optional
+import numpy as np
 import pandas as pd
 
-from model_utils import get_history_df, get_model_config
+from model_utils import get_history_df, get_model_config, get_derived
+from services.anomaly_service import get_store_anomalies
+from services.forecast_service import get_forecast_table
+from services.history_service import HistoryIndex, get_history_index, month_index_to_iso
 
 
 def _safe_mean(series: pd.Series) -> Optional[float]:
@@ -47,6 +51,36 @@ def _compute_volatility(recent: pd.DataFrame, target_col: str) -> Optional[str]:
         return "low"
 
 
+def _empty_context(store_id: int, prediction: float) -> Dict[str, Any]:
+    """Context for a store with no history rows."""
+    return {
+        "store_id": store_id,
+        "prediction": prediction,
+        "history": [],
+        "stats": {
+            "months_active": 0,
+            "last_actual": None,
+            "avg_last_3": None,
+            "avg_last_6": None,
+            "avg_last_12": None,
+            "trend_direction": "unknown",
+            "volatility": None,
+            "forecast_vs_6": None,
+            "yoy_growth_12v12": None,
+            "is_limited_history": True,
+        },
+        "anomalies": [],
+    }
+
+
+def _flagged_months(store_id: int, start_month: int, end_month: int) -> List[Dict[str, Any]]:
+    """Flagged months of the store inside the context window ([] if unavailable)."""
+    try:
+        return get_store_anomalies(store_id, start_month, end_month)
+    except Exception:
+        return []
+
+
 def build_forecast_context(
     store_id: int,
     prediction: float,
@@ -76,26 +110,10 @@ def build_forecast_context(
     # -------------------------
     # Store filtering
     # -------------------------
-    df_store = df[df[store_col] == store_id].copy().sort_values(date_col)
+    df_store = df[df[store_col] == store_id].sort_values(date_col)  # sort_values copies
 
     if df_store.empty:
-        return {
-            "store_id": store_id,
-            "prediction": prediction,
-            "history": [],
-            "stats": {
-                "months_active": 0,
-                "last_actual": None,
-                "avg_last_3": None,
-                "avg_last_6": None,
-                "avg_last_12": None,
-                "trend_direction": "unknown",
-                "volatility": None,
-                "forecast_vs_6": None,
-                "yoy_growth_12v12": None,
-                "is_limited_history": True,
-            },
-        }
+        return _empty_context(store_id, prediction)
 
     # -------------------------
     # Recent window & history list
@@ -157,6 +175,12 @@ def build_forecast_context(
 
     is_limited_history = months_active < 6
 
+    # -------------------------
+    # Flagged months in the window
+    # -------------------------
+    window = pd.to_datetime(recent[date_col]).to_numpy(dtype="datetime64[M]").astype(np.int64)
+    anomalies = _flagged_months(store_id, int(window[0]), int(window[-1]))
+
     # -------------------------
     # Final context
     # -------------------------
@@ -176,4 +200,245 @@ def build_forecast_context(
             "yoy_growth_12v12": yoy_growth,
             "is_limited_history": is_limited_history,
         },
+        "anomalies": anomalies,
     }
+
+
+# -------------------------
+# Fleet-wide (vectorized) stats
+# -------------------------
+
+FLEET_STAT_COLUMNS = [
+    "months_active",
+    "last_month",
+    "last_actual",
+    "avg_last_3",
+    "avg_last_6",
+    "avg_last_12",
+    "volatility_ratio",
+    "trend_pct",
+    "yoy_growth_12v12",
+]
+
+
+def _tail_matrix(sales: np.ndarray, starts: np.ndarray, ends: np.ndarray,
+                 width: int) -> np.ndarray:
+    """
+    Right-aligned (n_stores, width) matrix of each store's last `width`
+    values, NaN-padded on the left for stores with shorter history.
+    """
+    idx = ends[:, None] - width + np.arange(width)[None, :]
+    valid = idx >= starts[:, None]
+    out = np.full(idx.shape, np.nan)
+    out[valid] = sales[idx[valid]]
+    return out
+
+
+def _nanmean_rows(m: np.ndarray) -> np.ndarray:
+    counts = np.sum(~np.isnan(m), axis=1)
+    sums = np.nansum(m, axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
+def build_fleet_stats(
+    history_months: int = 12,
+    *,
+    index: Optional[HistoryIndex] = None,
+) -> pd.DataFrame:
+    """
+    Compute the `stats` block of build_forecast_context for every store
+    at once, as a DataFrame indexed by store id.
+
+    Uses the same windows as the per-store path: averages, trend and
+    volatility over the last `history_months` rows, YoY as last 12 vs
+    previous 12 when a store has at least 24 months. Ratios are kept
+    numeric (volatility_ratio, trend_pct) so they can be ranked;
+    `trend_direction` / `volatility` labels are derived from them.
+    """
+    index = index if index is not None else get_history_index()
+    monthly = index.series["month"]
+    starts = monthly.offsets[:-1]
+    ends = monthly.offsets[1:]
+    sales = monthly.sales
+
+    months_active = (ends - starts).astype(np.int64)
+    has_rows = months_active > 0
+    last_pos = np.where(has_rows, ends - 1, 0)
+
+    window = max(int(history_months), 24)
+    tail = _tail_matrix(sales, starts, ends, window)
+    recent = tail[:, -history_months:]
+
+    last_actual = np.where(has_rows, tail[:, -1], np.nan)
+    last_month = np.where(has_rows, monthly.keys[last_pos], -1)
+    avg_3 = _nanmean_rows(recent[:, -3:])
+    avg_6 = _nanmean_rows(recent[:, -6:])
+    avg_12 = _nanmean_rows(recent[:, -12:])
+
+    # volatility: sample std / mean over the recent window (needs > 1 row)
+    n_recent = np.sum(~np.isnan(recent), axis=1)
+    mean_recent = _nanmean_rows(recent)
+    sq_dev = np.nansum((recent - mean_recent[:, None]) ** 2, axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        std_recent = np.sqrt(sq_dev / (n_recent - 1))
+        volatility_ratio = np.where(
+            (n_recent > 1) & (mean_recent > 0), std_recent / mean_recent, np.nan
+        )
+        trend_pct = np.where(
+            ~np.isnan(avg_6) & (avg_6 != 0), (last_actual - avg_6) / avg_6, np.nan
+        )
+
+        last12 = np.nansum(tail[:, -12:], axis=1)
+        prev12 = np.nansum(tail[:, -24:-12], axis=1)
+        yoy = np.where(
+            (months_active >= 24) & (prev12 > 0), (last12 - prev12) / prev12, np.nan
+        )
+
+    return pd.DataFrame(
+        {
+            "months_active": months_active,
+            "last_month": last_month,
+            "last_actual": last_actual,
+            "avg_last_3": avg_3,
+            "avg_last_6": avg_6,
+            "avg_last_12": avg_12,
+            "volatility_ratio": volatility_ratio,
+            "trend_pct": trend_pct,
+            "yoy_growth_12v12": yoy,
+        },
+        index=pd.Index(index.store_ids, name="store_id"),
+    )
+
+
+def get_fleet_stats() -> pd.DataFrame:
+    """Fleet stats for the default 12-month window (built once per artifact version)."""
+    return get_derived("fleet_stats", build_fleet_stats)
+
+
+def volatility_labels(ratios: np.ndarray) -> np.ndarray:
+    """
+    Vectorized `_compute_volatility` buckets for std/mean ratios:
+    'high' (> 0.35), 'medium' (> 0.20), 'low', or '' where the ratio is NaN.
+    """
+    ratios = np.asarray(ratios, dtype=float)
+    return np.select(
+        [np.isnan(ratios), ratios > 0.35, ratios > 0.20],
+        ["", "high", "medium"],
+        default="low",
+    )
+
+
+def forecast_vs_avg(predictions: np.ndarray, avg_6: np.ndarray) -> np.ndarray:
+    """Vectorized `forecast_vs_6`: (prediction - avg_6) / avg_6 where avg_6 > 0."""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(avg_6 > 0, (predictions - avg_6) / avg_6, np.nan)
+
+
+def _build_active_fleet_table() -> pd.DataFrame:
+    """
+    One row per active store with its batch forecast and fleet stats.
+
+    "Active" matches /api/stores: the store has a row for the latest month
+    in the history table and a row in the latest features table.
+    """
+    stats = get_fleet_stats()
+    table = get_forecast_table()
+
+    pos = table.positions(stats.index.to_numpy())
+    latest_month = stats["last_month"].max()
+    keep = (pos >= 0) & (stats["last_month"].to_numpy() == latest_month)
+
+    df = stats.loc[keep].copy()
+    df["prediction"] = table.predictions[pos[keep]]
+    df["forecast_vs_6"] = forecast_vs_avg(
+        df["prediction"].to_numpy(), df["avg_last_6"].to_numpy()
+    )
+    return df
+
+
+def get_active_fleet_table() -> pd.DataFrame:
+    """Active-store forecast + stats table (built once per artifact version)."""
+    return get_derived("active_fleet", _build_active_fleet_table)
+
+
+def _optional_float(value: float) -> Optional[float]:
+    return None if np.isnan(value) else float(value)
+
+
+def build_forecast_contexts(
+    store_ids: np.ndarray,
+    predictions: np.ndarray,
+    history_months: int = 12,
+    *,
+    index: Optional[HistoryIndex] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Batch equivalent of build_forecast_context: one context per store,
+    built from the history index and fleet stats without per-store
+    pandas filtering. Output matches the per-store path field for field.
+    """
+    if index is None and history_months == 12:
+        index, stats = get_history_index(), get_fleet_stats()
+    else:
+        index = index if index is not None else get_history_index()
+        stats = build_fleet_stats(history_months, index=index)
+
+    store_ids = np.asarray(store_ids, dtype=np.int64)
+    predictions = np.asarray(predictions, dtype=float)
+
+    if len(index.store_ids):
+        pos = np.minimum(np.searchsorted(index.store_ids, store_ids), len(index.store_ids) - 1)
+        found = index.store_ids[pos] == store_ids
+    else:
+        pos = np.zeros(len(store_ids), dtype=np.int64)
+        found = np.zeros(len(store_ids), dtype=bool)
+
+    monthly = index.series["month"]
+    starts = monthly.offsets[:-1][pos]
+    ends = monthly.offsets[1:][pos]
+    first = np.maximum(starts, ends - history_months)
+
+    cols = {c: stats[c].to_numpy() for c in FLEET_STAT_COLUMNS}
+    fvs6 = forecast_vs_avg(predictions, np.nan_to_num(cols["avg_last_6"][pos]))
+    vol = volatility_labels(cols["volatility_ratio"][pos])
+
+    contexts: List[Dict[str, Any]] = []
+    for i, store_id in enumerate(store_ids):
+        prediction = float(predictions[i])
+        p = pos[i]
+        months_active = int(cols["months_active"][p]) if found[i] else 0
+        if months_active == 0:
+            contexts.append(_empty_context(int(store_id), prediction))
+            continue
+
+        history = [
+            {"date": month_index_to_iso(int(monthly.keys[j])), "sales": float(monthly.sales[j])}
+            for j in range(first[i], ends[i])
+        ]
+        last_actual = _optional_float(cols["last_actual"][p])
+        avg_6 = _optional_float(cols["avg_last_6"][p])
+
+        contexts.append(
+            {
+                "store_id": int(store_id),
+                "prediction": prediction,
+                "history": history,
+                "stats": {
+                    "months_active": months_active,
+                    "last_actual": last_actual,
+                    "avg_last_3": _optional_float(cols["avg_last_3"][p]),
+                    "avg_last_6": avg_6,
+                    "avg_last_12": _optional_float(cols["avg_last_12"][p]),
+                    "trend_direction": _compute_trend_direction(last_actual, avg_6),
+                    "volatility": vol[i] or None,
+                    "forecast_vs_6": _optional_float(fvs6[i]),
+                    "yoy_growth_12v12": _optional_float(cols["yoy_growth_12v12"][p]),
+                    "is_limited_history": months_active < 6,
+                },
+                "anomalies": _flagged_months(
+                    int(store_id), int(monthly.keys[first[i]]), int(monthly.keys[ends[i] - 1])
+                ),
+            }
+        )
+    return contexts
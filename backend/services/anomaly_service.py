@@ -0,0 +1,289 @@
+# backend/services/anomaly_service.py
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from model_utils import get_artifact_version, get_derived
+from services.history_service import HistoryIndex, get_history_index, month_index_to_iso
+
+
+ANOMALY_TYPES = ("spike", "drop", "missing", "level_shift")
+
+ROBUST_Z_THRESHOLD = 3.5     # |0.6745 * (x - median) / MAD| on deseasonalized sales
+LOCAL_LEVEL_HALF_WINDOW = 3  # months either side of the rolling median "local level"
+MIN_MONTHS_FOR_Z = 6         # stores with fewer months are not z-scored
+LEVEL_SHIFT_BEFORE = 6       # months averaged before a candidate shift
+LEVEL_SHIFT_AFTER = 3        # months averaged from the shift on
+LEVEL_SHIFT_MIN_LOG = 0.4    # |log(after / before)|, i.e. about +49% / -33%
+LEVEL_SHIFT_MIN_Z = 4.0      # |after - before| in robust standard errors of the difference
+
+MAX_ANOMALIES_N = 1000
+
+
+class AnomalyQueryError(Exception):
+    """Raised when an anomaly query has invalid parameters."""
+    pass
+
+
+class AnomalyTable:
+    """
+    Sparse (store, month, type, score) table of flagged store-months,
+    sorted by (store, month), with per-store offsets.
+
+    score by type:
+      spike / drop  - robust z-score of deseasonalized sales
+      missing       - length of the gap the month belongs to
+      level_shift   - log(mean after / mean before); sign gives direction
+
+    `recent_order` lists rows newest month first (ties by |score|), for
+    fleet-wide listings without a per-request sort.
+    """
+
+    def __init__(self, store_ids: np.ndarray, store: np.ndarray, month: np.ndarray,
+                 kind: np.ndarray, score: np.ndarray) -> None:
+        order = np.lexsort((kind, month, store))
+        self.store = store[order]
+        self.month = month[order]
+        self.kind = kind[order]
+        self.score = score[order]
+        self.store_ids = store_ids
+        self.offsets = np.append(
+            np.searchsorted(self.store, store_ids, side="left"), len(self.store)
+        ).astype(np.int64)
+        self._pos: Dict[int, int] = {int(sid): i for i, sid in enumerate(store_ids)}
+        self.recent_order = np.lexsort((-np.abs(self.score), -self.month))
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def store_rows(self, store_id: int) -> slice:
+        pos = self._pos.get(int(store_id))
+        if pos is None:
+            return slice(0, 0)
+        return slice(int(self.offsets[pos]), int(self.offsets[pos + 1]))
+
+    def row_dict(self, i: int) -> Dict[str, Any]:
+        return {
+            "store_id": int(self.store[i]),
+            "date": month_index_to_iso(int(self.month[i])),
+            "type": ANOMALY_TYPES[int(self.kind[i])],
+            "score": float(self.score[i]),
+        }
+
+
+def _group_median(values: np.ndarray, group: np.ndarray, n_groups: int) -> np.ndarray:
+    """Median of `values` per group id in [0, n_groups); NaN for empty groups."""
+    order = np.lexsort((values, group))
+    v, g = values[order], group[order]
+    counts = np.bincount(g, minlength=n_groups)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    out = np.full(n_groups, np.nan)
+    has = counts > 0
+    lo = starts[has] + (counts[has] - 1) // 2
+    hi = starts[has] + counts[has] // 2
+    out[has] = (v[lo] + v[hi]) / 2.0
+    return out
+
+
+def _rolling_median(values: np.ndarray, offsets: np.ndarray, row_group: np.ndarray,
+                    half: int) -> np.ndarray:
+    """Centered rolling median of width 2 * half + 1, clipped to each group's rows."""
+    n = len(values)
+    idx = np.arange(n)[:, None] + np.arange(-half, half + 1)[None, :]
+    inside = (idx >= offsets[:-1][row_group][:, None]) & (idx < offsets[1:][row_group][:, None])
+    window = np.where(inside, values[np.clip(idx, 0, max(n - 1, 0))], np.nan)
+    return np.nanmedian(window, axis=1)
+
+
+def _windows_mean(csum: np.ndarray, row: np.ndarray, a: int, b: int) -> np.ndarray:
+    """Mean of rows [row + a, row + b) from an exclusive prefix sum."""
+    return (csum[row + b] - csum[row + a]) / (b - a)
+
+
+def build_anomaly_table(index: Optional[HistoryIndex] = None) -> AnomalyTable:
+    """
+    Scan every store's monthly history in vectorized passes:
+
+    - deseasonalize with fleet-wide month-of-year factors (median of sales
+      over the store's median), take residuals from a centered rolling
+      median (the store's local level), then flag |robust z| >=
+      ROBUST_Z_THRESHOLD against the store's residual MAD as spike or drop;
+    - emit one 'missing' row per calendar month absent between a store's
+      first and last month;
+    - flag level shifts where the next LEVEL_SHIFT_AFTER months' mean moves
+      away from the previous LEVEL_SHIFT_BEFORE months' mean by more than
+      LEVEL_SHIFT_MIN_LOG (log ratio) and by LEVEL_SHIFT_MIN_Z standard
+      errors (MAD-based), keeping the strongest month of a run.
+    """
+    index = index if index is not None else get_history_index()
+    monthly = index.series["month"]
+    keys, sales, offsets = monthly.keys, monthly.sales, monthly.offsets
+    n_stores = len(index.store_ids)
+    counts = np.diff(offsets)
+    row_store = np.repeat(np.arange(n_stores), counts)
+    n = len(keys)
+
+    parts_store: List[np.ndarray] = []
+    parts_month: List[np.ndarray] = []
+    parts_kind: List[np.ndarray] = []
+    parts_score: List[np.ndarray] = []
+
+    def emit(rows_store: np.ndarray, rows_month: np.ndarray, kind: str, score: np.ndarray) -> None:
+        parts_store.append(index.store_ids[rows_store])
+        parts_month.append(rows_month)
+        parts_kind.append(np.full(len(rows_store), ANOMALY_TYPES.index(kind), dtype=np.int8))
+        parts_score.append(score.astype(np.float32))
+
+    if n:
+        # --- deseasonalize -----------------------------------
+        store_median = _group_median(sales, row_store, n_stores)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            ratio = sales / store_median[row_store]
+        moy = (keys % 12).astype(np.int64)
+        ok = np.isfinite(ratio) & (ratio > 0)
+        seasonal = _group_median(ratio[ok], moy[ok], 12) if ok.any() else np.ones(12)
+        seasonal = np.where(np.isfinite(seasonal) & (seasonal > 0), seasonal, 1.0)
+        deseason = sales / seasonal[moy]
+
+        # --- robust z around the local level ------------------
+        # Residuals from a rolling median, so a store that steps to a new
+        # level is not flagged month after month on either side of the step.
+        local = _rolling_median(deseason, offsets, row_store, LOCAL_LEVEL_HALF_WINDOW)
+        resid = deseason - local
+        med = _group_median(resid, row_store, n_stores)
+        mad = _group_median(np.abs(resid - med[row_store]), row_store, n_stores)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            z = 0.6745 * (resid - med[row_store]) / mad[row_store]
+        eligible = (counts[row_store] >= MIN_MONTHS_FOR_Z) & (mad[row_store] > 0)
+        flagged = eligible & np.isfinite(z) & (np.abs(z) >= ROBUST_Z_THRESHOLD)
+
+        # --- missing months ----------------------------------
+        same_store = row_store[1:] == row_store[:-1]
+        gap = np.where(same_store, np.diff(keys) - 1, 0)
+        g = np.flatnonzero(gap > 0)
+        if len(g):
+            lengths = gap[g]
+            rep = np.repeat(g, lengths)
+            step = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+            emit(row_store[rep], keys[rep] + 1 + step, "missing", gap[rep].astype(float))
+
+        # --- level shifts ------------------------------------
+        # Spikes / drops are replaced by the local level so one outlier
+        # cannot fake a shift in the window means.
+        level = np.where(flagged, local, deseason)
+        csum = np.concatenate(([0.0], np.cumsum(level)))
+        pos_in_store = np.arange(n) - offsets[:-1][row_store]
+        candidate = (pos_in_store >= LEVEL_SHIFT_BEFORE) & (
+            pos_in_store + LEVEL_SHIFT_AFTER <= counts[row_store]
+        )
+        c = np.flatnonzero(candidate)
+        near_shift = np.zeros(n, dtype=bool)
+        if len(c):
+            before = _windows_mean(csum, c, -LEVEL_SHIFT_BEFORE, 0)
+            after = _windows_mean(csum, c, 0, LEVEL_SHIFT_AFTER)
+            # Noisy stores swing by 50% on their own; require the move to
+            # stand out from the store's month-to-month noise as well.
+            se = 1.4826 * mad[row_store[c]] * np.sqrt(1 / LEVEL_SHIFT_BEFORE + 1 / LEVEL_SHIFT_AFTER)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                log_ratio = np.log(after / before)
+                shift_z = (after - before) / se
+            log_ratio = np.where(np.abs(shift_z) >= LEVEL_SHIFT_MIN_Z, log_ratio, 0.0)
+            score = np.full(n, 0.0)
+            score[c] = np.nan_to_num(log_ratio, nan=0.0, posinf=0.0, neginf=0.0)
+            strength = np.abs(score)
+            # keep the strongest month of each run of neighbouring candidates
+            prev_s = np.concatenate(([0.0], np.where(same_store, strength[:-1], 0.0)))
+            next_s = np.concatenate((np.where(same_store, strength[1:], 0.0), [0.0]))
+            peak = (strength >= LEVEL_SHIFT_MIN_LOG) & (strength >= prev_s) & (strength > next_s)
+            emit(row_store[peak], keys[peak], "level_shift", score[peak])
+
+            # The rolling median lags a step by a few months; residuals
+            # there belong to the shift, not to single-month outliers.
+            p = np.flatnonzero(peak)
+            for d in range(-LOCAL_LEVEL_HALF_WINDOW, LOCAL_LEVEL_HALF_WINDOW + 1):
+                r = p + d
+                ok_r = (r >= 0) & (r < n)
+                r, same = r[ok_r], p[ok_r]
+                near_shift[r[row_store[r] == row_store[same]]] = True
+
+        # --- spikes / drops ----------------------------------
+        outlier = flagged & ~near_shift
+        for kind, mask in (("spike", outlier & (z > 0)), ("drop", outlier & (z < 0))):
+            emit(row_store[mask], keys[mask], kind, z[mask])
+
+    if parts_store:
+        store = np.concatenate(parts_store).astype(np.int64)
+        month = np.concatenate(parts_month).astype(np.int64)
+        kind = np.concatenate(parts_kind)
+        score = np.concatenate(parts_score)
+    else:
+        store = month = np.zeros(0, dtype=np.int64)
+        kind = np.zeros(0, dtype=np.int8)
+        score = np.zeros(0, dtype=np.float32)
+
+    return AnomalyTable(index.store_ids, store, month, kind, score)
+
+
+def get_anomaly_table() -> AnomalyTable:
+    """Anomaly table for the current artifacts (built once per version)."""
+    return get_derived("anomaly_table", build_anomaly_table)
+
+
+def get_store_anomalies(
+    store_id: int,
+    start_month: Optional[int] = None,
+    end_month: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """A store's flagged months in [start_month, end_month], oldest first."""
+    table = get_anomaly_table()
+    sl = table.store_rows(store_id)
+    months = table.month[sl]
+    lo = 0 if start_month is None else int(np.searchsorted(months, start_month, "left"))
+    hi = len(months) if end_month is None else int(np.searchsorted(months, end_month, "right"))
+    return [table.row_dict(i) for i in range(sl.start + lo, sl.start + hi)]
+
+
+def list_anomalies(
+    *,
+    store_id: Optional[int] = None,
+    kind: Optional[str] = None,
+    start_month: Optional[int] = None,
+    end_month: Optional[int] = None,
+    limit: int = 100,
+) -> Dict[str, Any]:
+    """
+    Flagged store-months, newest first (a single store: oldest first),
+    filtered by type and month range.
+
+    :raises AnomalyQueryError: On an unknown type or a bad limit.
+    """
+    if kind is not None and kind not in ANOMALY_TYPES:
+        raise AnomalyQueryError(
+            f"Invalid type {kind!r}; expected one of {list(ANOMALY_TYPES)}."
+        )
+    if limit < 1 or limit > MAX_ANOMALIES_N:
+        raise AnomalyQueryError(f"limit must be between 1 and {MAX_ANOMALIES_N}.")
+
+    table = get_anomaly_table()
+    if store_id is not None:
+        sl = table.store_rows(store_id)
+        rows = np.arange(sl.start, sl.stop)
+    else:
+        rows = table.recent_order
+
+    keep = np.ones(len(rows), dtype=bool)
+    if kind is not None:
+        keep &= table.kind[rows] == ANOMALY_TYPES.index(kind)
+    if start_month is not None:
+        keep &= table.month[rows] >= start_month
+    if end_month is not None:
+        keep &= table.month[rows] <= end_month
+    rows = rows[keep]
+
+    return {
+        "model_version": get_artifact_version(),
+        "total": int(len(rows)),
+        "anomalies": [table.row_dict(int(i)) for i in rows[:limit]],
+    }
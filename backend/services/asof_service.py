@@ -0,0 +1,291 @@
+# backend/services/asof_service.py
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from model_utils import (
+    get_all_features_df,
+    get_derived,
+    get_feature_cols,
+    get_model,
+    get_model_config,
+    peek_derived,
+)
+from services.analytics_service import build_forecast_context
+from services.history_service import get_history_index, month_index_to_iso
+
+
+# Rows scored per model call when the full fit matrix is built.
+FIT_PREDICT_CHUNK = 200_000
+
+
+class AsOfError(Exception):
+    """Raised when point-in-time forecasts cannot be served from the artifacts."""
+    pass
+
+
+class AsOfNotFoundError(Exception):
+    """Raised when the all-months table has no row for a (store, month)."""
+    pass
+
+
+class AllMonthsIndex:
+    """
+    The all-months feature table as a float32 matrix, sorted by
+    (store, month), with two ways in:
+
+    - per store: `offsets` bound each store's rows, and a searchsorted on
+      that slice's months finds the (store, month) row;
+    - per month: `month_rows[m]` lists the rows of month m, and
+      `rank_in_month[row]` is the row's position in that list, so one
+      batched prediction per month serves every store.
+
+    `actual[row]` is the table's target for the row (next month's sales),
+    NaN when the table carries no target.
+    """
+
+    def __init__(self, store_ids: np.ndarray, offsets: np.ndarray, month: np.ndarray,
+                 X: np.ndarray, actual: np.ndarray, feature_cols: List[str]) -> None:
+        self.store_ids = store_ids
+        self.offsets = offsets
+        self.month = month
+        self.X = X
+        self.actual = actual
+        self.feature_cols = feature_cols
+        self._pos: Dict[int, int] = {int(sid): i for i, sid in enumerate(store_ids)}
+
+        order = np.argsort(month, kind="stable")
+        self.months, starts = np.unique(month[order], return_index=True)
+        bounds = np.append(starts, len(order))
+        self.month_rows: Dict[int, np.ndarray] = {
+            int(m): order[bounds[i]:bounds[i + 1]] for i, m in enumerate(self.months)
+        }
+        self.rank_in_month = np.empty(len(month), dtype=np.int64)
+        self.rank_in_month[order] = np.arange(len(order)) - np.repeat(starts, np.diff(bounds))
+
+    def store_rows(self, store_id: int) -> slice:
+        pos = self._pos.get(int(store_id))
+        if pos is None:
+            raise AsOfNotFoundError(f"Store {store_id} has no rows in the all-months table.")
+        return slice(int(self.offsets[pos]), int(self.offsets[pos + 1]))
+
+    def row(self, store_id: int, month: int) -> int:
+        """Row of (store_id, month) in the sorted table."""
+        sl = self.store_rows(store_id)
+        i = sl.start + int(np.searchsorted(self.month[sl], month))
+        if i >= sl.stop or self.month[i] != month:
+            raise AsOfNotFoundError(
+                f"Store {store_id} has no feature row for {np.datetime64(int(month), 'M')}."
+            )
+        return i
+
+    def frame(self, rows: np.ndarray) -> pd.DataFrame:
+        return pd.DataFrame(self.X[rows], columns=self.feature_cols)
+
+
+def _build_all_months_index() -> AllMonthsIndex:
+    df = get_all_features_df()
+    if not isinstance(df, pd.DataFrame):
+        raise AsOfError(
+            "features_all_stable_v3.pkl must contain a DataFrame with one row per "
+            f"store and month for as-of forecasts, got {type(df).__name__}."
+        )
+
+    cfg = get_model_config()
+    store_col = cfg["store_col"]
+    target_col = cfg["target_col"]
+    date_col = "MonthStart" if "MonthStart" in df.columns else cfg["date_col"]
+    if store_col not in df.columns or date_col not in df.columns:
+        raise AsOfError(
+            f"All-months feature table must contain '{store_col}' and '{date_col}' columns."
+        )
+
+    feature_cols = get_feature_cols(df)
+    missing = [c for c in feature_cols if c not in df.columns]
+    if missing:
+        raise AsOfError(f"Feature columns missing from the all-months table: {missing}")
+
+    stores = df[store_col].to_numpy(dtype=np.int64)
+    month = pd.to_datetime(df[date_col]).to_numpy(dtype="datetime64[M]").astype(np.int64)
+    order = np.lexsort((month, stores))
+    stores, month = stores[order], month[order]
+
+    store_ids, starts = np.unique(stores, return_index=True)
+    offsets = np.append(starts, len(stores)).astype(np.int64)
+
+    X = df[feature_cols].to_numpy(dtype=np.float32)[order]
+    actual = (
+        df[target_col].to_numpy(dtype=float)[order]
+        if target_col in df.columns
+        else np.full(len(order), np.nan)
+    )
+    return AllMonthsIndex(store_ids, offsets, month, X, actual, list(feature_cols))
+
+
+def get_all_months_index() -> AllMonthsIndex:
+    """
+    (store, month) index over the all-months table (built once per version).
+
+    :raises AsOfError: If the table is not a usable store x month DataFrame.
+    """
+    try:
+        return get_derived("all_months_index", _build_all_months_index)
+    except AsOfError:
+        raise
+    except Exception as exc:
+        raise AsOfError("Failed to load the all-months feature table.") from exc
+
+
+def _predict(index: AllMonthsIndex, rows: np.ndarray) -> np.ndarray:
+    model: Any = get_model()
+    return np.asarray(model.predict(index.frame(rows)), dtype=float).reshape(-1)
+
+
+def _build_fit_matrix() -> np.ndarray:
+    index = get_all_months_index()
+    out = np.empty(len(index.month))
+    for lo in range(0, len(out), FIT_PREDICT_CHUNK):
+        rows = np.arange(lo, min(lo + FIT_PREDICT_CHUNK, len(out)))
+        out[rows] = _predict(index, rows)
+    return out
+
+
+def get_fit_matrix() -> np.ndarray:
+    """
+    Model prediction for every row of the all-months table, aligned with
+    AllMonthsIndex rows (built once per version in a few batched calls).
+    """
+    return get_derived("asof_fit_matrix", _build_fit_matrix)
+
+
+def _month_predictions(month: int) -> np.ndarray:
+    """Predictions for every store's row of `month`, in `month_rows` order."""
+    index = get_all_months_index()
+    return get_derived(
+        f"asof_month:{month}", lambda: _predict(index, index.month_rows[month])
+    )
+
+
+def asof_prediction(store_id: int, month: int) -> float:
+    """
+    The model's prediction from the (store_id, month) feature row, i.e. the
+    forecast for the following month made with data through `month`.
+
+    Served from the full fit matrix when it is already built, otherwise
+    from one batched call covering every store in that month.
+
+    :raises AsOfNotFoundError: If the table has no row for the pair.
+    :raises AsOfError: If the all-months table is unusable.
+    """
+    index = get_all_months_index()
+    row = index.row(store_id, month)
+
+    fit = peek_derived("asof_fit_matrix")
+    if fit is not None:
+        return float(fit[row])
+    return float(_month_predictions(month)[index.rank_in_month[row]])
+
+
+def build_asof_forecast_payload(store_id: int, month: int,
+                                history_months: int = 12) -> Dict[str, Any]:
+    """
+    Point-in-time forecast payload: the prediction from the `month` feature
+    row, the store's history and stats as they stood at the end of `month`,
+    and the actual outcome of the forecast month when it is known.
+    """
+    prediction = asof_prediction(store_id, month)
+    index = get_all_months_index()
+    actual = float(index.actual[index.row(store_id, month)])
+
+    # History up to and including `month`, from the history index.
+    history = get_history_index()
+    monthly = history.series["month"]
+    if history.has_store(store_id):
+        sl = history.store_slice(store_id)
+        end = sl.start + int(np.searchsorted(monthly.keys[sl], month, "right"))
+        keys, sales = monthly.keys[sl.start:end], monthly.sales[sl.start:end]
+    else:
+        keys, sales = np.zeros(0, dtype=np.int64), np.zeros(0)
+
+    cfg = get_model_config()
+    history_df = pd.DataFrame(
+        {
+            cfg["store_col"]: np.full(len(keys), store_id, dtype=np.int64),
+            cfg["date_col"]: keys.astype("datetime64[M]").astype("datetime64[ns]"),
+            cfg["target_col"]: sales,
+        }
+    )
+    context = build_forecast_context(
+        store_id, prediction, history_months, history_df=history_df, config=cfg
+    )
+
+    target = month + 1
+    return {
+        "store_id": store_id,
+        "prediction": prediction,
+        "as_of": str(np.datetime64(int(month), "M")),
+        "target_month": month_index_to_iso(target),
+        "actual": None if np.isnan(actual) else actual,
+        "history": context["history"],
+        "stats": context["stats"],
+        "next_period_label": str(np.datetime64(int(target), "M")),
+        "drivers": [],
+    }
+
+
+def get_store_fit(store_id: int, start_month: Optional[int] = None,
+                  end_month: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Predicted vs actual for every month the store has a feature row,
+    keyed by the month being forecast, read from the precomputed fit matrix.
+
+    :raises AsOfNotFoundError: If the store is not in the all-months table.
+    """
+    index = get_all_months_index()
+    fit = get_fit_matrix()
+    sl = index.store_rows(store_id)
+
+    target = index.month[sl] + 1
+    lo = 0 if start_month is None else int(np.searchsorted(target, start_month, "left"))
+    hi = len(target) if end_month is None else int(np.searchsorted(target, end_month, "right"))
+    rows = np.arange(sl.start + lo, sl.start + hi)
+
+    predicted = fit[rows]
+    actual = index.actual[rows]
+    known = ~np.isnan(actual)
+    err = predicted[known] - actual[known]
+    nonzero = actual[known] != 0
+
+    return {
+        "store_id": store_id,
+        "points": [
+            {
+                "date": month_index_to_iso(int(index.month[r]) + 1),
+                "predicted": float(fit[r]),
+                "actual": None if np.isnan(index.actual[r]) else float(index.actual[r]),
+            }
+            for r in rows
+        ],
+        "metrics": {
+            "n": int(known.sum()),
+            "mae": float(np.abs(err).mean()) if len(err) else None,
+            "mape": (
+                float(np.abs(err[nonzero] / actual[known][nonzero]).mean())
+                if nonzero.any() else None
+            ),
+            "bias": float(err.mean()) if len(err) else None,
+        },
+    }
+
+
+def warm_fit_matrix() -> None:
+    """Build the fit matrix ahead of the first request (errors are logged)."""
+    try:
+        get_fit_matrix()
+    except Exception:
+        import traceback
+
+        traceback.print_exc()
@@ -0,0 +1,330 @@
+# backend/services/drift_service.py
+from __future__ import annotations
+
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import DRIFT_PSI_ALERT, DRIFT_PSI_WARN
+from metrics import register_metrics
+from model_utils import (
+    current_dataset,
+    get_artifact_version,
+    get_derived,
+    get_latest_feature_matrix,
+    peek_derived,
+)
+from services.asof_service import AsOfError, get_all_months_index
+from services.feature_derivation import CALENDAR_COLS
+
+
+PSI_BINS = 10        # quantile bins of the training table used for PSI
+KS_GRID = 100        # quantile grid the binned KS statistic is evaluated on
+PSI_EPS = 1e-4       # floor for empty bins so PSI stays finite
+
+# dataset -> outcome of the gate run when its bundle was last loaded
+_load_gates: Dict[str, Dict[str, Any]] = {}
+_load_gates_lock = threading.Lock()
+
+# Features that are the same for every store in a month (calendar and
+# statewide totals), or dominated by them (store-vs-market dollar diffs).
+# The latest table holds a single month, so these always "drift" against
+# multi-year training data; they are reported but never fail the gate.
+TIME_FEATURE_PREFIXES = ("total_",)
+TIME_FEATURES = set(CALENDAR_COLS) | {
+    "Year", "Month", "store_vs_market_roll3_diff", "store_vs_market_roll12_diff",
+}
+
+
+class DriftError(Exception):
+    """Raised when the drift report cannot be computed."""
+    pass
+
+
+def is_time_feature(name: str) -> bool:
+    return name in TIME_FEATURES or name.startswith(TIME_FEATURE_PREFIXES)
+
+
+class DriftReference:
+    """
+    Pre-binned training distribution for every feature.
+
+    Each feature is mapped to [0, 1] with its training min / max and
+    shifted into its own lane [2f, 2f + 1], so one searchsorted over the
+    concatenated (sorted) edges bins every feature of a matrix at once.
+
+    - psi_edges (F, PSI_BINS - 1): interior decile edges, lane-shifted
+    - psi_train (F, PSI_BINS): training share of rows per bin
+    - ks_edges (F, KS_GRID): quantile grid, lane-shifted
+    - ks_train (F, KS_GRID): training CDF at each grid point
+    """
+
+    def __init__(self, feature_cols: List[str], lo: np.ndarray, span: np.ndarray,
+                 psi_edges: np.ndarray, psi_train: np.ndarray,
+                 ks_edges: np.ndarray, ks_train: np.ndarray,
+                 train_missing: np.ndarray, train_mean: np.ndarray,
+                 train_std: np.ndarray, n_train: int) -> None:
+        self.feature_cols = feature_cols
+        self.lo = lo
+        self.span = span
+        self.psi_edges = psi_edges
+        self.psi_train = psi_train
+        self.ks_edges = ks_edges
+        self.ks_train = ks_train
+        self.train_missing = train_missing
+        self.train_mean = train_mean
+        self.train_std = train_std
+        self.n_train = n_train
+
+    def lanes(self, X: np.ndarray) -> np.ndarray:
+        """Map raw values into per-feature lanes (NaN stays NaN)."""
+        n_features = len(self.feature_cols)
+        with np.errstate(invalid="ignore"):
+            unit = np.clip((X - self.lo) / self.span, -0.25, 1.25)
+        return unit + 2.0 * np.arange(n_features)
+
+    def bin_counts(self, X: np.ndarray, edges: np.ndarray) -> np.ndarray:
+        """
+        Per-feature counts of rows at or below each edge-delimited bin:
+        returns (F, n_edges + 1) counts for one flattened searchsorted.
+        """
+        n_features, n_edges = edges.shape
+        L = self.lanes(X)
+        valid = ~np.isnan(L)
+        flat_edges = edges.ravel()
+        pos = np.searchsorted(flat_edges, L[valid], side="right")
+        feature = np.broadcast_to(np.arange(n_features), L.shape)[valid]
+        local = pos - feature * n_edges  # 0..n_edges within the feature's lane
+        counts = np.bincount(
+            feature * (n_edges + 1) + local, minlength=n_features * (n_edges + 1)
+        )
+        return counts.reshape(n_features, n_edges + 1)
+
+
+def _column_quantiles(S: np.ndarray, n_valid: np.ndarray, q: np.ndarray) -> np.ndarray:
+    """
+    Lower quantiles `q` of each column of a column-sorted matrix whose NaNs
+    sit at the bottom (np.sort order). Returns (F, len(q)).
+    """
+    idx = np.floor(q[None, :] * (np.maximum(n_valid, 1) - 1)[:, None]).astype(np.int64)
+    return np.take_along_axis(S, idx.T, axis=0).T
+
+
+def _train_cdf(ref: DriftReference, S: np.ndarray, n_valid: np.ndarray,
+               edges: np.ndarray) -> np.ndarray:
+    """
+    Share of training values strictly below each lane edge, per feature,
+    read off the column-sorted training matrix (same lane mapping as
+    bin_counts, so training and new data are binned identically).
+    """
+    cdf = np.empty(edges.shape)
+    for j in range(S.shape[1]):
+        col = S[: n_valid[j], j].astype(np.float64)
+        lane = np.clip((col - ref.lo[j]) / ref.span[j], -0.25, 1.25) + 2.0 * j
+        cdf[j] = np.searchsorted(lane, edges[j], side="left")
+    return cdf / np.maximum(n_valid, 1)[:, None]
+
+
+def _build_reference_from(X: np.ndarray, feature_cols: List[str]) -> DriftReference:
+    n_features = X.shape[1]
+
+    # One column sort gives min / max and every quantile (NaNs sort last).
+    S = np.sort(X, axis=0)
+    n_valid = (~np.isnan(S)).sum(axis=0)
+    has = n_valid > 0
+    lo = np.where(has, S[0], 0.0).astype(np.float64)
+    hi = np.where(has, S[np.maximum(n_valid - 1, 0), np.arange(n_features)], 0.0).astype(np.float64)
+    span = np.where(np.isfinite(hi - lo) & (hi > lo), hi - lo, 1.0)
+
+    lane = 2.0 * np.arange(n_features)[:, None]
+    qs = _column_quantiles(S, n_valid, np.linspace(0, 1, KS_GRID + 1)[1:])
+    ks_edges = np.clip((np.nan_to_num(qs) - lo[:, None]) / span[:, None], 0, 1) + lane
+
+    psi_q = _column_quantiles(S, n_valid, np.linspace(0, 1, PSI_BINS + 1)[1:-1])
+    psi_edges = np.clip((np.nan_to_num(psi_q) - lo[:, None]) / span[:, None], 0, 1) + lane
+
+    ref = DriftReference(
+        feature_cols, lo, span, psi_edges, np.zeros((n_features, PSI_BINS)),
+        ks_edges, np.zeros((n_features, KS_GRID)),
+        1.0 - n_valid / max(len(X), 1),
+        np.nanmean(X, axis=0, dtype=np.float64), np.nanstd(X, axis=0, dtype=np.float64),
+        len(X),
+    )
+
+    ref.ks_train = _train_cdf(ref, S, n_valid, ks_edges)
+    psi_cdf = _train_cdf(ref, S, n_valid, psi_edges)
+    ref.psi_train = np.diff(psi_cdf, prepend=0.0, append=1.0, axis=1)
+    return ref
+
+
+def _build_reference() -> DriftReference:
+    index = get_all_months_index()
+    return _build_reference_from(index.X, index.feature_cols)
+
+
+def get_drift_reference() -> DriftReference:
+    """Training-table histograms (built once per artifact version)."""
+    try:
+        return get_derived("drift_reference", _build_reference)
+    except AsOfError as exc:
+        raise DriftError(str(exc)) from exc
+
+
+def _status(psi: float) -> str:
+    if psi >= DRIFT_PSI_ALERT:
+        return "alert"
+    if psi >= DRIFT_PSI_WARN:
+        return "warn"
+    return "ok"
+
+
+def compute_drift(X: np.ndarray, ref: Optional[DriftReference] = None) -> Dict[str, Any]:
+    """
+    Compare a feature matrix (rows x ref.feature_cols) with the training
+    distribution: per-feature PSI over decile bins, binned KS over a
+    100-point quantile grid, missing-rate change and mean shift in training
+    standard deviations, all in one vectorized pass.
+    """
+    ref = ref if ref is not None else get_drift_reference()
+    X = np.asarray(X, dtype=np.float64)
+
+    n_valid = np.maximum((~np.isnan(X)).sum(axis=0), 1)[:, None]
+    p_new = ref.bin_counts(X, ref.psi_edges) / n_valid
+    p_old = ref.psi_train
+    a, b = np.maximum(p_new, PSI_EPS), np.maximum(p_old, PSI_EPS)
+    psi = np.sum((a - b) * np.log(a / b), axis=1)
+
+    cdf_new = np.cumsum(ref.bin_counts(X, ref.ks_edges), axis=1)[:, :-1] / n_valid
+    ks = np.max(np.abs(cdf_new - ref.ks_train), axis=1)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_shift = np.where(
+            ref.train_std > 0, (np.nanmean(X, axis=0) - ref.train_mean) / ref.train_std, 0.0
+        )
+    missing = np.isnan(X).mean(axis=0)
+
+    features: List[Dict[str, Any]] = []
+    for j, name in enumerate(ref.feature_cols):
+        features.append(
+            {
+                "feature": name,
+                "psi": float(psi[j]),
+                "ks": float(ks[j]),
+                "mean_shift_std": float(np.nan_to_num(mean_shift[j])),
+                "missing_rate": float(missing[j]),
+                "train_missing_rate": float(ref.train_missing[j]),
+                "scope": "time" if is_time_feature(name) else "store",
+                "status": _status(float(psi[j])),
+            }
+        )
+    features.sort(key=lambda f: f["psi"], reverse=True)
+
+    passed, failing = drift_gate(features)
+    return {
+        "n_rows": int(len(X)),
+        "n_train_rows": int(ref.n_train),
+        "thresholds": {"psi_warn": DRIFT_PSI_WARN, "psi_alert": DRIFT_PSI_ALERT},
+        "gate": {"passed": passed, "failing_features": failing},
+        "features": features,
+    }
+
+
+def drift_gate(features: List[Dict[str, Any]],
+               max_psi: float = DRIFT_PSI_ALERT) -> Tuple[bool, List[str]]:
+    """
+    Hot-swap gate: fail when any store-level feature reaches `max_psi` or
+    gains missing values the training table did not have.
+    """
+    failing = [
+        f["feature"]
+        for f in features
+        if f["scope"] == "store"
+        and (f["psi"] >= max_psi or f["missing_rate"] > f["train_missing_rate"] + 0.05)
+    ]
+    return not failing, failing
+
+
+def _build_drift_report() -> Dict[str, Any]:
+    fm = get_latest_feature_matrix()
+    ref = get_drift_reference()
+    if list(fm.feature_cols) != list(ref.feature_cols):
+        raise DriftError("Latest and training feature columns differ.")
+    _, report = check_candidate_features(fm.X, ref)
+    report["model_version"] = get_artifact_version()
+    return report
+
+
+def get_drift_report() -> Dict[str, Any]:
+    """
+    Drift of the latest features vs the training table, cached for the
+    current artifact pair (any change to either file yields a new version).
+
+    :raises DriftError: If either table cannot be used.
+    """
+    try:
+        return get_derived("drift_report", _build_drift_report)
+    except DriftError:
+        raise
+    except Exception as exc:
+        raise DriftError("Failed to compute feature drift.") from exc
+
+
+def check_candidate_features(X: np.ndarray,
+                             ref: Optional[DriftReference] = None) -> Tuple[bool, Dict[str, Any]]:
+    """
+    Gate a candidate latest-features matrix (same feature_cols as the
+    training table) before it is swapped in. Returns (passed, report).
+    """
+    report = compute_drift(X, ref)
+    return report["gate"]["passed"], report
+
+
+def gate_loaded_features() -> bool:
+    """
+    Dataset-load check: build (or reuse) the drift report of the bundle
+    just loaded and record its gate outcome under "drift.load_gates" in
+    /api/metrics. A failing bundle keeps serving; it is flagged there and
+    on stderr, since the artifacts on disk are all there is to serve.
+    """
+    report = get_drift_report()
+    passed = bool(report["gate"]["passed"])
+    failing = list(report["gate"]["failing_features"])
+    with _load_gates_lock:
+        _load_gates[current_dataset()] = {
+            "passed": passed,
+            "failing_features": failing,
+            "model_version": report.get("model_version"),
+            "checked_at": time.time(),
+        }
+    if not passed:
+        print(
+            f"Drift gate failed for dataset '{current_dataset()}' "
+            f"({report.get('model_version')}): {', '.join(failing)}",
+            file=sys.stderr,
+        )
+    return passed
+
+
+def drift_metrics() -> Dict[str, Any]:
+    """Summary for /api/metrics; reads the cached report only, never builds it."""
+    with _load_gates_lock:
+        load_gates = {name: dict(gate) for name, gate in _load_gates.items()}
+    report = peek_derived("drift_report")
+    if report is None:
+        return {"computed": False, "load_gates": load_gates}
+    store_level = [f for f in report["features"] if f["scope"] == "store"]
+    return {
+        "computed": True,
+        "load_gates": load_gates,
+        "gate_passed": report["gate"]["passed"],
+        "max_psi": max((f["psi"] for f in store_level), default=0.0),
+        "max_ks": max((f["ks"] for f in store_level), default=0.0),
+        "n_warn": sum(f["status"] == "warn" for f in store_level),
+        "n_alert": sum(f["status"] == "alert" for f in store_level),
+    }
+
+
+register_metrics("drift", drift_metrics)
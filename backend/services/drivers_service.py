@@ -0,0 +1,115 @@
+# backend/services/drivers_service.py
+from __future__ import annotations
+
+from typing import Any, Dict, List
+
+import numpy as np
+
+from model_utils import (
+    get_model,
+    get_latest_feature_matrix,
+    get_derived,
+)
+
+
+# How many drivers are kept per store in the precomputed table.
+DRIVERS_TOP_K = 5
+
+
+class DriverError(Exception):
+    """Raised when per-feature contributions cannot be computed."""
+    pass
+
+
+class DriverTable:
+    """
+    Compact top-k per-feature contributions for every store.
+
+    Row i belongs to `store_ids[i]` (sorted). `feature_idx[i, j]` indexes
+    into `feature_names` and `values[i, j]` is that feature's contribution
+    to the prediction, in dollars, ordered by absolute size. `bias` is the
+    model's base value shared by all rows.
+    """
+
+    def __init__(self, feature_names: List[str], store_ids: np.ndarray,
+                 feature_idx: np.ndarray, values: np.ndarray, bias: np.ndarray) -> None:
+        self.feature_names = feature_names
+        self.store_ids = store_ids
+        self.feature_idx = feature_idx
+        self.values = values
+        self.bias = bias
+        self._pos: Dict[int, int] = {int(sid): i for i, sid in enumerate(store_ids)}
+
+    def top_drivers(self, store_id: int, k: int = DRIVERS_TOP_K) -> List[Dict[str, Any]]:
+        pos = self._pos.get(int(store_id))
+        if pos is None:
+            return []
+        return [
+            {
+                "feature": self.feature_names[int(self.feature_idx[pos, j])],
+                "contribution": float(self.values[pos, j]),
+            }
+            for j in range(min(k, self.feature_idx.shape[1]))
+        ]
+
+
+def _top_k_by_magnitude(contribs: np.ndarray, k: int):
+    """Column indices / values of the k largest |contribs| per row, largest first."""
+    k = min(k, contribs.shape[1])
+    mag = np.abs(contribs)
+    part = np.argpartition(-mag, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(mag, part, axis=1), axis=1, kind="stable")
+    idx = np.take_along_axis(part, order, axis=1)
+    return idx, np.take_along_axis(contribs, idx, axis=1)
+
+
+def _build_driver_table() -> DriverTable:
+    import xgboost as xgb
+
+    model: Any = get_model()
+    booster = model.get_booster() if hasattr(model, "get_booster") else model
+    if not isinstance(booster, xgb.Booster):
+        raise DriverError(
+            f"Per-feature contributions need an XGBoost model, got {type(model).__name__}"
+        )
+
+    fm = get_latest_feature_matrix()
+
+    # One matrix call for the whole fleet: (n_stores, n_features + 1),
+    # last column is the bias term.
+    contribs = booster.predict(xgb.DMatrix(fm.frame()), pred_contribs=True)
+    feature_part = contribs[:, :-1]
+    bias = contribs[:, -1].astype(np.float32)
+
+    idx, values = _top_k_by_magnitude(feature_part, DRIVERS_TOP_K)
+
+    return DriverTable(
+        feature_names=fm.feature_cols,
+        store_ids=fm.store_ids,
+        feature_idx=idx.astype(np.int16),
+        values=values.astype(np.float32),
+        bias=bias,
+    )
+
+
+def get_driver_table() -> DriverTable:
+    """
+    Return the contribution table for all stores, computed in one batch
+    the first time it is needed for the current artifact version.
+    """
+    try:
+        return get_derived("driver_table", _build_driver_table)
+    except DriverError:
+        raise
+    except Exception as exc:
+        raise DriverError("Failed to compute per-feature contributions") from exc
+
+
+def get_store_drivers(store_id: int, k: int = DRIVERS_TOP_K) -> List[Dict[str, Any]]:
+    """
+    Top-k features pushing this store's forecast up or down, e.g.
+    [{"feature": "Sale (Dollars)_Lag_12", "contribution": 1834.2}, ...].
+
+    Returns an empty list when the store is not in the latest features.
+    """
+    return get_driver_table().top_drivers(store_id, k)
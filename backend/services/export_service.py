@@ -0,0 +1,206 @@
+# backend/services/export_service.py
+from __future__ import annotations
+
+import csv
+import io
+from typing import Any, Dict, Iterator, List, Sequence
+
+import numpy as np
+
+from columnar import parquet_available
+from services.analytics_service import build_forecast_contexts, get_active_fleet_table
+from services.drivers_service import get_driver_table
+from services.llm_service import explain_forecast
+from store_lookup import get_store_name
+
+
+EXPORT_FORMATS = ("csv", "parquet")
+EXPORT_INCLUDES = ("stats", "explanation")
+
+# Stores processed per batch; bounds the rows held in memory while streaming.
+EXPORT_BATCH_SIZE = 256
+
+BASE_COLUMNS = ["store_id", "store_name", "prediction"]
+STATS_COLUMNS = [
+    "months_active",
+    "last_actual",
+    "avg_last_3",
+    "avg_last_6",
+    "avg_last_12",
+    "trend_direction",
+    "volatility",
+    "forecast_vs_6",
+    "yoy_growth_12v12",
+    "is_limited_history",
+]
+EXPLANATION_COLUMNS = ["explanation"]
+
+
+class ExportQueryError(Exception):
+    """Raised when an export request has invalid parameters."""
+    pass
+
+
+class ExportUnavailableError(Exception):
+    """Raised when the requested export format is not supported by this install."""
+    pass
+
+
+def parse_includes(raw: str) -> List[str]:
+    """Parse 'stats,explanation' into a validated list (order preserved)."""
+    includes = [p.strip().lower() for p in (raw or "").split(",") if p.strip()]
+    unknown = [p for p in includes if p not in EXPORT_INCLUDES]
+    if unknown:
+        raise ExportQueryError(
+            f"Invalid include {unknown}; expected any of {list(EXPORT_INCLUDES)}."
+        )
+    return list(dict.fromkeys(includes))
+
+
+def export_columns(includes: Sequence[str]) -> List[str]:
+    columns = list(BASE_COLUMNS)
+    if "stats" in includes:
+        columns += STATS_COLUMNS
+    if "explanation" in includes:
+        columns += EXPLANATION_COLUMNS
+    return columns
+
+
+def _export_batches(includes: Sequence[str],
+                    batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[Dict[str, List[Any]]]:
+    """
+    Yield column-oriented batches of export rows for every active store.
+
+    Forecasts come from the batch forecast table; contexts are built per
+    batch from the history index, and explanations are rendered per row
+    only when requested.
+    """
+    fleet = get_active_fleet_table()
+    store_ids = fleet.index.to_numpy(dtype=np.int64)
+    predictions = fleet["prediction"].to_numpy(dtype=float)
+
+    want_stats = "stats" in includes
+    want_explanation = "explanation" in includes
+
+    drivers = None
+    if want_explanation:
+        try:
+            drivers = get_driver_table()
+        except Exception:
+            drivers = None  # explanations without the drivers section
+
+    for lo in range(0, len(store_ids), batch_size):
+        ids = store_ids[lo:lo + batch_size]
+        preds = predictions[lo:lo + batch_size]
+
+        batch: Dict[str, List[Any]] = {
+            "store_id": [int(s) for s in ids],
+            "store_name": [get_store_name(int(s)) for s in ids],
+            "prediction": [float(p) for p in preds],
+        }
+
+        if want_stats or want_explanation:
+            contexts = build_forecast_contexts(ids, preds)
+            if want_stats:
+                for col in STATS_COLUMNS:
+                    batch[col] = [ctx["stats"][col] for ctx in contexts]
+            if want_explanation:
+                texts: List[str] = []
+                for ctx in contexts:
+                    ctx["drivers"] = drivers.top_drivers(ctx["store_id"]) if drivers else []
+                    texts.append(explain_forecast(ctx))
+                batch["explanation"] = texts
+
+        yield batch
+
+
+def stream_csv(includes: Sequence[str],
+               batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[str]:
+    """Yield the export as CSV text: the header first, then one chunk per batch."""
+    columns = export_columns(includes)
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+
+    writer.writerow(columns)
+    yield buf.getvalue()
+
+    for batch in _export_batches(includes, batch_size):
+        buf.seek(0)
+        buf.truncate()
+        writer.writerows(zip(*(batch[c] for c in columns)))
+        yield buf.getvalue()
+
+
+def _parquet_schema(columns: Sequence[str]):
+    import pyarrow as pa
+
+    types = {
+        "store_id": pa.int64(),
+        "store_name": pa.string(),
+        "months_active": pa.int64(),
+        "trend_direction": pa.string(),
+        "volatility": pa.string(),
+        "is_limited_history": pa.bool_(),
+        "explanation": pa.string(),
+    }
+    return pa.schema([(c, types.get(c, pa.float64())) for c in columns])
+
+
+class _DrainableSink(io.RawIOBase):
+    """
+    Write-only stream whose buffered bytes can be taken out between
+    writes. tell() keeps counting from the start of the stream, which the
+    Parquet writer needs for its footer offsets.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        chunk = bytes(data)
+        self._chunks.append(chunk)
+        self._position += len(chunk)
+        return len(chunk)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_parquet(includes: Sequence[str],
+                   batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[bytes]:
+    """
+    Yield the export as Parquet bytes, one row group per batch. The writer
+    targets an in-memory buffer that is drained after every batch.
+
+    :raises ExportUnavailableError: If pyarrow is not installed.
+    """
+    if not parquet_available():
+        raise ExportUnavailableError("Parquet export needs pyarrow, which is not installed.")
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    columns = export_columns(includes)
+    schema = _parquet_schema(columns)
+    sink = _DrainableSink()
+
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        for batch in _export_batches(includes, batch_size):
+            writer.write_table(pa.Table.from_pydict({c: batch[c] for c in columns}, schema=schema))
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    finally:
+        writer.close()
+    yield sink.drain()
@@ -0,0 +1,206 @@
+# backend/services/feature_derivation.py
+from __future__ import annotations
+
+from typing import Dict, Set
+
+import numpy as np
+import pandas as pd
+
+
+# Column naming used by the v3 feature pipeline.
+SALES = "Sale (Dollars)"
+LAG_COLS: Dict[int, str] = {k: f"{SALES}_Lag_{k}" for k in (1, 2, 3, 6, 12)}
+ROLL_WINDOWS = (3, 6, 12)
+MARKET_WINDOWS = (3, 12)
+
+CALENDAR_COLS = (
+    "Quarter", "is_nov", "is_dec", "is_oct", "is_july", "is_holiday_season",
+    "q4_flag", "month_sin", "month_cos", "day", "week", "dow",
+)
+
+
+def calendar_features(year: np.ndarray, month: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Calendar features for the first day of (year, month), matching the
+    v3 pipeline: month_sin/cos use (month - 1), week is the ISO week and
+    dow is Monday=0.
+    """
+    year = np.asarray(year, dtype=float)
+    month = np.asarray(month, dtype=float)
+    shape = np.broadcast(year, month).shape
+    y = np.broadcast_to(year, shape).reshape(-1).astype(int)
+    m = np.broadcast_to(month, shape).reshape(-1).astype(int)
+
+    dates = pd.to_datetime(pd.DataFrame({"year": y, "month": m, "day": 1}))
+    iso = dates.dt.isocalendar()
+    angle = 2 * np.pi * (m - 1) / 12
+
+    out = {
+        "Quarter": (m - 1) // 3 + 1,
+        "is_nov": (m == 11).astype(int),
+        "is_dec": (m == 12).astype(int),
+        "is_oct": (m == 10).astype(int),
+        "is_july": (m == 7).astype(int),
+        "is_holiday_season": (m >= 11).astype(int),
+        "q4_flag": (m >= 10).astype(int),
+        "month_sin": np.sin(angle),
+        "month_cos": np.cos(angle),
+        "day": np.ones(len(m), dtype=int),
+        "week": iso["week"].to_numpy(dtype=int),
+        "dow": dates.dt.dayofweek.to_numpy(dtype=int),
+    }
+    return {k: np.asarray(v, dtype=float).reshape(shape) for k, v in out.items()}
+
+
+def _market_features(X: np.ndarray, col: Dict[str, int]) -> Dict[str, np.ndarray]:
+    """Store-vs-market features as functions of the store's rolling sales."""
+    def c(name: str) -> np.ndarray:
+        return X[..., col[name]]
+
+    out: Dict[str, np.ndarray] = {}
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for w in MARKET_WINDOWS:
+            mean_col = f"{SALES}_RollMean_{w}"
+            total_col = f"total_roll{w}_mean"
+            if mean_col in col and total_col in col:
+                out[f"store_vs_market_roll{w}_ratio"] = c(mean_col) / c(total_col)
+                out[f"store_vs_market_roll{w}_diff"] = c(mean_col) - c(total_col)
+            if total_col in col and f"total_roll{w}_std" in col:
+                out[f"total_roll{w}_cv"] = c(f"total_roll{w}_std") / c(total_col)
+
+        # This month's sales are not a feature, but RollSum_3 = this month
+        # + Lag_1 + Lag_2, so the market share can be re-derived from it.
+        needed = (f"{SALES}_RollSum_3", LAG_COLS[1], LAG_COLS[2], "total_monthly_sales")
+        if all(n in col for n in needed):
+            current = c(needed[0]) - c(needed[1]) - c(needed[2])
+            out["store_market_share"] = current / c("total_monthly_sales")
+    return out
+
+
+def rederive_features(
+    X: np.ndarray,
+    base: np.ndarray,
+    col: Dict[str, int],
+    explicit: Set[str],
+) -> None:
+    """
+    Bring dependent features of `X` back in line after some were edited.
+
+    `X` (..., n_features) is an edited copy of `base` (broadcastable to X)
+    and `explicit` names the features the caller set directly; those are
+    never overwritten. Updated in place:
+
+    - calendar flags / sin / cos / week / dow when Year or Month changed;
+    - RollSum_w from changes to the Lag_k it contains (k <= w - 1), and
+      RollMean_w = RollSum_w / w (or RollSum from an explicit RollMean);
+    - store_vs_market_*, total_roll*_cv and store_market_share.
+
+    Rolling and market features are moved by the *change* in their inputs,
+    so rows whose inputs did not change keep their original values exactly.
+    """
+    # Calendar
+    if {"Year", "Month"} & explicit and "Year" in col and "Month" in col:
+        cal = calendar_features(X[..., col["Year"]], X[..., col["Month"]])
+        for name, values in cal.items():
+            if name in col and name not in explicit:
+                X[..., col[name]] = values
+
+    # Lags -> rolling sums / means
+    lag_deltas = {
+        k: X[..., col[name]] - base[..., col[name]]
+        for k, name in LAG_COLS.items()
+        if name in col
+    }
+    for w in ROLL_WINDOWS:
+        sum_col, mean_col = f"{SALES}_RollSum_{w}", f"{SALES}_RollMean_{w}"
+        if sum_col not in col or mean_col not in col:
+            continue
+        if sum_col in explicit:
+            pass
+        elif mean_col in explicit:
+            X[..., col[sum_col]] = X[..., col[mean_col]] * w
+        else:
+            # window = this month + Lag_1 .. Lag_(w-1)
+            delta = sum((d for k, d in lag_deltas.items() if k <= w - 1), np.zeros(()))
+            X[..., col[sum_col]] = base[..., col[sum_col]] + delta
+        if mean_col not in explicit:
+            X[..., col[mean_col]] = X[..., col[sum_col]] / w
+
+    # Store vs market
+    new = _market_features(X, col)
+    old = _market_features(np.broadcast_to(base, X.shape), col)
+    for name, values in new.items():
+        if name in col and name not in explicit:
+            delta = values - old[name]
+            X[..., col[name]] = np.where(
+                np.isfinite(delta), base[..., col[name]] + delta, base[..., col[name]]
+            )
+
+
+def advance_one_month(X: np.ndarray, col: Dict[str, int], sales: np.ndarray) -> np.ndarray:
+    """
+    Roll feature rows forward one month, treating `sales` (one value per
+    row, e.g. the model's forecast) as the new month's sales. Returns a
+    new matrix; `X` is not modified.
+
+    - Year / Month step to the next month and calendar features follow;
+    - Lag_1 becomes the row's own month (RollSum_3 - Lag_1 - Lag_2) and
+      Lag_2 / Lag_3 shift down. Lag_6 and Lag_12 need months the row does
+      not carry, so they keep the neighbouring month's value;
+    - RollSum_w adds `sales` and drops the month leaving the window (exact
+      for w = 3, the nearest carried lag otherwise); RollMean_w follows;
+    - store-vs-market features are re-derived with market totals held.
+
+    Store-level aggregates (store_mean_sales, months_active, ...) are held.
+    Used for multi-horizon forecasts, where step h + 1 is predicted from the
+    row advanced with step h's prediction.
+    """
+    base = X
+    X = np.array(X, dtype=float, copy=True)
+    sales = np.asarray(sales, dtype=float)
+    explicit: Set[str] = set()
+
+    def c(name: str) -> np.ndarray:
+        return base[..., col[name]]
+
+    if "Year" in col and "Month" in col:
+        month = c("Month") + 1
+        X[..., col["Year"]] = c("Year") + (month > 12)
+        X[..., col["Month"]] = np.where(month > 12, 1, month)
+        explicit |= {"Year", "Month"}
+
+    lag = {k: name for k, name in LAG_COLS.items() if name in col}
+    sum3 = f"{SALES}_RollSum_3"
+    current = (
+        c(sum3) - c(lag[1]) - c(lag[2])
+        if sum3 in col and 1 in lag and 2 in lag
+        else sales
+    )
+
+    # Sales of the month leaving each rolling window (this month - w + 1).
+    leaving = {
+        3: c(lag[2]) if 2 in lag else None,
+        6: c(lag[6]) if 6 in lag else None,
+        12: c(lag[12]) if 12 in lag else None,
+    }
+
+    if 3 in lag and 2 in lag:
+        X[..., col[lag[3]]] = c(lag[2])
+    if 2 in lag and 1 in lag:
+        X[..., col[lag[2]]] = c(lag[1])
+    if 1 in lag:
+        X[..., col[lag[1]]] = current
+    explicit |= set(lag.values())
+
+    for w in ROLL_WINDOWS:
+        sum_col = f"{SALES}_RollSum_{w}"
+        if sum_col not in col:
+            continue
+        out = leaving.get(w)
+        if out is None:
+            out = c(sum_col) / w
+        X[..., col[sum_col]] = c(sum_col) + sales - out
+        explicit.add(sum_col)
+
+    rederive_features(X, base, col, explicit)
+    return X
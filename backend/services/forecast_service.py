@@ -1,10 +1,14 @@
 # backend/services/forecast_service.py
 from __future__ import annotations
 
-from typing import Any
+from typing import Any, Dict, Optional
+
+import numpy as np
 
 from model_utils import (
     get_model,
+    get_latest_feature_matrix,
+    get_derived,
     build_feature_vector_for_store,
 )
 
@@ -14,12 +18,23 @@ class ForecastError(Exception):
     pass
 
 
+class StoreNotFoundError(ForecastError, KeyError):
+    """
+    Raised when a store has no row in the latest features table. Also a
+    KeyError, so callers that answer KeyError with 404 keep doing so.
+    """
+
+    def __str__(self) -> str:
+        return str(self.args[0]) if self.args else ""
+
+
 def forecast_for_store(store_id: int) -> float:
     """
     Build features for a single store and return a numeric prediction.
 
     :param store_id: Unique identifier for the store to forecast.
     :return: Predicted sales value as a float.
+    :raises StoreNotFoundError: If the store has no latest feature row.
     :raises ForecastError: If the model or features cannot be built,
                            or if the prediction fails/returns invalid data.
     """
@@ -33,6 +48,8 @@ def forecast_for_store(store_id: int) -> float:
     try:
         X = build_feature_vector_for_store(store_id)
     except Exception as exc:
+        if get_latest_feature_matrix().positions([store_id])[0] < 0:
+            raise StoreNotFoundError(f"Store {store_id} was not found.") from exc
         raise ForecastError(
             f"Failed to build feature vector for store_id={store_id}"
         ) from exc
@@ -65,3 +82,52 @@ def forecast_for_store(store_id: int) -> float:
         ) from exc
 
     return value
+
+
+class ForecastTable:
+    """
+    Next-period predictions for every store in the latest features table,
+    computed with a single batched model call.
+
+    `store_ids` is sorted; `predictions[i]` belongs to `store_ids[i]`.
+    """
+
+    def __init__(self, store_ids: np.ndarray, predictions: np.ndarray) -> None:
+        self.store_ids = store_ids
+        self.predictions = predictions
+        self._pos: Dict[int, int] = {int(sid): i for i, sid in enumerate(store_ids)}
+
+    def __len__(self) -> int:
+        return len(self.store_ids)
+
+    def get(self, store_id: int) -> Optional[float]:
+        pos = self._pos.get(int(store_id))
+        return None if pos is None else float(self.predictions[pos])
+
+    def positions(self, store_ids: np.ndarray) -> np.ndarray:
+        """Row positions for `store_ids`; -1 where a store has no forecast."""
+        store_ids = np.asarray(store_ids, dtype=np.int64)
+        if len(self.store_ids) == 0:
+            return np.full(len(store_ids), -1, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(self.store_ids, store_ids), len(self.store_ids) - 1)
+        return np.where(self.store_ids[pos] == store_ids, pos, -1)
+
+
+def _build_forecast_table() -> ForecastTable:
+    model: Any = get_model()
+    fm = get_latest_feature_matrix()
+    y_pred = np.asarray(model.predict(fm.frame()), dtype=float).reshape(-1)
+    return ForecastTable(fm.store_ids, y_pred)
+
+
+def get_forecast_table() -> ForecastTable:
+    """
+    Return batched predictions for all stores (built once per artifact version).
+
+    :raises ForecastError: If the model or the features table cannot be loaded
+                           or the batch prediction fails.
+    """
+    try:
+        return get_derived("forecast_table", _build_forecast_table)
+    except Exception as exc:
+        raise ForecastError("Failed to build batch forecasts for all stores") from exc
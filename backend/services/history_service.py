@@ -0,0 +1,226 @@
+# backend/services/history_service.py
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from model_utils import get_derived, get_history_df, get_model_config
+
+
+# Grain -> number of months per period. Periods are keyed by
+# "months since 1970-01" integer-divided by this, so quarter and year
+# boundaries line up with calendar quarters / years.
+GRAIN_MONTHS: Dict[str, int] = {
+    "month": 1,
+    "quarter": 3,
+    "year": 12,
+}
+
+
+class HistoryQueryError(Exception):
+    """Raised when a history query has invalid parameters."""
+    pass
+
+
+class StoreHistoryNotFoundError(Exception):
+    """Raised when the history index has no rows for a store."""
+    pass
+
+
+def parse_month(value: Optional[str]) -> Optional[int]:
+    """
+    Parse 'YYYY-MM' (or an ISO date like 'YYYY-MM-DD') into a month index
+    (months since 1970-01). Returns None for empty values.
+    """
+    if value is None or str(value).strip() == "":
+        return None
+    try:
+        return int(np.datetime64(str(value).strip()[:7], "M").astype(np.int64))
+    except ValueError as exc:
+        raise HistoryQueryError(
+            f"Invalid month {value!r}; expected YYYY-MM."
+        ) from exc
+
+
+def month_index_to_iso(month_index: int) -> str:
+    """Month index -> '2024-08-01T00:00:00' (same format as context history)."""
+    return f"{np.datetime64(int(month_index), 'M')}-01T00:00:00"
+
+
+def _period_label(key: int, grain: str) -> str:
+    if grain == "quarter":
+        return f"{1970 + key // 4}-Q{key % 4 + 1}"
+    if grain == "year":
+        return str(1970 + key)
+    return str(np.datetime64(int(key), "M"))
+
+
+class _GrainSeries:
+    """
+    One grain of the history index: flat arrays of (period key, sales,
+    months covered) for every store, with per-store [start, end) offsets.
+    """
+
+    def __init__(self, keys: np.ndarray, sales: np.ndarray,
+                 months: np.ndarray, offsets: np.ndarray) -> None:
+        self.keys = keys
+        self.sales = sales
+        self.months = months
+        self.offsets = offsets
+
+
+def _aggregate(stores: np.ndarray, keys: np.ndarray, values: np.ndarray,
+               store_ids: np.ndarray) -> _GrainSeries:
+    """
+    Sum `values` per (store, key). Input must be sorted by (store, key).
+    """
+    n = len(stores)
+    if n == 0:
+        empty = np.zeros(0)
+        return _GrainSeries(empty.astype(np.int64), empty, empty.astype(np.int32),
+                            np.zeros(len(store_ids) + 1, dtype=np.int64))
+
+    new_group = np.ones(n, dtype=bool)
+    new_group[1:] = (stores[1:] != stores[:-1]) | (keys[1:] != keys[:-1])
+    starts = np.flatnonzero(new_group)
+
+    sales = np.add.reduceat(values, starts)
+    months = np.diff(np.append(starts, n)).astype(np.int32)
+    group_stores = stores[starts]
+    group_keys = keys[starts]
+
+    # store_ids is sorted and group_stores is sorted by store, so the
+    # first/last group of each store can be found with searchsorted.
+    offsets = np.searchsorted(group_stores, store_ids, side="left")
+    offsets = np.append(offsets, len(group_stores)).astype(np.int64)
+
+    return _GrainSeries(group_keys.astype(np.int64), sales, months, offsets)
+
+
+class HistoryIndex:
+    """
+    Per-store history laid out as flat NumPy arrays, with monthly,
+    quarterly and yearly aggregates precomputed once.
+
+    A range query is a dict lookup for the store plus two searchsorted
+    calls on that store's slice; no pandas work happens per request.
+    """
+
+    def __init__(self, store_ids: np.ndarray, series: Dict[str, _GrainSeries]) -> None:
+        self.store_ids = store_ids
+        self.series = series
+        self._pos: Dict[int, int] = {int(sid): i for i, sid in enumerate(store_ids)}
+
+    @classmethod
+    def from_history_df(cls, df: pd.DataFrame, cfg: Dict[str, Any]) -> "HistoryIndex":
+        store_col = cfg["store_col"]
+        date_col = cfg["date_col"]
+        target_col = cfg["target_col"]
+
+        stores = df[store_col].to_numpy(dtype=np.int64)
+        month_keys = df[date_col].to_numpy(dtype="datetime64[M]").astype(np.int64)
+        values = np.nan_to_num(df[target_col].to_numpy(dtype=float))
+
+        order = np.lexsort((month_keys, stores))
+        stores = stores[order]
+        month_keys = month_keys[order]
+        values = values[order]
+
+        store_ids = np.unique(stores)
+
+        series: Dict[str, _GrainSeries] = {}
+        for grain, width in GRAIN_MONTHS.items():
+            # floor division keeps pre-1970 months in the right period
+            series[grain] = _aggregate(stores, month_keys // width, values, store_ids)
+
+        return cls(store_ids, series)
+
+    def has_store(self, store_id: int) -> bool:
+        return int(store_id) in self._pos
+
+    def store_slice(self, store_id: int, grain: str = "month") -> slice:
+        """Return the [start, end) slice of `store_id` in the grain arrays."""
+        pos = self._pos.get(int(store_id))
+        if pos is None:
+            raise StoreHistoryNotFoundError(f"No history found for store {store_id}.")
+        offsets = self.series[grain].offsets
+        return slice(int(offsets[pos]), int(offsets[pos + 1]))
+
+    def query(
+        self,
+        store_id: int,
+        grain: str = "month",
+        start_month: Optional[int] = None,
+        end_month: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Return the store's history at `grain` for periods overlapping the
+        inclusive month range [start_month, end_month].
+        """
+        if grain not in GRAIN_MONTHS:
+            raise HistoryQueryError(
+                f"Invalid grain {grain!r}; expected one of {list(GRAIN_MONTHS)}."
+            )
+
+        width = GRAIN_MONTHS[grain]
+        s = self.series[grain]
+        sl = self.store_slice(store_id, grain)
+        keys = s.keys[sl]
+
+        lo = 0 if start_month is None else int(np.searchsorted(keys, start_month // width, "left"))
+        hi = len(keys) if end_month is None else int(np.searchsorted(keys, end_month // width, "right"))
+
+        base = sl.start
+        return [
+            {
+                "date": month_index_to_iso(int(s.keys[i]) * width),
+                "period": _period_label(int(s.keys[i]), grain),
+                "sales": float(s.sales[i]),
+                "months": int(s.months[i]),
+            }
+            for i in range(base + lo, base + hi)
+        ]
+
+
+def get_history_index() -> HistoryIndex:
+    """Return the history index for the current artifacts (built once)."""
+    return get_derived(
+        "history_index",
+        lambda: HistoryIndex.from_history_df(get_history_df(), get_model_config()),
+    )
+
+
+def get_store_history(
+    store_id: int,
+    *,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    grain: str = "month",
+) -> Dict[str, Any]:
+    """
+    Range query over a store's full history.
+
+    :param start: First month to include ('YYYY-MM'), or None for the beginning.
+    :param end: Last month to include ('YYYY-MM'), or None for the latest month.
+    :param grain: 'month', 'quarter' or 'year'.
+    :raises HistoryQueryError: On an invalid grain or month.
+    :raises StoreHistoryNotFoundError: If the store has no history.
+    """
+    grain = (grain or "month").lower()
+    start_month = parse_month(start)
+    end_month = parse_month(end)
+
+    if start_month is not None and end_month is not None and start_month > end_month:
+        raise HistoryQueryError("'from' must not be after 'to'.")
+
+    history = get_history_index().query(store_id, grain, start_month, end_month)
+
+    return {
+        "store_id": store_id,
+        "grain": grain,
+        "from": None if start_month is None else str(np.datetime64(start_month, "M")),
+        "to": None if end_month is None else str(np.datetime64(end_month, "M")),
+        "history": history,
+    }
@@ -0,0 +1,196 @@
+# backend/services/interval_service.py
+from __future__ import annotations
+
+import contextvars
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from model_utils import current_bundle, get_derived, peek_derived
+from services.analytics_service import get_fleet_stats, volatility_labels
+from services.asof_service import get_all_months_index, get_fit_matrix
+
+
+# P10 / P50 / P90: an 80% band around the median outcome.
+INTERVAL_QUANTILES = (0.1, 0.5, 0.9)
+
+# Residuals are taken from the most recent months of the all-months table,
+# so the band tracks how the model does now rather than years ago.
+CALIBRATION_MONTHS = 24
+
+# Buckets with fewer residuals than this use the fleet-wide quantiles.
+MIN_BUCKET_ROWS = 200
+
+VOLATILITY_BUCKETS = ("low", "medium", "high")
+
+_warming_lock = threading.Lock()
+
+
+class IntervalError(Exception):
+    """Raised when prediction intervals cannot be calibrated from the artifacts."""
+    pass
+
+
+class IntervalTable:
+    """
+    Multiplicative residual quantiles per volatility bucket.
+
+    `factors[b]` holds the (P10, P50, P90) quantiles of actual / predicted
+    for bucket b (`buckets[b]`; the last entry, "", is the fleet-wide
+    pool used for stores without a volatility label). `store_bucket[i]` is
+    the bucket of `store_ids[i]` (sorted). A band is the prediction times
+    its store's factors, so serving one needs no model call.
+    """
+
+    def __init__(self, store_ids: np.ndarray, store_bucket: np.ndarray,
+                 buckets: Tuple[str, ...], factors: np.ndarray, rows: np.ndarray) -> None:
+        self.store_ids = store_ids
+        self.store_bucket = store_bucket
+        self.buckets = buckets
+        self.factors = factors
+        self.rows = rows
+        self._pooled = len(buckets) - 1
+
+    def bucket_of(self, store_ids: np.ndarray) -> np.ndarray:
+        store_ids = np.asarray(store_ids, dtype=np.int64)
+        if len(self.store_ids) == 0:
+            return np.full(len(store_ids), self._pooled)
+        pos = np.minimum(np.searchsorted(self.store_ids, store_ids), len(self.store_ids) - 1)
+        return np.where(self.store_ids[pos] == store_ids, self.store_bucket[pos], self._pooled)
+
+    def bands(self, store_ids: np.ndarray, predictions: np.ndarray) -> np.ndarray:
+        """(n, 3) P10 / P50 / P90 for each (store, prediction) pair."""
+        predictions = np.asarray(predictions, dtype=float)
+        out = predictions[:, None] * self.factors[self.bucket_of(store_ids)]
+        # A negative prediction flips the order of the multiplied quantiles.
+        return np.sort(out, axis=1)
+
+    def interval(self, store_id: int, prediction: float) -> Dict[str, Any]:
+        b = int(self.bucket_of(np.array([store_id]))[0])
+        p10, p50, p90 = self.bands(np.array([store_id]), np.array([prediction]))[0]
+        return {
+            "p10": float(p10),
+            "p50": float(p50),
+            "p90": float(p90),
+            "level": round(INTERVAL_QUANTILES[-1] - INTERVAL_QUANTILES[0], 2),
+            "volatility_bucket": self.buckets[b] or None,
+            "calibration_rows": int(self.rows[b]),
+        }
+
+
+def build_interval_table(calibration_months: int = CALIBRATION_MONTHS) -> IntervalTable:
+    """
+    Calibrate the bands from the model's own residuals on the all-months
+    table: actual / predicted over the last `calibration_months` months,
+    grouped by each store's current volatility label (same buckets as
+    stats.volatility). Uses the batch fit matrix, so it costs one
+    fleet-wide prediction per artifact version.
+
+    The table is the model's training data, so these are in-sample
+    residuals and the bands lean narrow for stores the model fits closely.
+    """
+    index = get_all_months_index()
+    fit = get_fit_matrix()
+    stats = get_fleet_stats()
+
+    if len(stats) == 0 or len(index.months) == 0:
+        raise IntervalError("No store history to calibrate intervals from.")
+
+    labels = volatility_labels(stats["volatility_ratio"].to_numpy())
+    buckets = VOLATILITY_BUCKETS + ("",)
+    code = {name: i for i, name in enumerate(buckets)}
+    store_ids = stats.index.to_numpy(dtype=np.int64)
+    store_bucket = np.array([code[label] for label in labels], dtype=np.int8)
+
+    # Bucket of every all-months row via its store.
+    row_store = np.repeat(index.store_ids, np.diff(index.offsets))
+    pos = np.minimum(np.searchsorted(store_ids, row_store), len(store_ids) - 1)
+    row_bucket = np.where(store_ids[pos] == row_store, store_bucket[pos], code[""])
+
+    recent = index.month >= index.months.max() - calibration_months + 1
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ratio = index.actual / fit
+    valid = recent & np.isfinite(ratio) & (fit > 0) & (index.actual >= 0)
+    if not valid.any():
+        raise IntervalError("No usable (actual, predicted) pairs to calibrate intervals from.")
+
+    q = np.asarray(INTERVAL_QUANTILES)
+    pooled = np.quantile(ratio[valid], q)
+    factors = np.tile(pooled, (len(buckets), 1))
+    rows = np.full(len(buckets), int(valid.sum()))
+    for b in range(len(VOLATILITY_BUCKETS)):
+        in_bucket = valid & (row_bucket == b)
+        n = int(in_bucket.sum())
+        if n >= MIN_BUCKET_ROWS:
+            factors[b] = np.quantile(ratio[in_bucket], q)
+            rows[b] = n
+
+    return IntervalTable(store_ids, store_bucket, buckets, factors, rows)
+
+
+def get_interval_table() -> IntervalTable:
+    """
+    Return the calibrated interval table (built once per artifact version).
+
+    :raises IntervalError: If the all-months table or fit matrix is unusable.
+    """
+    try:
+        return get_derived("interval_table", build_interval_table)
+    except IntervalError:
+        raise
+    except Exception as exc:
+        raise IntervalError("Failed to calibrate prediction intervals.") from exc
+
+
+def get_store_interval(store_id: int, prediction: float) -> Dict[str, Any]:
+    """
+    P10 / P50 / P90 band for a store's prediction, e.g.
+    {"p10": 4120.5, "p50": 5688.0, "p90": 7310.2, "level": 0.8,
+     "volatility_bucket": "medium", "calibration_rows": 21840}.
+    """
+    return get_interval_table().interval(store_id, prediction)
+
+
+def warm_interval_table() -> None:
+    """Build the interval table ahead of the requests that need it (errors are logged)."""
+    try:
+        get_interval_table()
+    except Exception:
+        import traceback
+
+        traceback.print_exc()
+
+
+def _warm_in_background(bundle) -> None:
+    try:
+        warm_interval_table()
+    finally:
+        # Success leaves the table in the derived cache; after a failure the
+        # next miss starts another attempt.
+        with _warming_lock:
+            bundle.warming.discard("interval_table")
+
+
+def peek_store_interval(store_id: int, prediction: float) -> Optional[Dict[str, Any]]:
+    """
+    get_store_interval() when the table is already built, else None. The
+    first miss for a dataset bundle starts the calibration (a fleet-wide
+    prediction) on a background thread, so no request waits on it; a miss
+    after a failed calibration starts it again.
+    """
+    table = peek_derived("interval_table")
+    if table is not None:
+        return table.interval(store_id, prediction)
+
+    bundle = current_bundle()
+    with _warming_lock:
+        if "interval_table" in bundle.warming:
+            return None
+        bundle.warming.add("interval_table")
+    # Run in a copy of this context so the table is built for the same dataset.
+    ctx = contextvars.copy_context()
+    threading.Thread(
+        target=ctx.run, args=(_warm_in_background, bundle), name="warm-intervals", daemon=True
+    ).start()
+    return None
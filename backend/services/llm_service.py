@@ -1,6 +1,7 @@
 # backend/services/llm_service.py
 from __future__ import annotations
 
+import math
 from typing import Dict, Any, List, Optional
 
 
@@ -9,6 +10,39 @@ class ExplanationError(Exception):
     pass
 
 
+def _describe_feature(name: str) -> str:
+    """
+    Turn a model feature name into something a store manager can read,
+    e.g. 'Sale (Dollars)_Lag_12' -> 'sales 12 months ago'.
+    """
+    prefix = "Sale (Dollars)_"
+    if name.startswith(prefix):
+        kind, _, n = name[len(prefix):].partition("_")
+        if kind == "Lag":
+            return f"sales {n} month(s) ago"
+        if kind == "RollMean":
+            return f"average sales over the last {n} months"
+        if kind == "RollSum":
+            return f"total sales over the last {n} months"
+
+    special = {
+        "is_holiday_season": "holiday season timing",
+        "is_dec": "December timing",
+        "is_nov": "November timing",
+        "is_oct": "October timing",
+        "is_july": "July timing",
+        "q4_flag": "fourth-quarter timing",
+        "store_mean_sales": "the store's long-run average sales",
+        "store_market_share": "the store's share of statewide sales",
+        "total_monthly_sales": "statewide monthly sales",
+        "store_vs_market_roll3_ratio": "the store's last 3 months relative to the market",
+        "store_vs_market_roll12_ratio": "the store's last 12 months relative to the market",
+        "months_active": "how long the store has been active",
+        "coef_var": "how variable the store's sales are",
+    }
+    return special.get(name, name.replace("_", " "))
+
+
 def explain_forecast(context: Dict[str, Any]) -> str:
     """
     Create a clear, manager-friendly explanation using numeric context.
@@ -23,6 +57,9 @@ def explain_forecast(context: Dict[str, Any]) -> str:
         - "prediction": float
         - "stats": dict with numeric summary fields
         - "history": list of {"date": str, "sales": float}
+        - "drivers": optional list of {"feature": str, "contribution": float}
+        - "peer_blend": optional cold-start blend for limited-history stores
+        - "anomalies": optional flagged months {"date", "type", "score"}
     :return: Multi-line explanation string.
     :raises ExplanationError: If required fields are missing or invalid.
     """
@@ -188,6 +225,24 @@ def explain_forecast(context: Dict[str, Any]) -> str:
     if numeric_prediction is not None:
         lines.append(f"- Forecast for next period: {fmt(numeric_prediction)}")
 
+    # Calibrated P10 / P90 band (model residuals for stores this volatile)
+    interval: Any = context.get("interval")
+    if (
+        numeric_prediction is not None
+        and not neg_forecast
+        and isinstance(interval, dict)
+        and interval.get("p10") is not None
+        and interval.get("p90") is not None
+    ):
+        try:
+            level = float(interval.get("level") or 0.8)
+        except (TypeError, ValueError):
+            level = 0.8
+        lines.append(
+            f"- Likely range ({level:.0%} of outcomes): "
+            f"{fmt(max(float(interval['p10']), 0.0))} to {fmt(interval['p90'])}"
+        )
+
     # If we have history, show the last few months explicitly
     if history:
         lines.append("")
@@ -198,6 +253,76 @@ def explain_forecast(context: Dict[str, Any]) -> str:
             s = fmt(row.get("sales"))
             lines.append(f"- {d}: {s}")
 
+    # Top model drivers (precomputed per-feature contributions)
+    drivers_raw: Any = context.get("drivers") or []
+    drivers: List[Dict[str, Any]] = (
+        [d for d in drivers_raw if isinstance(d, dict) and d.get("feature")]
+        if isinstance(drivers_raw, list)
+        else []
+    )
+    if drivers:
+        lines.append("")
+        lines.append("What is driving this forecast:")
+        for d in drivers[:3]:
+            try:
+                contribution = float(d.get("contribution"))
+            except (TypeError, ValueError):
+                continue
+            direction = "up" if contribution >= 0 else "down"
+            label = _describe_feature(str(d["feature"]))
+            lines.append(
+                f"- {label[:1].upper() + label[1:]} "
+                f"pushes the forecast {direction} by about {fmt(abs(contribution))}."
+            )
+
+    # Cold-start peer blend (limited-history stores only)
+    blend: Any = context.get("peer_blend")
+    if isinstance(blend, dict) and blend.get("prediction") is not None:
+        n_peers = len(blend.get("peers") or [])
+        lines.append("")
+        lines.append("Comparable stores:")
+        lines.append(
+            f"- Because this store has little history, {n_peers} similar established "
+            f"store(s) suggest about {fmt(blend.get('peer_estimate'))} for next period."
+        )
+        lines.append(
+            f"- Blending that with the model gives {fmt(blend.get('prediction'))}; "
+            "treat this as a sanity check while the store builds history."
+        )
+
+    # Flagged months inside the history window (precomputed anomaly table)
+    anomalies_raw: Any = context.get("anomalies") or []
+    anomalies: List[Dict[str, Any]] = (
+        [a for a in anomalies_raw if isinstance(a, dict) and a.get("type")]
+        if isinstance(anomalies_raw, list)
+        else []
+    )
+    if anomalies:
+        lines.append("")
+        lines.append("Unusual months:")
+        for a in anomalies[-3:]:
+            d = fmt_date(a.get("date"))
+            kind = a.get("type")
+            try:
+                score = float(a.get("score"))
+            except (TypeError, ValueError):
+                continue
+            if kind == "spike":
+                lines.append(f"- {d}: sales were unusually high for this store (robust z {score:+.1f}).")
+            elif kind == "drop":
+                lines.append(f"- {d}: sales were unusually low for this store (robust z {score:+.1f}).")
+            elif kind == "missing":
+                lines.append(f"- {d}: no sales were recorded for this month.")
+            elif kind == "level_shift":
+                direction = "up" if score >= 0 else "down"
+                lines.append(
+                    f"- {d}: sales shifted {direction} to a new level "
+                    f"(about {abs(math.expm1(score)):.0%} vs the prior six months)."
+                )
+        lines.append(
+            "- Months like these can pull averages around; weigh them with what you know locally."
+        )
+
     # =========================
     # 3) SUGGESTED ACTIONS
     # =========================
@@ -256,3 +381,4 @@ def explain_forecast(context: Dict[str, Any]) -> str:
     )
 
     return "\n".join(lines)
+
@@ -0,0 +1,113 @@
+# backend/services/ranking_service.py
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from model_utils import get_artifact_version, get_derived
+from services.analytics_service import get_active_fleet_table
+from services.store_service import _build_store_label
+from store_lookup import get_store_name
+
+
+# Metrics that can be ranked. All are ratios (0.12 == +12%).
+RANKING_METRICS = (
+    "forecast_vs_6",
+    "yoy_growth_12v12",
+    "volatility_ratio",
+    "trend_pct",
+)
+
+RANKING_ORDERS = ("desc", "asc")
+
+MAX_RANKING_N = 1000
+
+
+class RankingQueryError(Exception):
+    """Raised when a ranking request has invalid parameters."""
+    pass
+
+
+def _ranked_positions(metric: str, order: str) -> np.ndarray:
+    """
+    Positions in the active fleet table of every store with a `metric`
+    value, highest first for "desc" and lowest first for "asc" (stable, so
+    ties keep table order either way).
+    """
+    values = get_active_fleet_table()[metric].to_numpy(dtype=float)
+    candidates = np.flatnonzero(~np.isnan(values))
+    keys = -values[candidates] if order == "desc" else values[candidates]
+    return candidates[np.argsort(keys, kind="stable")]
+
+
+def _optional(value: Any) -> Optional[float]:
+    value = float(value)
+    return None if np.isnan(value) else value
+
+
+_ROW_COLUMNS = (
+    "prediction",
+    "last_actual",
+    "avg_last_6",
+    "forecast_vs_6",
+    "yoy_growth_12v12",
+    "volatility_ratio",
+    "trend_pct",
+)
+
+
+def _rank(metric: str, order: str, n: int) -> List[Dict[str, Any]]:
+    df = get_active_fleet_table()
+    # One sorted order per metric and direction; each request only slices it.
+    ranked = get_derived(
+        f"ranking_order:{metric}:{order}", lambda: _ranked_positions(metric, order)
+    )
+    top = ranked[:n]
+
+    store_ids = df.index.to_numpy()[top]
+    columns = {c: df[c].to_numpy(dtype=float)[top] for c in set(_ROW_COLUMNS) | {metric}}
+
+    rows: List[Dict[str, Any]] = []
+    for k, store_id in enumerate(store_ids):
+        store_id = int(store_id)
+        row: Dict[str, Any] = {
+            "rank": k + 1,
+            "store_id": store_id,
+            "label": _build_store_label(store_id, get_store_name(store_id)),
+            "value": _optional(columns[metric][k]),
+        }
+        row.update((c, _optional(columns[c][k])) for c in _ROW_COLUMNS)
+        rows.append(row)
+    return rows
+
+
+def get_rankings(metric: str, order: str = "desc", n: int = 25) -> Dict[str, Any]:
+    """
+    Return the top `n` active stores by `metric`.
+
+    The sorted order is cached per (artifact version, metric, order); rows are
+    built for the requested slice only.
+
+    :raises RankingQueryError: On an unknown metric / order or a bad n.
+    """
+    if metric not in RANKING_METRICS:
+        raise RankingQueryError(
+            f"Invalid metric {metric!r}; expected one of {list(RANKING_METRICS)}."
+        )
+    if order not in RANKING_ORDERS:
+        raise RankingQueryError(
+            f"Invalid order {order!r}; expected one of {list(RANKING_ORDERS)}."
+        )
+    if n < 1 or n > MAX_RANKING_N:
+        raise RankingQueryError(f"n must be between 1 and {MAX_RANKING_N}.")
+
+    stores = _rank(metric, order, n)
+
+    return {
+        "metric": metric,
+        "order": order,
+        "n": n,
+        "model_version": get_artifact_version(),
+        "stores": stores,
+    }
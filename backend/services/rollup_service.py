@@ -0,0 +1,268 @@
+# backend/services/rollup_service.py
+from __future__ import annotations
+
+import json
+import os
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from config import STORE_GROUPS_PATH
+from model_utils import get_artifact_version, get_derived
+from services.analytics_service import get_active_fleet_table
+from services.history_service import get_history_index, month_index_to_iso
+from store_lookup import get_store_attribute_map
+
+
+ROLLUP_LEVELS = ("all", "city", "county", "group")
+
+ROLLUP_HISTORY_MONTHS = 12
+
+UNASSIGNED_GROUP = "(unassigned)"
+
+MAX_CUSTOM_GROUPS = 500
+MAX_CUSTOM_MEMBERS = 200_000
+
+
+class RollupQueryError(Exception):
+    """Raised when a rollup request has invalid parameters or groups."""
+    pass
+
+
+class _RollupBase:
+    """
+    Per-store inputs shared by every rollup level: the active stores'
+    forecasts, recent actuals and a calendar-aligned (stores, months)
+    history matrix for the last ROLLUP_HISTORY_MONTHS months.
+    """
+
+    def __init__(self, store_ids: np.ndarray, values: Dict[str, np.ndarray],
+                 month_keys: np.ndarray, history: np.ndarray) -> None:
+        self.store_ids = store_ids
+        self.values = values
+        self.month_keys = month_keys
+        self.history = history
+
+    def positions(self, store_ids: np.ndarray) -> np.ndarray:
+        """Row positions for `store_ids`; -1 where a store is not active."""
+        store_ids = np.asarray(store_ids, dtype=np.int64)
+        if len(self.store_ids) == 0:
+            return np.full(len(store_ids), -1, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(self.store_ids, store_ids), len(self.store_ids) - 1)
+        return np.where(self.store_ids[pos] == store_ids, pos, -1)
+
+
+def _build_rollup_base() -> _RollupBase:
+    fleet = get_active_fleet_table()
+    store_ids = fleet.index.to_numpy(dtype=np.int64)
+
+    values = {
+        "forecast": fleet["prediction"].to_numpy(dtype=float),
+        "last_actual": np.nan_to_num(fleet["last_actual"].to_numpy(dtype=float)),
+        "avg_last_6": np.nan_to_num(fleet["avg_last_6"].to_numpy(dtype=float)),
+    }
+
+    # Scatter each active store's monthly rows into a calendar-aligned matrix
+    # so group history sums line up month by month (gaps count as 0).
+    index = get_history_index()
+    monthly = index.series["month"]
+    n_months = ROLLUP_HISTORY_MONTHS
+    last_key = int(fleet["last_month"].max()) if len(fleet) else 0
+    month_keys = last_key - n_months + 1 + np.arange(n_months)
+
+    row_store = np.repeat(np.arange(len(index.store_ids)), np.diff(monthly.offsets))
+    in_window = monthly.keys >= month_keys[0]
+    full = np.zeros((len(index.store_ids), n_months))
+    full[row_store[in_window], monthly.keys[in_window] - month_keys[0]] = monthly.sales[in_window]
+
+    history_pos = np.searchsorted(index.store_ids, store_ids)
+    return _RollupBase(store_ids, values, month_keys, full[history_pos])
+
+
+def get_rollup_base() -> _RollupBase:
+    """Rollup inputs for the current artifacts (built once per version)."""
+    return get_derived("rollup_base", _build_rollup_base)
+
+
+def _sum_by_group(group_idx: np.ndarray, rows: np.ndarray, values: np.ndarray,
+                  n_groups: int) -> np.ndarray:
+    """
+    Sum `values[rows]` into `n_groups` buckets by `group_idx` (one entry per
+    membership). `values` may be 1-D (per store) or 2-D (store x month).
+    """
+    if values.ndim == 1:
+        return np.bincount(group_idx, weights=values[rows], minlength=n_groups)
+
+    width = values.shape[1]
+    flat = (group_idx[:, None] * width + np.arange(width)[None, :]).ravel()
+    sums = np.bincount(flat, weights=values[rows].ravel(), minlength=n_groups * width)
+    return sums.reshape(n_groups, width)
+
+
+def _rollup(base: _RollupBase, names: List[str], group_idx: np.ndarray,
+            rows: np.ndarray) -> List[Dict[str, Any]]:
+    """
+    Aggregate the store rows listed in (group_idx, rows) into one row per
+    group name. A store may appear in several groups.
+    """
+    n = len(names)
+    counts = np.bincount(group_idx, minlength=n)
+    sums = {key: _sum_by_group(group_idx, rows, v, n) for key, v in base.values.items()}
+    history = _sum_by_group(group_idx, rows, base.history, n)
+
+    total_forecast = float(base.values["forecast"].sum())
+
+    groups: List[Dict[str, Any]] = []
+    for g, name in enumerate(names):
+        forecast = float(sums["forecast"][g])
+        avg_6 = float(sums["avg_last_6"][g])
+        groups.append(
+            {
+                "group": name,
+                "n_stores": int(counts[g]),
+                "forecast": forecast,
+                "last_actual": float(sums["last_actual"][g]),
+                "avg_last_6": avg_6,
+                "forecast_vs_6": (forecast - avg_6) / avg_6 if avg_6 > 0 else None,
+                "share_of_total": forecast / total_forecast if total_forecast > 0 else None,
+                "history": [float(v) for v in history[g]],
+            }
+        )
+    return groups
+
+
+def _partition(base: _RollupBase, labels: np.ndarray) -> List[Dict[str, Any]]:
+    """Rollup where every active store belongs to exactly one group."""
+    names, group_idx = np.unique(labels, return_inverse=True)
+    groups = _rollup(base, [str(n) for n in names], group_idx, np.arange(len(labels)))
+    groups.sort(key=lambda g: g["forecast"], reverse=True)
+    return groups
+
+
+def _attribute_labels(base: _RollupBase, attribute: str) -> np.ndarray:
+    mapping = get_store_attribute_map(attribute)
+    return np.array(
+        [mapping.get(int(s), UNASSIGNED_GROUP) for s in base.store_ids], dtype=object
+    )
+
+
+def _parse_groups(raw: Any, base: _RollupBase) -> Tuple[List[str], np.ndarray, np.ndarray, List[int]]:
+    """
+    Validate {"name": [store_id, ...], ...} and return (names, group_idx,
+    rows, unknown_store_ids) with one (group_idx, row) pair per member.
+    """
+    if not isinstance(raw, dict) or not raw:
+        raise RollupQueryError("'groups' must be a non-empty object of {name: [store_id, ...]}.")
+    if len(raw) > MAX_CUSTOM_GROUPS:
+        raise RollupQueryError(f"At most {MAX_CUSTOM_GROUPS} groups per request.")
+
+    names: List[str] = []
+    idx_parts: List[np.ndarray] = []
+    row_parts: List[np.ndarray] = []
+    unknown: List[int] = []
+    n_members = 0
+    for g, (name, members) in enumerate(raw.items()):
+        if not isinstance(members, list):
+            raise RollupQueryError(f"Group {name!r} must be a list of store ids.")
+        n_members += len(members)
+        if n_members > MAX_CUSTOM_MEMBERS:
+            raise RollupQueryError(f"At most {MAX_CUSTOM_MEMBERS} group members in total.")
+        try:
+            ids = np.unique(np.asarray(members, dtype=np.int64))
+        except (TypeError, ValueError) as exc:
+            raise RollupQueryError(f"Group {name!r} contains a non-integer store id.") from exc
+
+        pos = base.positions(ids)
+        unknown.extend(int(s) for s in ids[pos < 0])
+        pos = pos[pos >= 0]
+        names.append(str(name))
+        idx_parts.append(np.full(len(pos), g, dtype=np.int64))
+        row_parts.append(pos)
+
+    group_idx = np.concatenate(idx_parts) if idx_parts else np.zeros(0, dtype=np.int64)
+    rows = np.concatenate(row_parts) if row_parts else np.zeros(0, dtype=np.int64)
+    return names, group_idx, rows, sorted(set(unknown))
+
+
+def _load_configured_groups() -> Dict[str, Any]:
+    if not STORE_GROUPS_PATH:
+        raise RollupQueryError("No custom store groups configured (set STORE_GROUPS_PATH).")
+    if not os.path.exists(STORE_GROUPS_PATH):
+        raise FileNotFoundError(f"Store groups file not found at {STORE_GROUPS_PATH}")
+    with open(STORE_GROUPS_PATH, "r") as f:
+        return json.load(f)
+
+
+def _custom_rollup(base: _RollupBase, raw_groups: Any) -> Dict[str, Any]:
+    names, group_idx, rows, unknown = _parse_groups(raw_groups, base)
+    covered = np.unique(rows)
+    return {
+        "groups": _rollup(base, names, group_idx, rows),
+        "missing_store_ids": unknown,
+        # Custom groups may overlap or leave stores out, so they are not
+        # expected to sum to the statewide total.
+        "coverage": {
+            "stores_covered": int(len(covered)),
+            "forecast_covered": float(base.values["forecast"][covered].sum()),
+        },
+    }
+
+
+def _level_rollup(level: str) -> Dict[str, Any]:
+    base = get_rollup_base()
+    if level == "all":
+        return {"groups": _partition(base, np.full(len(base.store_ids), "all", dtype=object))}
+    if level in ("city", "county"):
+        return {"groups": _partition(base, _attribute_labels(base, level))}
+    return _custom_rollup(base, _load_configured_groups())
+
+
+def _envelope(level: str, body: Dict[str, Any]) -> Dict[str, Any]:
+    """Add the statewide total, month labels and a reconciliation check."""
+    base = get_rollup_base()
+    total = {key: float(v.sum()) for key, v in base.values.items()}
+    groups_forecast = float(sum(g["forecast"] for g in body["groups"]))
+
+    payload: Dict[str, Any] = {
+        "level": level,
+        "model_version": get_artifact_version(),
+        "n_stores": int(len(base.store_ids)),
+        "history_months": [month_index_to_iso(int(k)) for k in base.month_keys],
+        "total": {**total, "history": [float(v) for v in base.history.sum(axis=0)]},
+    }
+    payload.update(body)
+    if level != "group":
+        payload["reconciliation"] = {
+            "groups_forecast_sum": groups_forecast,
+            "total_forecast": total["forecast"],
+            "difference": groups_forecast - total["forecast"],
+        }
+    return payload
+
+
+def get_rollup(level: str = "all") -> Dict[str, Any]:
+    """
+    Aggregate active-store forecasts and recent history to a hierarchy level.
+
+    Levels: "all" (statewide), "city" / "county" (from the store lookup;
+    stores without the attribute roll into "(unassigned)"), or "group"
+    (custom groups from STORE_GROUPS_PATH). Totals are vectorized sums over
+    the batch forecast table, cached per artifact version.
+
+    :raises RollupQueryError: On an unknown level or invalid group file.
+    """
+    if level not in ROLLUP_LEVELS:
+        raise RollupQueryError(
+            f"Invalid level {level!r}; expected one of {list(ROLLUP_LEVELS)}."
+        )
+    return get_derived(f"rollup:{level}", lambda: _envelope(level, _level_rollup(level)))
+
+
+def get_custom_rollup(groups: Any) -> Dict[str, Any]:
+    """
+    Roll up caller-supplied groups {"name": [store_id, ...]} (not cached).
+
+    :raises RollupQueryError: On malformed groups.
+    """
+    base = get_rollup_base()
+    return _envelope("group", _custom_rollup(base, groups))
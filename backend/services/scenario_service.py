@@ -0,0 +1,170 @@
+# backend/services/scenario_service.py
+from __future__ import annotations
+
+import math
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from model_utils import get_artifact_version, get_latest_feature_matrix, get_model
+from services.feature_derivation import rederive_features
+
+
+MAX_SCENARIOS = 50
+MAX_SCENARIO_ROWS = 250_000  # stores x (scenarios + baseline) scored in one call
+
+
+class ScenarioError(Exception):
+    """Raised when a scenario request is invalid."""
+    pass
+
+
+class ScenarioComputationError(Exception):
+    """Raised when scenario features cannot be built or scored."""
+    pass
+
+
+def _parse_number(value: Any, where: str) -> float:
+    try:
+        number = float(value)
+    except (TypeError, ValueError) as exc:
+        raise ScenarioError(f"{where} must be a number, got {value!r}.") from exc
+    if not math.isfinite(number):
+        raise ScenarioError(f"{where} must be finite.")
+    return number
+
+
+def _parse_scenarios(
+    raw: Any, col: Dict[str, int]
+) -> List[Tuple[str, Dict[str, float], Dict[str, float]]]:
+    """Validate [{"name", "overrides": {...}, "multipliers": {...}}, ...]."""
+    if not isinstance(raw, list) or not raw:
+        raise ScenarioError("'scenarios' must be a non-empty list.")
+    if len(raw) > MAX_SCENARIOS:
+        raise ScenarioError(f"At most {MAX_SCENARIOS} scenarios per request.")
+
+    parsed = []
+    seen: Set[str] = set()
+    for i, sc in enumerate(raw):
+        if not isinstance(sc, dict):
+            raise ScenarioError(f"Scenario #{i} must be an object.")
+
+        name = str(sc.get("name") or f"scenario_{i + 1}")
+        if name in seen or name == "baseline":
+            raise ScenarioError(f"Duplicate or reserved scenario name {name!r}.")
+        seen.add(name)
+
+        parts: List[Dict[str, float]] = []
+        for key in ("overrides", "multipliers"):
+            values = sc.get(key) or {}
+            if not isinstance(values, dict):
+                raise ScenarioError(f"Scenario {name!r}: '{key}' must be an object.")
+            unknown = [f for f in values if f not in col]
+            if unknown:
+                raise ScenarioError(
+                    f"Scenario {name!r}: unknown feature(s) {unknown}; "
+                    "keys must be model feature_cols names."
+                )
+            parts.append(
+                {f: _parse_number(v, f"Scenario {name!r} {key}[{f!r}]") for f, v in values.items()}
+            )
+
+        if not parts[0] and not parts[1]:
+            raise ScenarioError(f"Scenario {name!r} has no overrides or multipliers.")
+        parsed.append((name, parts[0], parts[1]))
+    return parsed
+
+
+def run_scenarios(
+    scenarios: Any,
+    store_ids: Optional[List[int]] = None,
+) -> Dict[str, Any]:
+    """
+    Score what-if scenarios for a set of stores in one model call.
+
+    Each scenario sets (`overrides`) and/or scales (`multipliers`) model
+    features for every selected store, starting from the latest features.
+    Dependent features (rolling sums/means, calendar flags, store-vs-market
+    ratios) are re-derived so the edited rows stay internally consistent.
+
+    :param scenarios: [{"name": "dec_lift", "overrides": {"Month": 12},
+                        "multipliers": {"Sale (Dollars)_Lag_12": 1.1}}, ...]
+    :param store_ids: Stores to score; None means every store with features.
+    :raises ScenarioError: On invalid input (unknown features, bad numbers).
+    :raises ScenarioComputationError: If features cannot be loaded or scored.
+    """
+    try:
+        fm = get_latest_feature_matrix()
+        model: Any = get_model()
+    except Exception as exc:
+        raise ScenarioComputationError("Failed to load model or latest features.") from exc
+
+    parsed = _parse_scenarios(scenarios, fm.col)
+
+    if store_ids is None:
+        pos = np.arange(len(fm.store_ids))
+        missing: List[int] = []
+    else:
+        requested = np.asarray(store_ids, dtype=np.int64)
+        all_pos = fm.positions(requested)
+        missing = [int(s) for s in requested[all_pos < 0]]
+        pos = all_pos[all_pos >= 0]
+
+    n_stores, n_features = len(pos), len(fm.feature_cols)
+    if n_stores == 0:
+        raise ScenarioError("None of the requested stores have latest features.")
+    if n_stores * (len(parsed) + 1) > MAX_SCENARIO_ROWS:
+        raise ScenarioError(
+            f"Too many store x scenario combinations (max {MAX_SCENARIO_ROWS})."
+        )
+
+    # (scenarios + baseline, stores, features); slice 0 is the baseline.
+    base = fm.X[pos]
+    tensor = np.repeat(base[None, :, :], len(parsed) + 1, axis=0)
+
+    for s, (_, overrides, multipliers) in enumerate(parsed, start=1):
+        for feature, value in overrides.items():
+            tensor[s, :, fm.col[feature]] = value
+        for feature, factor in multipliers.items():
+            tensor[s, :, fm.col[feature]] *= factor
+        rederive_features(tensor[s], base, fm.col, set(overrides) | set(multipliers))
+
+    try:
+        flat = fm.frame(tensor.reshape(-1, n_features))
+        preds = np.asarray(model.predict(flat), dtype=float).reshape(len(parsed) + 1, n_stores)
+    except Exception as exc:
+        raise ScenarioComputationError("Model prediction failed for scenarios.") from exc
+
+    baseline = preds[0]
+    names = [name for name, _, _ in parsed]
+
+    stores: List[Dict[str, Any]] = []
+    for i, p in enumerate(pos):
+        b = float(baseline[i])
+        per_scenario: Dict[str, Any] = {}
+        for s, name in enumerate(names, start=1):
+            v = float(preds[s, i])
+            per_scenario[name] = {
+                "prediction": v,
+                "delta": v - b,
+                "delta_pct": (v - b) / b if b > 0 else None,
+            }
+        stores.append(
+            {
+                "store_id": int(fm.store_ids[p]),
+                "baseline": b,
+                "scenarios": per_scenario,
+            }
+        )
+
+    totals: Dict[str, float] = {"baseline": float(baseline.sum())}
+    for s, name in enumerate(names, start=1):
+        totals[name] = float(preds[s].sum())
+
+    return {
+        "model_version": get_artifact_version(),
+        "scenarios": names,
+        "totals": totals,
+        "stores": stores,
+        "missing_store_ids": missing,
+    }
@@ -0,0 +1,254 @@
+# backend/services/similarity_service.py
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from model_utils import get_artifact_version, get_derived, get_latest_feature_matrix
+from services.analytics_service import get_fleet_stats
+from services.forecast_service import get_forecast_table
+from services.store_service import _build_store_label
+from store_lookup import get_store_name
+
+
+SALES = "Sale (Dollars)"
+
+# Neighbours precomputed per store; requests may ask for up to this many.
+MAX_SIMILAR_K = 50
+
+# Established peers used for the cold-start blend of limited-history stores.
+PEER_BLEND_K = 10
+LIMITED_HISTORY_MONTHS = 6
+
+
+class SimilarityError(Exception):
+    """Raised when the similarity index cannot be built."""
+    pass
+
+
+class SimilarityQueryError(Exception):
+    """Raised when a similar-stores request has invalid parameters."""
+    pass
+
+
+class SimilarStoreNotFoundError(Exception):
+    """Raised when a store has no profile in the latest features."""
+    pass
+
+
+def _profile_matrix(X: np.ndarray, col: Dict[str, int]) -> Tuple[np.ndarray, List[str]]:
+    """
+    Store profile used for similarity: level (log mean sales, log market
+    share), variability (coef_var) and shape (lags and the 3-month mean
+    relative to the 12-month mean). Columns the feature table lacks are
+    skipped. Returns the raw (unstandardized) matrix and its column names.
+    """
+    parts: List[np.ndarray] = []
+    names: List[str] = []
+
+    def add(name: str, values: np.ndarray) -> None:
+        parts.append(values)
+        names.append(name)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        if "store_mean_sales" in col:
+            add("log_store_mean_sales", np.log1p(np.clip(X[:, col["store_mean_sales"]], 0, None)))
+        if "store_market_share" in col:
+            add("log_store_market_share", np.log(np.clip(X[:, col["store_market_share"]], 1e-12, None)))
+        if "coef_var" in col:
+            add("coef_var", X[:, col["coef_var"]])
+
+        base = f"{SALES}_RollMean_12"
+        if base in col:
+            mean_12 = X[:, col[base]]
+            for name in (f"{SALES}_Lag_1", f"{SALES}_Lag_3", f"{SALES}_Lag_6",
+                         f"{SALES}_Lag_12", f"{SALES}_RollMean_3"):
+                if name in col:
+                    add(f"{name}/RollMean_12", X[:, col[name]] / mean_12)
+
+    if not parts:
+        raise SimilarityError("Latest features carry none of the store profile columns.")
+    return np.column_stack(parts), names
+
+
+def _standardize(P: np.ndarray) -> np.ndarray:
+    """z-score each column; missing / non-finite values land on the mean (0)."""
+    P = np.where(np.isfinite(P), P, np.nan)
+    with np.errstate(invalid="ignore"):
+        mean = np.nanmean(P, axis=0)
+        std = np.nanstd(P, axis=0)
+    std = np.where(np.isfinite(std) & (std > 0), std, 1.0)
+    Z = (P - np.nan_to_num(mean)) / std
+    return np.nan_to_num(Z, nan=0.0)
+
+
+class SimilarityIndex:
+    """
+    All-pairs k-nearest neighbours over standardized store profiles,
+    computed once with a KD-tree. Row i belongs to `store_ids[i]` (sorted);
+    `neighbors[i]` lists the MAX_SIMILAR_K closest other stores, nearest
+    first, with Euclidean `distances` in z-score units.
+
+    `peers` maps each limited-history store to its closest established
+    stores (>= LIMITED_HISTORY_MONTHS months), for the cold-start blend.
+    """
+
+    def __init__(self, store_ids: np.ndarray, profile_cols: List[str],
+                 neighbors: np.ndarray, distances: np.ndarray,
+                 peers: Dict[int, np.ndarray]) -> None:
+        self.store_ids = store_ids
+        self.profile_cols = profile_cols
+        self.neighbors = neighbors
+        self.distances = distances
+        self.peers = peers
+        self._pos: Dict[int, int] = {int(sid): i for i, sid in enumerate(store_ids)}
+
+    def position(self, store_id: int) -> int:
+        pos = self._pos.get(int(store_id))
+        if pos is None:
+            raise SimilarStoreNotFoundError(f"Store {store_id} has no latest features.")
+        return pos
+
+
+def _drop_self(idx: np.ndarray, dist: np.ndarray, k: int):
+    """Remove each row's own index from KD-tree results, keeping k columns."""
+    n = idx.shape[0]
+    keep = idx != np.arange(n)[:, None]
+    # Rows where self was not returned (exact duplicates) drop the last hit.
+    extra = keep.sum(axis=1) > k
+    keep[extra, -1] = False
+    return idx[keep].reshape(n, k), dist[keep].reshape(n, k)
+
+
+def _build_similarity_index() -> SimilarityIndex:
+    from sklearn.neighbors import KDTree
+
+    fm = get_latest_feature_matrix()
+    P, names = _profile_matrix(fm.X, fm.col)
+    Z = _standardize(P)
+    n = len(fm.store_ids)
+
+    k = min(MAX_SIMILAR_K, n - 1)
+    if k <= 0:
+        empty = np.zeros((n, 0))
+        return SimilarityIndex(fm.store_ids, names, empty.astype(np.int32), empty, {})
+
+    tree = KDTree(Z)
+    dist, idx = tree.query(Z, k=k + 1)
+    idx, dist = _drop_self(idx, dist, k)
+
+    # Cold-start peers: nearest established stores for each limited one.
+    stats = get_fleet_stats()
+    months = stats["months_active"].reindex(fm.store_ids).fillna(0).to_numpy()
+    limited = np.flatnonzero(months < LIMITED_HISTORY_MONTHS)
+    established = np.flatnonzero(months >= LIMITED_HISTORY_MONTHS)
+
+    peers: Dict[int, np.ndarray] = {}
+    if len(limited) and len(established):
+        kp = min(PEER_BLEND_K, len(established))
+        _, pidx = KDTree(Z[established]).query(Z[limited], k=kp)
+        peers = {int(fm.store_ids[i]): established[pidx[j]] for j, i in enumerate(limited)}
+
+    return SimilarityIndex(
+        fm.store_ids, names, idx.astype(np.int32), dist.astype(np.float32), peers
+    )
+
+
+def get_similarity_index() -> SimilarityIndex:
+    """
+    Similarity index for the current artifacts (built once per version).
+
+    :raises SimilarityError: If the profile matrix or the tree cannot be built.
+    """
+    try:
+        return get_derived("similarity_index", _build_similarity_index)
+    except SimilarityError:
+        raise
+    except Exception as exc:
+        raise SimilarityError("Failed to build the store similarity index.") from exc
+
+
+def get_similar_stores(store_id: int, k: int = 10) -> Dict[str, Any]:
+    """
+    The k most similar stores by profile, nearest first, with their
+    distance and next-period forecast.
+
+    :raises SimilarStoreNotFoundError: If the store has no latest features.
+    :raises SimilarityQueryError: If k is out of range.
+    """
+    if k < 1 or k > MAX_SIMILAR_K:
+        raise SimilarityQueryError(f"k must be between 1 and {MAX_SIMILAR_K}.")
+
+    index = get_similarity_index()
+    pos = index.position(store_id)
+    neighbors = index.neighbors[pos, :k]
+    distances = index.distances[pos, :k]
+
+    try:
+        table: Optional[Any] = get_forecast_table()
+    except Exception:
+        table = None
+
+    similar: List[Dict[str, Any]] = []
+    for p, d in zip(neighbors, distances):
+        sid = int(index.store_ids[p])
+        similar.append(
+            {
+                "store_id": sid,
+                "label": _build_store_label(sid, get_store_name(sid)),
+                "distance": float(d),
+                "prediction": table.get(sid) if table is not None else None,
+            }
+        )
+
+    return {
+        "store_id": store_id,
+        "k": k,
+        "model_version": get_artifact_version(),
+        "profile_features": index.profile_cols,
+        "similar": similar,
+    }
+
+
+def peer_blend(store_id: int, prediction: float, months_active: int) -> Optional[Dict[str, Any]]:
+    """
+    Cold-start blend for a limited-history store, or None for other stores.
+
+    The peer estimate scales the store's own mean sales by its established
+    peers' median forecast-to-mean ratio (falling back to the peers' median
+    forecast when the store has no mean yet). The blend weights the model
+    by months_active / LIMITED_HISTORY_MONTHS and the peers by the rest.
+    """
+    if months_active >= LIMITED_HISTORY_MONTHS:
+        return None
+
+    index = get_similarity_index()
+    peer_pos = index.peers.get(int(store_id))
+    if peer_pos is None or len(peer_pos) == 0:
+        return None
+
+    peer_ids = index.store_ids[peer_pos]
+    table = get_forecast_table()
+    preds = table.predictions[table.positions(peer_ids)]
+    peer_estimate = float(np.median(preds))
+
+    # Peers and the store itself are rows of the latest feature matrix.
+    fm = get_latest_feature_matrix()
+    mean_col = fm.col.get("store_mean_sales")
+    if mean_col is not None:
+        own_mean = float(fm.X[index.position(store_id), mean_col])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            ratios = preds / fm.X[peer_pos, mean_col]
+        ratios = ratios[np.isfinite(ratios)]
+        if np.isfinite(own_mean) and own_mean > 0 and len(ratios):
+            peer_estimate = own_mean * float(np.median(ratios))
+
+    weight = max(0, int(months_active)) / LIMITED_HISTORY_MONTHS
+    return {
+        "prediction": weight * float(prediction) + (1 - weight) * peer_estimate,
+        "model_prediction": float(prediction),
+        "peer_estimate": peer_estimate,
+        "model_weight": weight,
+        "peers": [int(s) for s in peer_ids],
+    }
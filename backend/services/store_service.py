@@ -6,6 +6,7 @@ from typing import Any, Dict, List, Optional, Set
 import pandas as pd
 
 from model_utils import (
+    get_derived,
     get_latest_features_df,
     get_history_df,
     get_model_config,
@@ -108,3 +109,8 @@ def get_store_list(
 
     stores.sort(key=lambda s: int(s["value"]))
     return stores
+
+
+def get_cached_store_list() -> List[Dict[str, Any]]:
+    """get_store_list() for the current artifacts, built once per version."""
+    return get_derived("store_list", get_store_list)
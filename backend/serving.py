@@ -0,0 +1,385 @@
+# backend/serving.py
+#
+# Serving-mode plumbing shared by the blueprints.
+#
+# In "async" mode (config.SERVING_MODE):
+#   - run_compute() runs CPU-bound work (model.predict, context building) on
+#     a bounded thread pool sized to the cores; NumPy / XGBoost release the
+#     GIL inside their kernels, so pool threads overlap.
+#     Explanations are rendered locally (llm_service makes no upstream
+#     call), so they go through run_compute() too; there is no event loop.
+#   - limit_concurrency() caps in-flight requests per endpoint and answers
+#     503 + Retry-After instead of queueing without bound.
+#   - install_admission_control() caps in-flight requests across the whole
+#     API before any view runs (health / metrics are exempt).
+# install_dataset_scope() (both modes) makes the dataset named in
+# /api/<dataset>/... current for the request.
+# In "sync" mode run_compute executes inline and endpoints are only
+# limited when ENDPOINT_CONCURRENCY / ADMISSION_MAX_IN_FLIGHT say so.
+#
+# Deadlines (both modes): with_deadline() gives a request a budget from
+# X-Request-Timeout-Ms or the endpoint default; services call
+# check_deadline() between stages and the view answers 504 once it passed.
+from __future__ import annotations
+
+import contextvars
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, TypeVar, Union
+
+from flask import Flask, g, jsonify, request
+
+from config import (
+    ADMISSION_MAX_IN_FLIGHT,
+    COMPUTE_POOL_SIZE,
+    DEFAULT_DATASET,
+    ENDPOINT_CONCURRENCY,
+    REQUEST_DEADLINES_MS,
+    RETRY_AFTER_SECONDS,
+    SERVING_MODE,
+)
+from access_log import annotate
+from metrics import register_metrics
+from model_utils import DatasetNotFoundError, enter_dataset, exit_dataset
+
+T = TypeVar("T")
+
+ASYNC_MODE = SERVING_MODE == "async"
+
+# In-flight caps per endpoint in async mode, as multiples of the pool size.
+_ASYNC_DEFAULT_LIMITS = {
+    "forecast": 4 * COMPUTE_POOL_SIZE,
+    "explain_forecast": 2 * COMPUTE_POOL_SIZE,
+    "scenarios": COMPUTE_POOL_SIZE,
+}
+
+
+def _parse_limits(raw: str) -> Dict[str, int]:
+    limits: Dict[str, int] = {}
+    for part in raw.split(","):
+        if "=" in part:
+            name, value = part.split("=", 1)
+            limits[name.strip()] = int(value)
+    return limits
+
+
+# --- compute pool ------------------------------------------
+
+_compute_pool: Optional[ThreadPoolExecutor] = None
+_init_lock = threading.Lock()
+
+
+def _get_compute_pool() -> ThreadPoolExecutor:
+    global _compute_pool
+    if _compute_pool is None:
+        with _init_lock:
+            if _compute_pool is None:
+                _compute_pool = ThreadPoolExecutor(
+                    max_workers=COMPUTE_POOL_SIZE, thread_name_prefix="compute"
+                )
+    return _compute_pool
+
+
+def run_compute(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Run CPU-bound `fn` on the bounded compute pool (async mode) or inline.
+    Context variables are carried over to the pool thread.
+    """
+    if not ASYNC_MODE:
+        return fn(*args, **kwargs)
+    ctx = contextvars.copy_context()
+    return _get_compute_pool().submit(ctx.run, functools.partial(fn, *args, **kwargs)).result()
+
+
+# --- per-endpoint limits -----------------------------------
+
+class EndpointLimiter:
+    """Non-blocking in-flight cap for one endpoint."""
+
+    def __init__(self, name: str, limit: int) -> None:
+        self.name = name
+        self.limit = limit
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self.in_flight >= self.limit:
+                self.rejected += 1
+                return False
+            self.in_flight += 1
+            self.admitted += 1
+            return True
+
+    def release(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "limit": self.limit,
+                "in_flight": self.in_flight,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+            }
+
+
+_limits = dict(_ASYNC_DEFAULT_LIMITS) if ASYNC_MODE else {}
+_limits.update(_parse_limits(ENDPOINT_CONCURRENCY))
+_limiters: Dict[str, EndpointLimiter] = {
+    name: EndpointLimiter(name, limit) for name, limit in _limits.items() if limit > 0
+}
+
+
+def overloaded_response(endpoint: str, retry_after: int = RETRY_AFTER_SECONDS):
+    """503 + Retry-After payload used whenever a request is shed."""
+    return (
+        jsonify(
+            {
+                "error": f"Server is busy handling /{endpoint} requests; retry shortly.",
+                "retry_after": retry_after,
+            }
+        ),
+        503,
+        {"Retry-After": str(retry_after)},
+    )
+
+
+def limit_concurrency(endpoint: str):
+    """
+    Decorator for a view: reject with 503 + Retry-After when `endpoint`
+    already has its configured number of requests in flight.
+    """
+    def decorator(view):
+        limiter = _limiters.get(endpoint)
+        if limiter is None:
+            return view
+
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if not limiter.try_acquire():
+                return overloaded_response(endpoint)
+            try:
+                return view(*args, **kwargs)
+            finally:
+                limiter.release()
+
+        return wrapper
+
+    return decorator
+
+
+# --- admission control -------------------------------------
+
+# Views that stay cheap and must answer even under overload.
+ADMISSION_EXEMPT = {
+    "health.health",
+    "health.metrics",
+    "health_dataset.health",
+    "health_dataset.metrics",
+}
+
+_admission_limit = ADMISSION_MAX_IN_FLIGHT or (8 * COMPUTE_POOL_SIZE if ASYNC_MODE else 0)
+_admission: Optional[EndpointLimiter] = (
+    EndpointLimiter("api", _admission_limit) if _admission_limit > 0 else None
+)
+
+
+def install_admission_control(app: Flask) -> None:
+    """
+    Shed requests with 503 + Retry-After before the view (and any pandas
+    work) starts once the worker has ADMISSION_MAX_IN_FLIGHT in flight.
+    """
+    if _admission is None:
+        return
+
+    @app.before_request
+    def _admit():
+        if request.endpoint in ADMISSION_EXEMPT or not request.path.startswith("/api/"):
+            return None
+        if not _admission.try_acquire():
+            return overloaded_response("api")
+        g.admitted = True
+        return None
+
+    @app.teardown_request
+    def _release(exc=None):
+        if g.pop("admitted", False):
+            _admission.release()
+
+
+# --- datasets ----------------------------------------------
+
+def install_dataset_scope(app: Flask) -> None:
+    """
+    Serve /api/<dataset>/... from that dataset's artifact bundle (404 for an
+    unknown name); unprefixed /api routes use DEFAULT_DATASET. The bundle is
+    loaded on first use and stays pinned until the request is torn down.
+    """
+
+    @app.url_value_preprocessor
+    def _pull_dataset(endpoint, values):
+        if values and "dataset" in values:
+            g.dataset = values.pop("dataset").lower()
+
+    @app.before_request
+    def _enter_dataset():
+        if not request.path.startswith("/api/"):
+            return None
+        name = g.get("dataset") or DEFAULT_DATASET
+        try:
+            g.dataset_scope = enter_dataset(name)
+        except DatasetNotFoundError as exc:
+            return jsonify({"error": str(exc)}), 404
+        annotate(dataset=name)
+        return None
+
+    @app.teardown_request
+    def _exit_dataset(exc=None):
+        scope = g.pop("dataset_scope", None)
+        if scope is not None:
+            exit_dataset(scope)
+
+
+# --- deadlines ---------------------------------------------
+
+DEADLINE_HEADER = "X-Request-Timeout-Ms"
+
+_DEFAULT_DEADLINES_MS = {
+    "forecast": 10_000,
+    "explain_forecast": 30_000,
+    "bootstrap": 30_000,
+}
+_deadlines_ms = dict(_DEFAULT_DEADLINES_MS)
+_deadlines_ms.update(_parse_limits(REQUEST_DEADLINES_MS))
+
+# Absolute time.monotonic() deadline of the current request, if any, or a
+# callable returning it (a shared computation whose deadline moves as
+# callers join). Carried into the compute pool by run_compute (contextvars).
+_deadline: contextvars.ContextVar[Union[None, float, Callable[[], Optional[float]]]] = (
+    contextvars.ContextVar("request_deadline", default=None)
+)
+_expired: Dict[str, int] = {name: 0 for name in _deadlines_ms}
+_expired_lock = threading.Lock()
+
+
+class DeadlineExceeded(Exception):
+    """Raised between stages once the request's deadline has passed."""
+
+    def __init__(self, stage: str) -> None:
+        super().__init__(f"Request deadline exceeded before {stage}.")
+        self.stage = stage
+
+
+def current_deadline() -> Optional[float]:
+    """Absolute time.monotonic() deadline of the current work (None = no deadline)."""
+    deadline = _deadline.get()
+    return deadline() if callable(deadline) else deadline
+
+
+def remaining_seconds() -> Optional[float]:
+    """Seconds left before the current request's deadline (None = no deadline)."""
+    deadline = current_deadline()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def run_under_deadline(fn: Callable[[], T], deadline: Callable[[], Optional[float]]) -> T:
+    """
+    Call `fn()` with `deadline()` as its deadline, read at every
+    check_deadline(), so work shared by several requests can be given more
+    time as callers join.
+    """
+    token = _deadline.set(deadline)
+    try:
+        return fn()
+    finally:
+        _deadline.reset(token)
+
+
+def check_deadline(stage: str) -> None:
+    """Raise DeadlineExceeded if the current request is already out of time."""
+    left = remaining_seconds()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded(stage)
+
+
+def deadline_exceeded_response(endpoint: str, exc: DeadlineExceeded):
+    """504 payload for a request abandoned at its deadline."""
+    with _expired_lock:
+        _expired[endpoint] = _expired.get(endpoint, 0) + 1
+    return (
+        jsonify(
+            {
+                "error": f"/{endpoint} did not finish within the request deadline.",
+                "stage": exc.stage,
+            }
+        ),
+        504,
+    )
+
+
+def _request_budget_ms(endpoint: str) -> Optional[float]:
+    """The tighter of the endpoint default and the caller's X-Request-Timeout-Ms."""
+    budget = _deadlines_ms.get(endpoint)
+    raw = request.headers.get(DEADLINE_HEADER)
+    if raw:
+        try:
+            asked = float(raw)
+        except ValueError:
+            asked = None
+        if asked is not None:
+            budget = asked if budget is None else min(budget, asked)
+    return budget
+
+
+def with_deadline(endpoint: str):
+    """
+    Decorator for a view: run it under the request's deadline and answer
+    504 when a stage raises DeadlineExceeded. Requests that arrive with no
+    budget left are shed with 503 before the view runs.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            budget_ms = _request_budget_ms(endpoint)
+            if budget_ms is None:
+                return view(*args, **kwargs)
+            if budget_ms <= 0:
+                return overloaded_response(endpoint)
+
+            token = _deadline.set(time.monotonic() + budget_ms / 1000.0)
+            try:
+                return view(*args, **kwargs)
+            except DeadlineExceeded as exc:
+                return deadline_exceeded_response(endpoint, exc)
+            finally:
+                _deadline.reset(token)
+
+        return wrapper
+
+    return decorator
+
+
+def serving_stats() -> Dict[str, Any]:
+    pool = _compute_pool
+    with _expired_lock:
+        expired = dict(_expired)
+    return {
+        "mode": SERVING_MODE,
+        "compute_pool_size": COMPUTE_POOL_SIZE,
+        "compute_queue_depth": pool._work_queue.qsize() if pool is not None else 0,
+        "endpoints": {name: lim.stats() for name, lim in _limiters.items()},
+        "admission": _admission.stats() if _admission is not None else None,
+        "deadlines": {
+            name: {"budget_ms": _deadlines_ms.get(name), "expired": expired.get(name, 0)}
+            for name in sorted(set(_deadlines_ms) | set(expired))
+        },
+    }
+
+
+register_metrics("serving", serving_stats)
@@ -0,0 +1,60 @@
+# backend/shared_arrays.py
+#
+# Read-only NumPy arrays shared with pool workers through shared memory.
+# The parent copies each array into a SharedMemory block once and hands
+# workers a small spec (block name, shape, dtype); workers attach views to
+# the same pages instead of receiving pickled DataFrames per task.
+from __future__ import annotations
+
+from multiprocessing import shared_memory
+from typing import Dict, Tuple
+
+import numpy as np
+
+# name -> (shared memory block name, shape, dtype string)
+ArraySpec = Dict[str, Tuple[str, Tuple[int, ...], str]]
+
+# Blocks attached in this (worker) process; kept alive for the process lifetime.
+_attached: Dict[str, shared_memory.SharedMemory] = {}
+
+
+class SharedArrays:
+    """Owner side: creates the blocks and unlinks them on close()."""
+
+    def __init__(self, arrays: Dict[str, np.ndarray]) -> None:
+        self._blocks: Dict[str, shared_memory.SharedMemory] = {}
+        self.spec: ArraySpec = {}
+
+        for name, arr in arrays.items():
+            arr = np.ascontiguousarray(arr)
+            shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+            view = np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)
+            view[...] = arr
+            self._blocks[name] = shm
+            self.spec[name] = (shm.name, arr.shape, arr.dtype.str)
+
+    def close(self) -> None:
+        for shm in self._blocks.values():
+            shm.close()
+            shm.unlink()
+        self._blocks.clear()
+
+    def __enter__(self) -> "SharedArrays":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def attach(spec: ArraySpec) -> Dict[str, np.ndarray]:
+    """Worker side: map the blocks described by `spec` as read-only arrays."""
+    arrays: Dict[str, np.ndarray] = {}
+    for name, (block, shape, dtype) in spec.items():
+        shm = _attached.get(block)
+        if shm is None:
+            shm = shared_memory.SharedMemory(name=block)
+            _attached[block] = shm
+        view = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+        view.flags.writeable = False
+        arrays[name] = view
+    return arrays
@@ -0,0 +1,155 @@
+# backend/single_flight.py
+#
+# Request coalescing ("single flight"): while a computation for a key is
+# running, concurrent callers with the same key wait for it and share its
+# result instead of starting their own. Nothing is kept once the computation
+# finishes, so there is no staleness window beyond the in-flight call.
+#
+# The shared computation runs on a flight thread under the latest deadline
+# among its callers (none if any caller has none), extended as callers
+# join: the first caller's budget never fails the others, and once every
+# caller is out of time the computation is abandoned at its next
+# check_deadline(). Each caller waits only as long as its own deadline.
+from __future__ import annotations
+
+import contextvars
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional, TypeVar
+
+from access_log import note_cache
+from metrics import register_metrics
+from serving import (
+    DeadlineExceeded,
+    check_deadline,
+    current_deadline,
+    remaining_seconds,
+    run_under_deadline,
+)
+
+# Threads running shared computations; in async mode they mostly wait on the
+# compute pool, so this only bounds distinct keys in flight.
+FLIGHT_THREADS = 32
+
+T = TypeVar("T")
+
+
+class _Flight:
+    """One in-flight computation and the deadline it runs under."""
+
+    def __init__(self, deadline: Optional[float]) -> None:
+        self.future: Optional[Future] = None
+        self.unbounded = deadline is None
+        self.deadline = deadline
+
+    def join(self, deadline: Optional[float]) -> None:
+        # Called under SingleFlight._lock.
+        if deadline is None:
+            self.unbounded = True
+        elif not self.unbounded:
+            self.deadline = max(self.deadline, deadline)
+
+    def deadline_at(self) -> Optional[float]:
+        return None if self.unbounded else self.deadline
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls by key.
+
+    Keys are tuples whose first element names the endpoint, e.g.
+    ("forecast", store_id, model_version, history_months); counters are
+    kept per endpoint.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._inflight: Dict[Hashable, _Flight] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _count(self, key: Hashable, field: str) -> None:
+        stats = self._stats.setdefault(
+            self._group(key),
+            {"calls": 0, "executed": 0, "coalesced": 0, "expired": 0, "abandoned": 0},
+        )
+        stats[field] += 1
+
+    def _run(self, key: Hashable, flight: _Flight, fn: Callable[[], T]) -> T:
+        def call() -> T:
+            check_deadline(self._group(key))  # every caller gave up while queued
+            return fn()
+
+        try:
+            return run_under_deadline(call, flight.deadline_at)
+        except DeadlineExceeded:
+            with self._lock:
+                self._count(key, "abandoned")
+            raise
+        finally:
+            with self._lock:
+                if self._inflight.get(key) is flight:
+                    del self._inflight[key]
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        """
+        Run `fn()` unless a call with the same key is already in flight,
+        in which case wait for it. Exceptions are shared the same way.
+
+        `fn` runs on a flight thread in a copy of the first caller's context
+        (dataset, access-log trace), under the latest deadline of the
+        callers waiting for it. Each caller waits until its own deadline at
+        most and then raises DeadlineExceeded.
+        """
+        with self._lock:
+            self._count(key, "calls")
+
+        while True:
+            deadline = current_deadline()
+            with self._lock:
+                flight = self._inflight.get(key)
+                leader = flight is None
+                if leader:
+                    if self._executor is None:
+                        self._executor = ThreadPoolExecutor(
+                            max_workers=FLIGHT_THREADS, thread_name_prefix="flight"
+                        )
+                    flight = _Flight(deadline)
+                    ctx = contextvars.copy_context()
+                    flight.future = self._executor.submit(ctx.run, self._run, key, flight, fn)
+                    self._inflight[key] = flight
+                    self._count(key, "executed")
+                else:
+                    flight.join(deadline)
+                    self._count(key, "coalesced")
+            note_cache("single_flight", "executed" if leader else "coalesced")
+
+            left = remaining_seconds()
+            try:
+                return flight.future.result(timeout=None if left is None else max(left, 0.0))
+            except TimeoutError:
+                with self._lock:
+                    self._count(key, "expired")
+                raise DeadlineExceeded(self._group(key)) from None
+            except DeadlineExceeded:
+                # The flight ran out of its earlier callers' time just as
+                # this one joined; start over if this caller has time left.
+                left = remaining_seconds()
+                if left is not None and left <= 0:
+                    raise
+
+    @staticmethod
+    def _group(key: Hashable) -> str:
+        return str(key[0]) if isinstance(key, tuple) and key else "default"
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "in_flight": len(self._inflight),
+                "endpoints": {k: dict(v) for k, v in self._stats.items()},
+            }
+
+
+# Shared by the forecast and explain routes.
+request_flight = SingleFlight()
+register_metrics("single_flight", request_flight.stats)
@@ -1,20 +1,83 @@
 import os
 import pandas as pd
 
+from config import DEFAULT_DATASET
+from model_utils import current_bundle, get_derived
+
 # Path to your CSV
 LOOKUP_PATH = os.path.join(
     os.path.dirname(__file__), "data", "store_lookup.csv"
 )
 
-# Load CSV with NO HEADER
-df_lookup = pd.read_csv(LOOKUP_PATH, header=None, names=["Store_Number", "Store_Name"])
+# Other datasets ship their lookup in their artifact directory (optional).
+LOOKUP_FILE = "store_lookup.csv"
+
+# Optional columns after number + name; rows without them read as NaN.
+LOOKUP_ATTRIBUTES = ["City", "County"]
+
+
+def _read_lookup(path: str) -> pd.DataFrame:
+    # CSV with NO HEADER
+    return pd.read_csv(
+        path, header=None, names=["Store_Number", "Store_Name"] + LOOKUP_ATTRIBUTES
+    )
+
+
+def _name_map(df: pd.DataFrame) -> dict:
+    return {
+        int(store): str(name).strip()
+        for store, name in zip(df["Store_Number"], df["Store_Name"])
+    }
+
+
+def _attribute_maps(df: pd.DataFrame) -> dict:
+    return {
+        attr.lower(): {
+            int(store): str(value).strip()
+            for store, value in zip(df["Store_Number"], df[attr])
+            if pd.notna(value) and str(value).strip()
+        }
+        for attr in LOOKUP_ATTRIBUTES
+    }
+
+
+df_lookup = _read_lookup(LOOKUP_PATH)
 
 # Build lookup dictionary
-STORE_NAME_MAP = {
-    int(row["Store_Number"]): str(row["Store_Name"]).strip()
-    for _, row in df_lookup.iterrows()
-}
+STORE_NAME_MAP = _name_map(df_lookup)
+
+# {"city": {store_id: "AMES", ...}, "county": {...}} for stores that carry them
+STORE_ATTRIBUTE_MAPS = _attribute_maps(df_lookup)
+
+
+def lookup_path() -> str:
+    """Lookup CSV of the current dataset."""
+    bundle = current_bundle()
+    if bundle.name == DEFAULT_DATASET:
+        return LOOKUP_PATH
+    return bundle.path(LOOKUP_FILE)
+
+
+def _build_dataset_lookup():
+    try:
+        df = _read_lookup(lookup_path())
+    except FileNotFoundError:
+        return {}, {}
+    return _name_map(df), _attribute_maps(df)
+
+
+def _lookup_maps():
+    """(name map, attribute maps) of the current dataset."""
+    if current_bundle().name == DEFAULT_DATASET:
+        return STORE_NAME_MAP, STORE_ATTRIBUTE_MAPS
+    return get_derived("store_lookup", _build_dataset_lookup)
+
 
 def get_store_name(store_id: int) -> str:
     """Return the store name for a given store ID."""
-    return STORE_NAME_MAP.get(int(store_id), "")
+    return _lookup_maps()[0].get(int(store_id), "")
+
+
+def get_store_attribute_map(attribute: str) -> dict:
+    """Return {store_id: value} for a lookup attribute ("city" / "county")."""
+    return _lookup_maps()[1].get(attribute, {})
@@ -0,0 +1,400 @@
+# backend/train.py
+#
+# Retrain the v3 model from the all-months feature table and write a
+# versioned artifact bundle the service can load (FORECASTER_MODELS_DIR).
+#
+# Full retrain: a random hyperparameter search runs on a process pool
+# (one task per candidate x time fold, the feature matrix in shared
+# memory), then the best candidate is refit on every labelled row.
+# Warm start: boosting continues from the current model on the most
+# recent months, e.g. after a month has been appended to the table.
+#
+#   cd backend
+#   python -m train --candidates 24 --folds 3 --workers 4 --out bundles
+#   python -m train --warm-start --warm-rounds 50 --features new_all.pkl --out bundles
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from backtest import load_backtest_arrays, model_params
+from model_utils import (
+    FEATURES_LATEST_PATH,
+    HISTORY_PATH,
+    get_all_features_df,
+    get_feature_cols,
+    get_model,
+    get_model_config,
+)
+from shared_arrays import SharedArrays, attach
+
+
+# Sampled per candidate; candidate 0 is always the production params.
+SEARCH_SPACE: Dict[str, List[Any]] = {
+    "n_estimators": [200, 400, 800],
+    "max_depth": [4, 6, 8],
+    "learning_rate": [0.03, 0.05, 0.1],
+    "min_child_weight": [1, 5, 10],
+    "subsample": [0.7, 0.8, 1.0],
+    "colsample_bytree": [0.6, 0.8, 1.0],
+    "reg_lambda": [1.0, 5.0, 10.0],
+}
+
+# File names the service loads from FORECASTER_MODELS_DIR.
+BUNDLE_FILES = {
+    "model": "xgb_all_stable_v3.pkl",
+    "config": "model_config_v3.json",
+    "features_all": "features_all_stable_v3.pkl",
+    "features_latest": "features_latest_per_store_v3.pkl",
+    "history": "store_month_history_v1.pkl",
+    "metrics": "metrics.json",
+}
+
+
+# --- folds + candidates ------------------------------------
+
+def time_folds(months: np.ndarray, n_folds: int, fold_months: int,
+               train_window: int = 0) -> List[Tuple[int, int, int]]:
+    """
+    Expanding-window folds over the last n_folds * fold_months months:
+    (train_start, valid_start, valid_end) month indexes, where fold k
+    trains on [train_start, valid_start) and validates [valid_start, valid_end).
+    """
+    available = np.unique(months)
+    folds: List[Tuple[int, int, int]] = []
+    for k in range(n_folds, 0, -1):
+        hi = len(available) - (k - 1) * fold_months
+        lo = hi - fold_months
+        if lo < 1:
+            continue  # no earlier month to train on
+        valid_start = int(available[lo])
+        valid_end = int(available[hi - 1]) + 1
+        train_start = valid_start - train_window if train_window > 0 else int(available[0])
+        folds.append((train_start, valid_start, valid_end))
+    return folds
+
+
+def sample_candidates(base: Dict[str, Any], n: int, seed: int) -> List[Dict[str, Any]]:
+    """`base` plus n - 1 distinct random draws from SEARCH_SPACE over it."""
+    rng = np.random.default_rng(seed)
+    candidates = [dict(base)]
+    seen = {json.dumps({k: base.get(k) for k in SEARCH_SPACE}, sort_keys=True, default=str)}
+    for _ in range(20 * n):
+        if len(candidates) >= n:
+            break
+        draw = {k: values[rng.integers(len(values))] for k, values in SEARCH_SPACE.items()}
+        key = json.dumps(draw, sort_keys=True, default=str)
+        if key not in seen:
+            seen.add(key)
+            candidates.append({**base, **draw})
+    return candidates
+
+
+# --- worker side -------------------------------------------
+
+_worker: Dict[str, Any] = {}
+
+
+def _init_worker(spec, n_threads: int) -> None:
+    os.environ["OMP_NUM_THREADS"] = str(n_threads)
+    _worker["arrays"] = attach(spec)
+    _worker["n_threads"] = n_threads
+
+
+def _fit_fold(candidate: int, params: Dict[str, Any],
+              fold: Tuple[int, int, int]) -> Dict[str, Any]:
+    """Train one candidate on one fold's training months, score its validation months."""
+    from xgboost import XGBRegressor
+
+    t0 = time.perf_counter()
+    a = _worker["arrays"]
+    train_start, valid_start, valid_end = fold
+    month = a["month"]
+    train = (month >= train_start) & (month < valid_start)
+    valid = (month >= valid_start) & (month < valid_end)
+
+    model = XGBRegressor(**{**params, "tree_method": "hist", "n_jobs": _worker["n_threads"]})
+    model.fit(a["X"][train], a["y"][train])
+    pred = model.predict(a["X"][valid]).astype(np.float64)
+
+    y = a["y"][valid]
+    abs_err = np.abs(pred - y)
+    return {
+        "candidate": candidate,
+        "valid_start": str(np.datetime64(valid_start, "M")),
+        "train_rows": int(train.sum()),
+        "n": int(valid.sum()),
+        "sum_abs_err": float(abs_err.sum()),
+        "sum_abs_y": float(np.abs(y).sum()),
+        "seconds": round(time.perf_counter() - t0, 3),
+    }
+
+
+# --- search / fit ------------------------------------------
+
+def run_search(
+    arrays: Dict[str, np.ndarray],
+    candidates: List[Dict[str, Any]],
+    folds: List[Tuple[int, int, int]],
+    workers: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Score every candidate on every fold on a process pool. Returns one
+    entry per candidate (params, per-fold results, MAE and WAPE over all
+    validation rows), best (lowest WAPE) first.
+    """
+    tasks = [(i, p, f) for i, p in enumerate(candidates) for f in folds]
+    cpus = os.cpu_count() or 1
+    workers = max(1, min(workers or cpus, len(tasks)))
+    n_threads = max(1, cpus // workers)  # workers * threads <= cores
+
+    results: List[Dict[str, Any]] = []
+    shared_names = {k: arrays[k] for k in ("X", "y", "month")}
+    with SharedArrays(shared_names) as shared:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(shared.spec, n_threads),
+        ) as pool:
+            # Latest folds have the most training rows; start them first.
+            ordered = sorted(tasks, key=lambda t: -t[2][1])
+            futures = [pool.submit(_fit_fold, *t) for t in ordered]
+            for fut in as_completed(futures):
+                results.append(fut.result())
+
+    scored: List[Dict[str, Any]] = []
+    for i, params in enumerate(candidates):
+        fold_results = sorted(
+            (r for r in results if r["candidate"] == i), key=lambda r: r["valid_start"]
+        )
+        n = sum(r["n"] for r in fold_results)
+        err = sum(r["sum_abs_err"] for r in fold_results)
+        denom = sum(r["sum_abs_y"] for r in fold_results)
+        scored.append(
+            {
+                "candidate": i,
+                "params": {k: params.get(k) for k in SEARCH_SPACE},
+                "folds": fold_results,
+                "n": n,
+                "mae": err / n if n else None,
+                "wape": err / denom if denom else None,
+            }
+        )
+    scored.sort(key=lambda s: np.inf if s["wape"] is None else s["wape"])
+    return scored
+
+
+def fit_final(arrays: Dict[str, np.ndarray], feature_cols: List[str],
+              params: Dict[str, Any], n_threads: int) -> Any:
+    """Refit `params` on every labelled row with all threads."""
+    from xgboost import XGBRegressor
+
+    model = XGBRegressor(**{**params, "tree_method": "hist", "n_jobs": n_threads})
+    # Fit on a frame so the booster keeps the feature names the service predicts with.
+    model.fit(pd.DataFrame(arrays["X"], columns=feature_cols), arrays["y"])
+    return model
+
+
+def warm_start(arrays: Dict[str, np.ndarray], feature_cols: List[str], rounds: int,
+               recent_months: int, n_threads: int) -> Tuple[Any, Dict[str, Any]]:
+    """
+    Continue boosting the current model for `rounds` trees on the last
+    `recent_months` months. Returns the model and before / after in-sample
+    metrics on those rows.
+    """
+    from xgboost import XGBRegressor
+
+    current: Any = get_model()
+    booster = current.get_booster() if hasattr(current, "get_booster") else current
+
+    months = np.unique(arrays["month"])
+    recent = arrays["month"] >= months[-min(recent_months, len(months))]
+    X = pd.DataFrame(arrays["X"][recent], columns=feature_cols)
+    y = arrays["y"][recent]
+
+    params = model_params(n_threads, rounds)
+    model = XGBRegressor(**params)
+    before = np.asarray(current.predict(X), dtype=np.float64)
+    model.fit(X, y, xgb_model=booster)
+    after = model.predict(X).astype(np.float64)
+
+    denom = float(np.abs(y).sum()) or np.nan
+    info = {
+        "rounds_added": rounds,
+        "recent_months": int(min(recent_months, len(months))),
+        "rows": int(recent.sum()),
+        "wape_before": float(np.abs(before - y).sum() / denom),
+        "wape_after": float(np.abs(after - y).sum() / denom),
+    }
+    return model, info
+
+
+# --- bundle ------------------------------------------------
+
+def write_bundle(
+    out_root: str,
+    model: Any,
+    features_all: pd.DataFrame,
+    metrics: Dict[str, Any],
+    *,
+    latest_path: str = FEATURES_LATEST_PATH,
+    history_path: str = HISTORY_PATH,
+) -> str:
+    """
+    Write model, config, feature tables, history and metrics into
+    `out_root/<version>/` and point `out_root/LATEST` at it. The bundle is
+    assembled in a temporary directory and renamed into place, so a
+    reader never sees a partial bundle. Returns the bundle directory.
+    """
+    model_bytes = pickle.dumps(model)
+    version = (
+        time.strftime("%Y%m%d-%H%M%S", time.gmtime())
+        + "-" + hashlib.sha1(model_bytes).hexdigest()[:8]
+    )
+    os.makedirs(out_root, exist_ok=True)
+    tmp = os.path.join(out_root, f".tmp-{version}")
+    os.makedirs(tmp)
+
+    cfg = dict(get_model_config())
+    cfg.update(
+        {
+            "bundle_version": version,
+            "trained_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "train_months": metrics.get("train_months"),
+            "params": {
+                k: v for k, v in model.get_params().items()
+                if isinstance(v, (int, float, str, bool)) or v is None
+            },
+        }
+    )
+
+    with open(os.path.join(tmp, BUNDLE_FILES["model"]), "wb") as f:
+        f.write(model_bytes)
+    with open(os.path.join(tmp, BUNDLE_FILES["config"]), "w") as f:
+        json.dump(cfg, f, indent=2)
+    features_all.to_pickle(os.path.join(tmp, BUNDLE_FILES["features_all"]))
+    shutil.copy2(latest_path, os.path.join(tmp, BUNDLE_FILES["features_latest"]))
+    if os.path.exists(history_path):
+        shutil.copy2(history_path, os.path.join(tmp, BUNDLE_FILES["history"]))
+    with open(os.path.join(tmp, BUNDLE_FILES["metrics"]), "w") as f:
+        json.dump({"bundle_version": version, **metrics}, f, indent=2, default=str)
+
+    final = os.path.join(out_root, version)
+    os.replace(tmp, final)
+
+    pointer = os.path.join(out_root, f".LATEST-{version}")
+    with open(pointer, "w") as f:
+        f.write(version + "\n")
+    os.replace(pointer, os.path.join(out_root, "LATEST"))
+    return final
+
+
+def smoke_check(model: Any, latest_path: str, feature_cols: List[str]) -> Dict[str, Any]:
+    """Predict the latest table with the new model: every store should get a finite value."""
+    latest = pd.read_pickle(latest_path)
+    pred = np.asarray(model.predict(latest[feature_cols].astype(np.float32)), dtype=float)
+    return {"stores": int(len(pred)), "finite": int(np.isfinite(pred).sum())}
+
+
+# --- driver ------------------------------------------------
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Retrain the forecast model into a versioned bundle.")
+    parser.add_argument("--features", default=None, metavar="PATH",
+                        help="all-months feature table (default: the service's)")
+    parser.add_argument("--latest", default=FEATURES_LATEST_PATH, metavar="PATH",
+                        help="latest-per-store feature table copied into the bundle")
+    parser.add_argument("--history", default=HISTORY_PATH, metavar="PATH",
+                        help="store-month history copied into the bundle")
+    parser.add_argument("--candidates", type=int, default=16,
+                        help="hyperparameter candidates, including the current params (1 = no search)")
+    parser.add_argument("--folds", type=int, default=3, help="time-based validation folds")
+    parser.add_argument("--fold-months", type=int, default=1, help="months validated per fold")
+    parser.add_argument("--train-window", type=int, default=0,
+                        help="train each fold on at most this many months (0 = all)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="search worker processes (default: all cores)")
+    parser.add_argument("--threads", type=int, default=None,
+                        help="threads for the final fit / warm start (default: all cores)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--warm-start", action="store_true",
+                        help="continue boosting the current model instead of a full retrain")
+    parser.add_argument("--warm-rounds", type=int, default=50, help="trees added by --warm-start")
+    parser.add_argument("--warm-months", type=int, default=12,
+                        help="most recent months the added trees are fit on")
+    parser.add_argument("--out", default="bundles", help="bundle root directory")
+    args = parser.parse_args(argv)
+
+    t0 = time.perf_counter()
+    features_all = (
+        pd.read_pickle(args.features) if args.features else get_all_features_df()
+    )
+    arrays = load_backtest_arrays(features_all)
+    feature_cols = get_feature_cols(features_all)
+    months = np.unique(arrays["month"])
+    n_threads = max(1, args.threads or os.cpu_count() or 1)
+
+    metrics: Dict[str, Any] = {
+        "train_rows": int(len(arrays["y"])),
+        "train_months": [str(np.datetime64(int(months[0]), "M")),
+                         str(np.datetime64(int(months[-1]), "M"))],
+    }
+
+    if args.warm_start:
+        model, metrics["warm_start"] = warm_start(
+            arrays, feature_cols, args.warm_rounds, args.warm_months, n_threads
+        )
+        print(
+            f"Warm start: +{args.warm_rounds} trees on {metrics['warm_start']['rows']} rows, "
+            f"WAPE {metrics['warm_start']['wape_before']:.4f} -> "
+            f"{metrics['warm_start']['wape_after']:.4f} (in-sample)"
+        )
+    else:
+        base = model_params(1)
+        folds = time_folds(arrays["month"], args.folds, args.fold_months, args.train_window)
+        if not folds:
+            raise ValueError("Not enough months for the requested validation folds.")
+
+        candidates = sample_candidates(base, max(1, args.candidates), args.seed)
+        search = run_search(arrays, candidates, folds, args.workers)
+        best = search[0]
+        baseline = next(s for s in search if s["candidate"] == 0)
+        metrics["search"] = {
+            "folds": [str(np.datetime64(f[1], "M")) for f in folds],
+            "candidates": search,
+            "best_candidate": best["candidate"],
+            "best_wape": best["wape"],
+            "baseline_wape": baseline["wape"],
+        }
+        print(
+            f"Searched {len(candidates)} candidate(s) x {len(folds)} fold(s): "
+            f"best WAPE {best['wape']:.4f} (candidate {best['candidate']}), "
+            f"current params {baseline['wape']:.4f}"
+        )
+        model = fit_final(arrays, feature_cols, {**base, **best["params"]}, n_threads)
+
+    metrics["smoke"] = smoke_check(model, args.latest, feature_cols)
+    metrics["elapsed_seconds"] = round(time.perf_counter() - t0, 3)
+
+    bundle = write_bundle(
+        args.out, model, features_all, metrics,
+        latest_path=args.latest, history_path=args.history,
+    )
+    print(f"Wrote bundle {bundle} in {metrics['elapsed_seconds']}s "
+          f"(serve it with FORECASTER_MODELS_DIR={bundle})")
+
+
+if __name__ == "__main__":
+    main()
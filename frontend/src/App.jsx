@@ -2,9 +2,11 @@
 import { useEffect, useState } from "react";
 
 import {
+  apiBootstrap,
   apiHealth,
   apiGetStores,
   apiGetForecast,
+  apiGetForecastFit,
   apiExplainForecast,
 } from "./api/client";
 
@@ -16,6 +18,25 @@ import ForecastChart from "./components/ForecastChart";
 
 import "./App.css";
 
+const LAST_STORE_KEY = "lastStoreId";
+
+function readLastStore() {
+  try {
+    return window.localStorage.getItem(LAST_STORE_KEY);
+  } catch {
+    return null;
+  }
+}
+
+function saveLastStore(storeId) {
+  try {
+    if (storeId == null) window.localStorage.removeItem(LAST_STORE_KEY);
+    else window.localStorage.setItem(LAST_STORE_KEY, String(storeId));
+  } catch {
+    // storage unavailable (private mode); nothing to remember
+  }
+}
+
 export default function App() {
   const [status, setStatus] = useState("Checking backend…");
   const [error, setError] = useState("");
@@ -23,47 +44,84 @@ export default function App() {
   const [stores, setStores] = useState([]);
   const [selectedStore, setSelectedStore] = useState(null);
   const [prediction, setPrediction] = useState(null);
+  const [forecastInterval, setForecastInterval] = useState(null);
   const [loadingForecast, setLoadingForecast] = useState(false);
 
   // chart-related state
   const [history, setHistory] = useState([]);
   const [stats, setStats] = useState(null);
   const [nextPeriodLabel, setNextPeriodLabel] = useState("Next"); // ⭐ NEW
+  const [fit, setFit] = useState([]);
 
   // LLM-related state
   const [explanation, setExplanation] = useState(null);
   const [loadingExplanation, setLoadingExplanation] = useState(false);
   const [explanationError, setExplanationError] = useState("");
 
+  function applyForecast(data) {
+    setPrediction(data.prediction);
+    setForecastInterval(data.interval || null);
+    setHistory(data.history || []);
+    setStats(data.stats || null);
+    setNextPeriodLabel(data.next_period_label || "Next"); // ⭐ NEW
+  }
+
   // -------------------------------
-  // Health check
+  // First paint: one bootstrap call (status, stores, last-used forecast)
   // -------------------------------
   useEffect(() => {
-    async function checkBackend() {
+    async function loadFallback() {
+      // Older backends without /bootstrap: health check + full store list.
       try {
         const data = await apiHealth();
         setStatus(data.ok ? "Backend is connected" : "Unexpected response");
+        setStores(await apiGetStores());
       } catch (err) {
         setError(String(err));
         setStatus("Backend unreachable");
       }
     }
-    checkBackend();
-  }, []);
 
-  // -------------------------------
-  // Load store list
-  // -------------------------------
-  useEffect(() => {
-    async function loadStores() {
+    async function bootstrap() {
+      let data;
       try {
-        const storesData = await apiGetStores();
-        setStores(storesData);
-      } catch (err) {
-        setError(String(err));
+        data = await apiBootstrap({ storeId: readLastStore() || "default" });
+      } catch {
+        await loadFallback();
+        return;
+      }
+
+      setStatus(data.ready ? "Backend is connected" : "Backend is starting up");
+      setStores(data.stores || []);
+
+      // Only the first page came with the bootstrap; fetch the rest quietly.
+      if (data.next_offset != null) {
+        apiGetStores()
+          .then(setStores)
+          .catch((err) => setError(String(err)));
+      }
+
+      if (data.forecast) {
+        const storeId = data.store_id;
+        const store = (data.stores || []).find((s) => s.value === storeId) || {
+          value: storeId,
+          label: String(storeId),
+        };
+        setSelectedStore(store);
+        applyForecast(data.forecast);
+
+        apiGetForecastFit(storeId)
+          .then((f) => setFit(f.points || []))
+          .catch(() => setFit([]));
+
+        if (data.insight) setExplanation(data.insight.explanation);
+        else if (data.insight_error) setExplanationError(data.insight_error);
+      } else if (data.forecast_error) {
+        // The remembered store is gone; start from the list next time.
+        saveLastStore(null);
       }
     }
-    loadStores();
+    bootstrap();
   }, []);
 
   // -------------------------------
@@ -71,13 +129,16 @@ export default function App() {
   // -------------------------------
   async function handleSelectStore(store) {
     setSelectedStore(store);
+    saveLastStore(store.value);
 
     // reset previous results
     setPrediction(null);
+    setForecastInterval(null);
     setExplanation(null);
     setHistory([]);
     setStats(null);
     setNextPeriodLabel("Next"); // ⭐ reset
+    setFit([]);
 
     setLoadingForecast(true);
     setLoadingExplanation(false);
@@ -92,10 +153,12 @@ export default function App() {
       // data should look like:
       // { store_id, prediction, history, stats, next_period_label }
 
-      setPrediction(data.prediction);
-      setHistory(data.history || []);
-      setStats(data.stats || null);
-      setNextPeriodLabel(data.next_period_label || "Next"); // ⭐ NEW
+      applyForecast(data);
+
+      // Historical model fit overlay is optional; ignore failures.
+      apiGetForecastFit(store.value)
+        .then((f) => setFit(f.points || []))
+        .catch(() => setFit([]));
 
       // 2) Ask LLM to explain (don’t block forecast if this fails)
       setLoadingExplanation(true);
@@ -146,6 +209,7 @@ export default function App() {
           <ForecastPanel
             selectedStore={selectedStore}
             prediction={prediction}
+            interval={forecastInterval}
             loadingForecast={loadingForecast}
             explanation={explanation}
             loadingExplanation={loadingExplanation}
@@ -158,6 +222,7 @@ export default function App() {
             prediction={prediction}
             loading={loadingForecast}
             nextLabel={nextPeriodLabel}    // ⭐ pass label down
+            fit={fit}
           />
         </div>
       </main>
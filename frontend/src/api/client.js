@@ -8,6 +8,20 @@ export async function apiHealth() {
   return res.json(); // { ok: true } expected
 }
 
+// First-paint bundle: model version, readiness, first page of stores and,
+// optionally, the forecast + insight for one store ("default" = first store).
+// The browser revalidates with If-None-Match, so repeat loads are 304s.
+export async function apiBootstrap({ storeId, insight = true, limit } = {}) {
+  const params = new URLSearchParams();
+  if (storeId != null) params.set("store_id", String(storeId));
+  if (!insight) params.set("insight", "0");
+  if (limit) params.set("limit", String(limit));
+
+  const res = await fetch(`${API_BASE}/bootstrap?${params}`);
+  if (!res.ok) throw new Error(`Bootstrap failed: HTTP ${res.status}`);
+  return res.json(); // { model_version, ready, stores, next_offset, forecast, insight, ... }
+}
+
 // Get stores
 export async function apiGetStores() {
   const res = await fetch(`${API_BASE}/stores`);
@@ -22,6 +36,24 @@ export async function apiGetForecast(storeId) {
   if (!res.ok) throw new Error(`Forecast failed: HTTP ${res.status}`);
   return res.json(); // { store_id, prediction }
 }
+// Get historical model fit (predicted vs actual per month) for a store
+export async function apiGetForecastFit(storeId) {
+  const res = await fetch(`${API_BASE}/forecast/${storeId}/fit`);
+  if (!res.ok) throw new Error(`Forecast fit failed: HTTP ${res.status}`);
+  return res.json(); // { store_id, points: [{ date, predicted, actual }], metrics }
+}
+
+// Get a store's history range (grain: "month" | "quarter" | "year")
+export async function apiGetStoreHistory(storeId, { from, to, grain = "month" } = {}) {
+  const params = new URLSearchParams({ grain });
+  if (from) params.set("from", from);
+  if (to) params.set("to", to);
+
+  const res = await fetch(`${API_BASE}/stores/${storeId}/history?${params}`);
+  if (!res.ok) throw new Error(`Store history failed: HTTP ${res.status}`);
+  return res.json(); // { store_id, grain, from, to, history }
+}
+
 // src/api/client.js
 export async function apiExplainForecast({ storeId, prediction }) {
   const res = await fetch(`${API_BASE}/explain_forecast`, {
@@ -21,6 +21,7 @@ export default function ForecastChart({
   prediction,
   loading,
   nextLabel = "Next",   // ⭐ NEW
+  fit = [],             // optional [{ date, predicted }] historical model fit
 }) {
   // No data state
   if (loading) {
@@ -43,10 +44,16 @@ export default function ForecastChart({
     );
   }
 
+  const fitByMonth = new Map(
+    (Array.isArray(fit) ? fit : []).map((p) => [formatMonthLabel(p.date), p.predicted])
+  );
+  const hasFit = fitByMonth.size > 0;
+
   const chartData = [
     ...history.map((row) => ({
       date: formatMonthLabel(row.date),
       actual: row.sales,
+      fitted: fitByMonth.get(formatMonthLabel(row.date)) ?? null,
       forecast: null,
     })),
     {
@@ -75,6 +82,15 @@ export default function ForecastChart({
             <Tooltip />
             <Legend />
             <Line type="monotone" dataKey="actual" name="Actual" dot={false} />
+            {hasFit && (
+              <Line
+                type="monotone"
+                dataKey="fitted"
+                name="Model fit"
+                strokeDasharray="2 2"
+                dot={false}
+              />
+            )}
             <Line
               type="monotone"
               dataKey="forecast"
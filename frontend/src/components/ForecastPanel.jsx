@@ -2,6 +2,7 @@
 export default function ForecastPanel({
   selectedStore,
   prediction,
+  interval,
   loadingForecast,
   explanation,
   loadingExplanation,
@@ -39,6 +40,17 @@ export default function ForecastPanel({
             </p>
           )}
 
+          {!loadingForecast && prediction != null && interval && (
+            <p className="forecast-range">
+              <span className="label">
+                Likely range ({Math.round((interval.level || 0.8) * 100)}%):
+              </span>{" "}
+              <span className="value">
+                {Math.max(interval.p10, 0).toFixed(2)} – {interval.p90.toFixed(2)}
+              </span>
+            </p>
+          )}
+
           {!loadingForecast && prediction == null && (
             <p className="forecast-empty">No prediction available yet.</p>
           )}